@@ -1,16 +1,18 @@
 import os
 import requests
+import http_client
+import pagination
+import bulk_loader
+import workflow_runs
 import psycopg2
-from datetime import datetime
+import db
+import dimensions
+import rollups
+from datetime import datetime, timedelta, timezone
 
 # --- Configuration ---
 
-# Database Connection Details
-DB_HOST = "localhost"
-DB_NAME = "postgres"
-DB_USER = "postgres"
-DB_PASS = "postgres"
-DB_PORT = "5432"
+# Database connection details are read from .env by db.py
 
 # GitHub Repositories to analyze
 GITHUB_REPOS = [
@@ -32,15 +34,10 @@ HEADERS = {
     "Accept": "application/vnd.github.v3+json"
 }
 
-# --- Database Functions (No Changes) ---
+# Stop paging closed PRs once they were last updated more than this many days ago
+PR_LOOKBACK_DAYS = int(os.environ.get('PR_LOOKBACK_DAYS', 90))
 
-def get_db_connection():
-    try:
-        conn = psycopg2.connect(dbname=DB_NAME, user=DB_USER, password=DB_PASS, host=DB_HOST, port=DB_PORT)
-        return conn
-    except (Exception, psycopg2.Error) as error:
-        print(f"Error while connecting to PostgreSQL: {error}")
-        return None
+# --- Database Functions (No Changes) ---
 
 def setup_database(conn):
     try:
@@ -82,84 +79,57 @@ def setup_database(conn):
     except (Exception, psycopg2.Error) as error:
         print(f"Error during database setup: {error}")
 
+# The inserters stage rows with COPY and merge them like MTTRCFR.py, which also moves a
+# run whose completed_at changed partition. They do not commit: main() commits per repo.
+
 def insert_cfr_data(conn, data):
-    with conn.cursor() as cursor:
-        insert_query = """
-            INSERT INTO change_failure_rate_runs (repo_name, run_id, conclusion, completed_at)
-            VALUES (%s, %s, %s, %s) ON CONFLICT (repo_name, run_id) DO UPDATE SET
-                conclusion = EXCLUDED.conclusion,
-                completed_at = EXCLUDED.completed_at;
-        """
-        cursor.executemany(insert_query, data)
-        conn.commit()
-    print(f"  - Upserted {len(data)} records for CFR/Build Count analysis.")
+    count = bulk_loader.copy_upsert(
+        conn, 'change_failure_rate_runs',
+        ['repo_name', 'run_id', 'conclusion', 'completed_at'],
+        ['repo_name', 'run_id'], data
+    )
+    print(f"  - Upserted {count} records for CFR/Build Count analysis.")
 
 def insert_build_duration_data(conn, data):
-    with conn.cursor() as cursor:
-        insert_query = """
-            INSERT INTO build_durations (repo_name, run_id, duration_in_seconds, completed_at)
-            VALUES (%s, %s, %s, %s) ON CONFLICT (repo_name, run_id) DO UPDATE SET
-                duration_in_seconds = EXCLUDED.duration_in_seconds,
-                completed_at = EXCLUDED.completed_at;
-        """
-        cursor.executemany(insert_query, data)
-        conn.commit()
-    print(f"  - Upserted {len(data)} records for Build Duration analysis.")
+    count = bulk_loader.copy_upsert(
+        conn, 'build_durations',
+        ['repo_name', 'run_id', 'duration_in_seconds', 'completed_at'],
+        ['repo_name', 'run_id'], data
+    )
+    print(f"  - Upserted {count} records for Build Duration analysis.")
 
 def insert_mttr_data(conn, data):
-    with conn.cursor() as cursor:
-        insert_query = """
-            INSERT INTO incidents_for_mttr (repo_name, failed_run_id, resolved_run_id, failure_time, resolution_time, time_to_recover_in_seconds)
-            VALUES (%s, %s, %s, %s, %s, %s) ON CONFLICT (repo_name, failed_run_id) DO NOTHING;
-        """
-        cursor.executemany(insert_query, data)
-        conn.commit()
-    print(f"  - Upserted {len(data)} records for MTTR analysis.")
+    count = bulk_loader.copy_upsert(
+        conn, 'incidents_for_mttr',
+        ['repo_name', 'failed_run_id', 'resolved_run_id', 'failure_time', 'resolution_time', 'time_to_recover_in_seconds'],
+        ['repo_name', 'failed_run_id'], data, update_columns=[]
+    )
+    print(f"  - Upserted {count} records for MTTR analysis.")
 
 # --- GitHub API and Processing Logic (Completely Revised) ---
 
 def get_default_branch(repo):
     try:
-        response = requests.get(f"https://api.github.com/repos/{repo}", headers=HEADERS)
+        response = http_client.get(f"https://api.github.com/repos/{repo}", headers=HEADERS)
         response.raise_for_status()
         return response.json().get('default_branch', 'main')
     except requests.exceptions.RequestException as e:
         print(f"Could not fetch default branch for {repo}: {e}")
         return 'main'
 
-def get_runs_for_commits(repo, commits):
-    """For a list of commit SHAs, find the associated completed workflow runs."""
-    commit_to_run_map = {}
-    print(f"  - Searching for workflow runs for {len(commits)} commits...")
-    for commit_sha in commits:
-        try:
-            # This endpoint finds all runs for a specific commit
-            run_url = f"https://api.github.com/repos/{repo}/commits/{commit_sha}/check-runs"
-            response = requests.get(run_url, headers=HEADERS)
-            response.raise_for_status()
-            check_runs = response.json().get('check_runs', [])
-            
-            # We only care about completed CI runs from GitHub Actions
-            for run in check_runs:
-                if run.get('app', {}).get('slug') == 'github-actions' and run.get('status') == 'completed':
-                    # We found the run for this commit, store it and move to the next commit
-                    commit_to_run_map[commit_sha] = run
-                    break
-        except requests.exceptions.RequestException as e:
-            print(f"    - Could not fetch runs for commit {commit_sha[:7]}: {e}")
-            continue
-    return commit_to_run_map
-
 def process_repo(repo, default_branch):
     """Main processing logic for a single repository."""
     # Step 1: Get recently merged PRs that targeted the default branch
     print(f"  - Finding recently merged pull requests targeted at '{default_branch}'...")
-    pr_url = f"https://api.github.com/repos/{repo}/pulls?state=closed&base={default_branch}&sort=updated&direction=desc&per_page=100"
+    pr_url = f"https://api.github.com/repos/{repo}/pulls?state=closed&base={default_branch}&sort=updated&direction=desc"
+    cutoff = datetime.now(timezone.utc) - timedelta(days=PR_LOOKBACK_DAYS)
     
     try:
-        response = requests.get(pr_url, headers=HEADERS)
-        response.raise_for_status()
-        all_prs = response.json()
+        all_prs = []
+        for pr in pagination.paginate(pr_url, headers=HEADERS):
+            if datetime.fromisoformat(pr['updated_at'].replace('Z', '+00:00')) < cutoff:
+                break
+            all_prs.append(pr)
         
         # Filter for only those that were actually merged
         merged_prs = [pr for pr in all_prs if pr.get('merged_at')]
@@ -168,10 +138,9 @@ def process_repo(repo, default_branch):
             return [], [], []
             
         print(f"  - Found {len(merged_prs)} merged PRs. Extracting commit SHAs.")
-        commits = {pr['head']['sha']: pr for pr in merged_prs}
 
         # Step 2: For each merged PR's commit, find its corresponding workflow run
-        commit_to_run_map = get_runs_for_commits(repo, commits.keys())
+        commit_to_run_map = workflow_runs.runs_for_prs(repo, merged_prs, HEADERS)
         if not commit_to_run_map:
             print("  - Could not find any associated workflow runs for the merged PRs.")
             return [], [], []
@@ -217,11 +186,15 @@ def process_repo(repo, default_branch):
         return [], [], []
 
 def main():
-    db_connection = get_db_connection()
+    db_connection = db.get_db_connection()
     if not db_connection:
         return
     
     setup_database(db_connection)
+    rollups.setup_rollups(db_connection)
+    dimensions.setup_dimensions(db_connection)
+    # The dashboard's repo picker lists the repos dimension
+    dimensions.repo_ids(db_connection, GITHUB_REPOS)
 
     for repo in GITHUB_REPOS:
         print(f"\n--- Processing repository: {repo} ---")
@@ -230,16 +203,24 @@ def main():
         
         cfr_data, duration_data, mttr_data = process_repo(repo, default_branch)
 
-        if cfr_data:
-            insert_cfr_data(db_connection, cfr_data)
-        
-        if duration_data:
-            insert_build_duration_data(db_connection, duration_data)
+        try:
+            if cfr_data:
+                insert_cfr_data(db_connection, cfr_data)
+
+            if duration_data:
+                insert_build_duration_data(db_connection, duration_data)
+
+            if mttr_data:
+                insert_mttr_data(db_connection, mttr_data)
 
-        if mttr_data:
-            insert_mttr_data(db_connection, mttr_data)
+            touched = [(repo, row[3]) for row in cfr_data + duration_data] + [(repo, row[4]) for row in mttr_data]
+            rollups.refresh_rows(db_connection, 'daily_delivery_stats', touched, 0, [1])
+            bulk_loader.commit(db_connection)
+        except (Exception, psycopg2.Error) as error:
+            print(f"  - ERROR: Failed to store data for {repo}: {error}")
+            bulk_loader.rollback(db_connection)
 
-    db_connection.close()
+    db.release_connection(db_connection)
     print("\nProcess finished and database connection closed.")
 
 if __name__ == "__main__":
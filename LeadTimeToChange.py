@@ -1,18 +1,19 @@
 import os
 import requests
+import pagination
+import sync_state
+import bulk_loader
+import metric_kernel
+import rollups
+import dimensions
 import psycopg2
-from datetime import datetime
+import db
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 
 # --- Configuration ---
 load_dotenv()
-# Database Connection Details
-# Database Connection Details (read from environment)
-DB_HOST = os.environ.get("DB_HOST")
-DB_NAME = os.environ.get("DB_NAME")
-DB_USER = os.environ.get("DB_USER")
-DB_PASS = os.environ.get("DB_PASS")
-DB_PORT = os.environ.get("DB_PORT")
+# Database connection details are read from .env by db.py
 
 # GitHub Repositories to analyze
 GITHUB_REPOS = [
@@ -35,23 +36,10 @@ HEADERS = {
     "Accept": "application/vnd.github.v3+json"
 }
 
-# --- Database Functions ---
+# Stop paging closed PRs once they were last updated more than this many days ago
+PR_LOOKBACK_DAYS = int(os.environ.get('PR_LOOKBACK_DAYS', 90))
 
-def get_db_connection():
-    """Establishes a connection to the PostgreSQL database."""
-    conn = None
-    try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASS,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        return conn
-    except (Exception, psycopg2.Error) as error:
-        print(f"Error while connecting to PostgreSQL: {error}")
-        return None
+# --- Database Functions ---
 
 def setup_database(conn):
     """Ensures the required table exists in the database."""
@@ -81,41 +69,39 @@ def setup_database(conn):
 def insert_data_to_db(conn, data):
     """Inserts a list of lead time data into the PostgreSQL database."""
     try:
-        cursor = conn.cursor()
-        
-        # Using ON CONFLICT to avoid errors if we run the script multiple times
-        insert_query = """
-            INSERT INTO lead_time_to_change (
-                repo_name, pull_request_id, first_commit_at, merged_at, lead_time_in_seconds
-            ) VALUES (%s, %s, %s, %s, %s)
-            ON CONFLICT (repo_name, pull_request_id) DO UPDATE SET
-                first_commit_at = EXCLUDED.first_commit_at,
-                merged_at = EXCLUDED.merged_at,
-                lead_time_in_seconds = EXCLUDED.lead_time_in_seconds;
-        """
-        
-        cursor.executemany(insert_query, data)
-        conn.commit()
+        # Stage the rows with COPY and merge them with a single ON CONFLICT statement
+        bulk_loader.copy_upsert(
+            conn, 'lead_time_to_change',
+            ['repo_name', 'pull_request_id', 'first_commit_at', 'merged_at', 'lead_time_in_seconds'],
+            ['repo_name', 'pull_request_id'], data
+        )
+        rollups.refresh_rows(conn, 'daily_lead_time', data, 0, [3])
+        bulk_loader.commit(conn)
         print(f"Successfully inserted/updated {len(data)} records.")
-        cursor.close()
+        return True
 
     except (Exception, psycopg2.Error) as error:
         print(f"Error while inserting data: {error}")
+        bulk_loader.rollback(conn)
+        return False
 
 # --- GitHub API Functions ---
 
-def get_first_commit_date(commits_url):
-    """Fetches all commits for a PR and returns the date of the first one."""
+def get_first_commit_date(commits_url, raise_errors=False):
+    """Fetches the oldest commit of a PR and returns its date.
+
+    With raise_errors, a failed request raises instead of returning None.
+    """
     try:
-        response = requests.get(commits_url, headers=HEADERS)
-        response.raise_for_status()
-        commits = response.json()
-        if commits:
-            # The first commit in the list is the oldest one for the PR
-            first_commit_date_str = commits[0]['commit']['author']['date']
+        # The first commit in the list is the oldest one for the PR, so one item is enough
+        first_commit = next(pagination.paginate(commits_url, headers=HEADERS, per_page=1, max_items=1), None)
+        if first_commit:
+            first_commit_date_str = first_commit['commit']['author']['date']
             return datetime.fromisoformat(first_commit_date_str.replace('Z', '+00:00'))
     except requests.exceptions.RequestException as e:
         print(f"Error fetching commits from {commits_url}: {e}")
+        if raise_errors:
+            raise
     return None
 
 def fetch_and_process_repos(conn):
@@ -124,42 +110,52 @@ def fetch_and_process_repos(conn):
         print(f"\n--- Processing repository: {repo} ---")
         
         # We fetch pull requests that are closed and have been merged.
-        # We only look at PRs merged in the last 90 days as an example.
-        # You can adjust this by changing `per_page` or adding date filters.
-        api_url = f"https://api.github.com/repos/{repo}/pulls?state=closed&sort=updated&direction=desc&per_page=100"
+        # PRs are streamed most recently updated first; paging stops once they fall
+        # outside the PR_LOOKBACK_DAYS window.
+        api_url = f"https://api.github.com/repos/{repo}/pulls?state=closed&sort=updated&direction=desc"
+        # Incremental runs stop at the last PR seen by the previous run
+        watermark, _ = sync_state.get_watermark(conn, repo, 'lead_time')
+        cutoff = watermark or datetime.now(timezone.utc) - timedelta(days=PR_LOOKBACK_DAYS)
+        newest_updated_at = None
+        # updated_at of the merged PRs whose first commit could not be fetched
+        failed_updated_at = []
         
         try:
-            response = requests.get(api_url, headers=HEADERS)
-            response.raise_for_status() # Raises an exception for bad status codes
-            pull_requests = response.json()
-
-            lead_time_data = []
+            merged_prs = []
 
-            for pr in pull_requests:
+            for pr in pagination.paginate(api_url, headers=HEADERS):
+                updated_at = datetime.fromisoformat(pr['updated_at'].replace('Z', '+00:00'))
+                if updated_at < cutoff or (watermark and updated_at <= watermark):
+                    break
+                newest_updated_at = newest_updated_at or updated_at
                 # We only care about merged pull requests
                 if pr.get('merged_at'):
-                    pr_id = pr['number']
-                    merged_at_str = pr['merged_at']
-                    merged_at = datetime.fromisoformat(merged_at_str.replace('Z', '+00:00'))
-
                     # Get the date of the very first commit
                     commits_url = pr['commits_url']
-                    first_commit_at = get_first_commit_date(commits_url)
-
-                    if first_commit_at:
-                        # Calculate lead time in seconds
-                        lead_time = (merged_at - first_commit_at).total_seconds()
-                        
-                        if lead_time >= 0: # Ensure lead time is not negative
-                            lead_time_data.append(
-                                (repo, pr_id, first_commit_at, merged_at, int(lead_time))
-                            )
-                            print(f"  - PR #{pr_id}: Lead Time = {lead_time / 3600:.2f} hours")
-
+                    try:
+                        first_commit_at = get_first_commit_date(commits_url, raise_errors=True)
+                    except requests.exceptions.RequestException:
+                        failed_updated_at.append(updated_at)
+                        continue
+                    merged_prs.append((pr['number'], first_commit_at, pr['merged_at']))
+
+            # Lead times of the whole batch at once; missing or negative ones are dropped
+            lead_time_data = metric_kernel.lead_time_rows(repo, merged_prs)
+            for row in lead_time_data:
+                print(f"  - PR #{row[1]}: Lead Time = {row[4] / 3600:.2f} hours")
+
+            stored = True
             if lead_time_data:
-                insert_data_to_db(conn, lead_time_data)
+                stored = insert_data_to_db(conn, lead_time_data)
             else:
                 print("No newly merged pull requests found to process.")
+            watermark_after = newest_updated_at
+            if failed_updated_at:
+                print(f"  - {len(failed_updated_at)} PRs could not be processed; they will be retried next run.")
+                # The PR listing stops at updated_at <= watermark
+                watermark_after = min(failed_updated_at) - timedelta(microseconds=1)
+            if stored:
+                sync_state.set_watermark(conn, repo, 'lead_time', watermark_after)
 
         except requests.exceptions.RequestException as e:
             print(f"Error fetching data for repo {repo}: {e}")
@@ -168,14 +164,19 @@ def fetch_and_process_repos(conn):
 
 
 if __name__ == "__main__":
-    db_connection = get_db_connection()
+    db_connection = db.get_db_connection()
     if db_connection:
         # 1. Ensure the database table exists
         setup_database(db_connection)
+        sync_state.setup_sync_state(db_connection)
+        rollups.setup_rollups(db_connection)
+        dimensions.setup_dimensions(db_connection)
+        # The dashboard's repo picker lists the repos dimension
+        dimensions.repo_ids(db_connection, GITHUB_REPOS)
         
         # 2. Fetch data from GitHub and insert it into the table
         fetch_and_process_repos(db_connection)
         
         # 3. Close the connection
-        db_connection.close()
+        db.release_connection(db_connection)
         print("\nProcess finished and database connection closed.")
\ No newline at end of file
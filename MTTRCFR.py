@@ -1,16 +1,22 @@
+import argparse
 import os
 import requests
+import http_client
+import pagination
+import workflow_runs
+import sync_state
+import bulk_loader
+import metric_kernel
 import psycopg2
-from datetime import datetime
+import db
+import dimensions
+import partitions
+import rollups
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 # --- Configuration ---
 load_dotenv()
-# Database Connection Details
-DB_HOST = "localhost"
-DB_NAME = "postgres"
-DB_USER = "postgres"
-DB_PASS = "postgres"
-DB_PORT = "5432"
+# Database connection details are read from .env by db.py
 
 # GitHub Repositories to analyze
 GITHUB_REPOS = [
@@ -37,15 +43,16 @@ HEADERS = {
     "Accept": "application/vnd.github.v3+json"
 }
 
-# --- Database Functions (No Changes) ---
+# Stop paging closed PRs once they were last updated more than this many days ago
+PR_LOOKBACK_DAYS = int(os.environ.get('PR_LOOKBACK_DAYS', 90))
+# A PR merged this recently without a completed CI run holds the watermark back, so the
+# next run picks it up again; after that it is treated as having no run
+RUN_WAIT_HOURS = int(os.environ.get('RUN_WAIT_HOURS', 24))
+# 'sql' derives incidents_for_mttr from every stored run of the repo (see derive_incidents);
+# 'batch' pairs failures with successes inside the fetched batch only
+MTTR_MODE = os.environ.get('MTTR_MODE', 'sql')
 
-def get_db_connection():
-    try:
-        conn = psycopg2.connect(dbname=DB_NAME, user=DB_USER, password=DB_PASS, host=DB_HOST, port=DB_PORT)
-        return conn
-    except (Exception, psycopg2.Error) as error:
-        print(f"Error while connecting to PostgreSQL: {error}")
-        return None
+# --- Database Functions (No Changes) ---
 
 def setup_database(conn):
     try:
@@ -87,160 +94,251 @@ def setup_database(conn):
     except (Exception, psycopg2.Error) as error:
         print(f"Error during database setup: {error}")
 
+# The inserters stage rows with COPY and merge them in one statement per table.
+# They do not commit: main() commits all three tables for a repo in one transaction.
+
 def insert_cfr_data(conn, data):
-    with conn.cursor() as cursor:
-        insert_query = """
-            INSERT INTO change_failure_rate_runs (repo_name, run_id, conclusion, completed_at)
-            VALUES (%s, %s, %s, %s) ON CONFLICT (repo_name, run_id) DO UPDATE SET
-                conclusion = EXCLUDED.conclusion,
-                completed_at = EXCLUDED.completed_at;
-        """
-        cursor.executemany(insert_query, data)
-        conn.commit()
-    print(f"  - Upserted {len(data)} records for CFR/Build Count analysis.")
+    count = bulk_loader.copy_upsert(
+        conn, 'change_failure_rate_runs',
+        ['repo_name', 'run_id', 'conclusion', 'completed_at'],
+        ['repo_name', 'run_id'], data
+    )
+    print(f"  - Upserted {count} records for CFR/Build Count analysis.")
 
 def insert_build_duration_data(conn, data):
-    with conn.cursor() as cursor:
-        insert_query = """
-            INSERT INTO build_durations (repo_name, run_id, duration_in_seconds, completed_at)
-            VALUES (%s, %s, %s, %s) ON CONFLICT (repo_name, run_id) DO UPDATE SET
-                duration_in_seconds = EXCLUDED.duration_in_seconds,
-                completed_at = EXCLUDED.completed_at;
-        """
-        cursor.executemany(insert_query, data)
-        conn.commit()
-    print(f"  - Upserted {len(data)} records for Build Duration analysis.")
+    count = bulk_loader.copy_upsert(
+        conn, 'build_durations',
+        ['repo_name', 'run_id', 'duration_in_seconds', 'completed_at'],
+        ['repo_name', 'run_id'], data
+    )
+    print(f"  - Upserted {count} records for Build Duration analysis.")
 
 def insert_mttr_data(conn, data):
+    count = bulk_loader.copy_upsert(
+        conn, 'incidents_for_mttr',
+        ['repo_name', 'failed_run_id', 'resolved_run_id', 'failure_time', 'resolution_time', 'time_to_recover_in_seconds'],
+        ['repo_name', 'failed_run_id'], data,
+        update_columns=['resolved_run_id', 'resolution_time', 'time_to_recover_in_seconds']
+    )
+    print(f"  - Upserted {count} records for MTTR analysis.")
+
+# Pairs every failure after the anchor with the first success that follows it. Runs are
+# numbered by the count of successes up to and including them, so a failure resolves to
+# the success numbered one higher: one window pass instead of a scan per failure.
+DERIVE_INCIDENTS_QUERY = """
+    WITH runs AS (
+        SELECT run_id, conclusion, completed_at,
+               COUNT(*) FILTER (WHERE conclusion = 'success')
+                   OVER (ORDER BY completed_at, run_id ROWS UNBOUNDED PRECEDING) AS successes_so_far
+        FROM change_failure_rate_runs
+        WHERE repo_name = %(repo)s AND completed_at IS NOT NULL
+          AND (%(anchor_at)s::timestamptz IS NULL OR (completed_at, run_id) >= (%(anchor_at)s, %(anchor_run)s))
+    )
+    INSERT INTO incidents_for_mttr (
+        repo_name, failed_run_id, resolved_run_id, failure_time, resolution_time, time_to_recover_in_seconds
+    )
+    SELECT %(repo)s, failure.run_id, success.run_id, failure.completed_at, success.completed_at,
+           EXTRACT(EPOCH FROM success.completed_at - failure.completed_at)::integer
+    FROM runs failure
+    JOIN runs success
+      ON success.conclusion = 'success' AND success.successes_so_far = failure.successes_so_far + 1
+    WHERE failure.conclusion = 'failure'
+    RETURNING resolution_time
+"""
+
+def derive_incidents(conn, repo, since=None):
+    """Rebuilds incidents_for_mttr for `repo` from its stored change_failure_rate_runs.
+
+    Only failures after the last success before `since` (the earliest newly stored run)
+    can change, so only those are recomputed; since=None recomputes the whole history.
+    Does not commit. Returns the old and new resolution times, for the rollup refresh.
+    """
+    anchor_at = anchor_run = None
     with conn.cursor() as cursor:
-        insert_query = """
-            INSERT INTO incidents_for_mttr (repo_name, failed_run_id, resolved_run_id, failure_time, resolution_time, time_to_recover_in_seconds)
-            VALUES (%s, %s, %s, %s, %s, %s) ON CONFLICT (repo_name, failed_run_id) DO UPDATE SET
-                resolved_run_id = EXCLUDED.resolved_run_id,
-                resolution_time = EXCLUDED.resolution_time,
-                time_to_recover_in_seconds = EXCLUDED.time_to_recover_in_seconds;
-        """
-        cursor.executemany(insert_query, data)
-        conn.commit()
-    print(f"  - Upserted {len(data)} records for MTTR analysis.")
+        if since is not None:
+            cursor.execute("""
+                SELECT completed_at, run_id FROM change_failure_rate_runs
+                WHERE repo_name = %s AND conclusion = 'success' AND completed_at < %s
+                ORDER BY completed_at DESC, run_id DESC LIMIT 1
+            """, (repo, since))
+            anchor = cursor.fetchone()
+            if anchor:
+                anchor_at, anchor_run = anchor
+        cursor.execute("""
+            DELETE FROM incidents_for_mttr
+            WHERE repo_name = %(repo)s
+              AND (%(anchor_at)s::timestamptz IS NULL OR (failure_time, failed_run_id) > (%(anchor_at)s, %(anchor_run)s))
+            RETURNING resolution_time
+        """, {'repo': repo, 'anchor_at': anchor_at, 'anchor_run': anchor_run})
+        resolution_times = [row[0] for row in cursor.fetchall()]
+        removed = len(resolution_times)
+        cursor.execute(DERIVE_INCIDENTS_QUERY, {'repo': repo, 'anchor_at': anchor_at, 'anchor_run': anchor_run})
+        derived = cursor.fetchall()
+        resolution_times.extend(row[0] for row in derived)
+    print(f"  - Derived {len(derived)} incidents for MTTR analysis (replaced {removed}).")
+    return [time for time in resolution_times if time is not None]
 
 # --- GitHub API and Processing Logic (Completely Revised) ---
 
 def get_default_branch(repo):
     try:
-        response = requests.get(f"https://api.github.com/repos/{repo}", headers=HEADERS)
+        response = http_client.get(f"https://api.github.com/repos/{repo}", headers=HEADERS)
         response.raise_for_status()
         return response.json().get('default_branch', 'main')
     except requests.exceptions.RequestException as e:
         print(f"Could not fetch default branch for {repo}: {e}")
         return 'main'
 
-def get_runs_for_commits(repo, commits):
-    """For a list of commit SHAs, find their associated completed workflow runs."""
-    commit_to_run_map = {}
-    print(f"  - Searching for workflow runs for {len(commits)} merged commits...")
-    for commit_sha in commits:
-        try:
-            run_url = f"https://api.github.com/repos/{repo}/commits/{commit_sha}/check-runs"
-            response = requests.get(run_url, headers=HEADERS)
-            response.raise_for_status()
-            check_runs = response.json().get('check_runs', [])
-            
-            for run in check_runs:
-                if run.get('app', {}).get('slug') == 'github-actions' and run.get('status') == 'completed':
-                    commit_to_run_map[commit_sha] = run
-                    break # Found the primary run for this commit
-        except requests.exceptions.RequestException:
-            continue
-    return commit_to_run_map
+def next_watermark(newest_updated_at, merged_prs, commit_to_run_map, now=None):
+    """The watermark to store after a run: the newest PR seen, held just below any PR
+    merged in the last RUN_WAIT_HOURS whose CI run has not completed yet.
+    """
+    now = now or datetime.now(timezone.utc)
+    waiting = [
+        datetime.fromisoformat(pr['updated_at'].replace('Z', '+00:00'))
+        for pr in merged_prs
+        if pr['head']['sha'] not in commit_to_run_map
+        and datetime.fromisoformat(pr['merged_at'].replace('Z', '+00:00')) > now - timedelta(hours=RUN_WAIT_HOURS)
+    ]
+    unresolved = sum(1 for pr in merged_prs if pr['head']['sha'] not in commit_to_run_map)
+    if unresolved > len(waiting):
+        print(f"  - {unresolved - len(waiting)} merged PRs older than {RUN_WAIT_HOURS}h have no completed run; skipping them.")
+    if not waiting:
+        return newest_updated_at
+    print(f"  - {len(waiting)} recently merged PRs have no completed run yet; they will be checked again next run.")
+    # The PR listing stops at updated_at <= watermark
+    return min(waiting) - timedelta(microseconds=1)
+
+def process_repo(repo, default_branch, watermark=None):
+    """Main processing logic using the reliable PR-first method.
 
-def process_repo(repo, default_branch):
-    """Main processing logic using the reliable PR-first method."""
+    Only PRs updated after `watermark` are considered. Returns the CFR, duration and
+    MTTR rows plus the next watermark (see next_watermark), or None when GitHub could
+    not be read, so the watermark stays put.
+    """
     print(f"  - Step 1: Finding recently merged pull requests targeted at '{default_branch}'...")
-    pr_url = f"https://api.github.com/repos/{repo}/pulls?state=closed&base={default_branch}&sort=updated&direction=desc&per_page=100"
+    pr_url = f"https://api.github.com/repos/{repo}/pulls?state=closed&base={default_branch}&sort=updated&direction=desc"
+    cutoff = watermark or datetime.now(timezone.utc) - timedelta(days=PR_LOOKBACK_DAYS)
+    newest_updated_at = None
     
     try:
-        response = requests.get(pr_url, headers=HEADERS)
-        rate_limit_remaining = response.headers.get('X-RateLimit-Remaining')
-        print(f"  - API Rate Limit Remaining: {rate_limit_remaining}")
-        response.raise_for_status()
-        all_prs = response.json()
+        all_prs = []
+        for pr in pagination.paginate(pr_url, headers=HEADERS):
+            updated_at = datetime.fromisoformat(pr['updated_at'].replace('Z', '+00:00'))
+            if updated_at < cutoff or (watermark and updated_at <= watermark):
+                break
+            newest_updated_at = newest_updated_at or updated_at
+            all_prs.append(pr)
         
         merged_prs = [pr for pr in all_prs if pr.get('merged_at')]
         if not merged_prs:
             print("  - No recently merged PRs found.")
-            return [], [], []
+            return [], [], [], newest_updated_at
             
         print(f"  - Found {len(merged_prs)} merged PRs.")
-        commits = {pr['head']['sha']: pr for pr in merged_prs}
 
-        print(f"  - Step 2: Finding the CI runs associated with these {len(commits)} commits.")
-        commit_to_run_map = get_runs_for_commits(repo, commits.keys())
+        print(f"  - Step 2: Finding the CI runs associated with these {len(merged_prs)} commits.")
+        commit_to_run_map = workflow_runs.runs_for_prs(repo, merged_prs, HEADERS)
+        watermark_after = next_watermark(newest_updated_at, merged_prs, commit_to_run_map)
         if not commit_to_run_map:
             print("  - Could not find any associated workflow runs for the merged PRs.")
-            return [], [], []
+            return [], [], [], watermark_after
 
         print(f"  - Step 3: Processing the {len(commit_to_run_map)} found runs.")
         
-        cfr_data = []
-        duration_data = []
         mttr_data = []
 
         sorted_runs = sorted(commit_to_run_map.values(), key=lambda r: r['completed_at'])
+        # Timestamps and durations of the whole batch are computed at once
+        cfr_data, duration_data = metric_kernel.run_rows(repo, sorted_runs)
+        completed_times = metric_kernel.parse_timestamps([run['completed_at'] for run in sorted_runs])
+
+        # Walk backwards remembering the nearest later success: each failure resolves in O(1)
+        next_success = None
+        for run, completed_at in zip(reversed(sorted_runs), reversed(completed_times)):
+            if run['conclusion'] == 'success':
+                next_success = (run['id'], completed_at)
+            elif run['conclusion'] == 'failure' and next_success:
+                resolved_run_id, resolution_time = next_success
+                time_to_recover = (resolution_time - completed_at).total_seconds()
+                if time_to_recover >= 0:
+                    mttr_data.append((repo, run['id'], resolved_run_id, completed_at, resolution_time, int(time_to_recover)))
+        mttr_data.reverse()
         
-        for i, run in enumerate(sorted_runs):
-            completed_at = datetime.fromisoformat(run['completed_at'].replace('Z', '+00:00'))
-            created_at = datetime.fromisoformat(run['started_at'].replace('Z', '+00:00'))
-            duration = (completed_at - created_at).total_seconds()
-            
-            if run['conclusion'] in ['success', 'failure']:
-                cfr_data.append((repo, run['id'], run['conclusion'], completed_at))
-                if duration >= 0:
-                    duration_data.append((repo, run['id'], int(duration), completed_at))
-
-            if run['conclusion'] == 'failure':
-                next_success_run = None
-                for subsequent_run in sorted_runs[i+1:]:
-                    if subsequent_run['conclusion'] == 'success':
-                        next_success_run = subsequent_run
-                        break
-                
-                if next_success_run:
-                    failure_time = completed_at
-                    resolution_time = datetime.fromisoformat(next_success_run['completed_at'].replace('Z', '+00:00'))
-                    time_to_recover = (resolution_time - failure_time).total_seconds()
-                    if time_to_recover >= 0:
-                        mttr_data.append((repo, run['id'], next_success_run['id'], failure_time, resolution_time, int(time_to_recover)))
-        
-        return cfr_data, duration_data, mttr_data
+        return cfr_data, duration_data, mttr_data, watermark_after
 
     except requests.exceptions.RequestException as e:
         print(f"  - ERROR: Failed to process repo {repo}: {e}")
-        return [], [], []
+        return [], [], [], None
+
+def recompute_incidents(conn, repos):
+    """Re-derives every repo's incidents from all stored runs and refreshes its rollups."""
+    for repo in repos:
+        print(f"\n--- Recomputing incidents for: {repo} ---")
+        try:
+            resolution_times = derive_incidents(conn, repo)
+            rollups.refresh_rows(conn, 'daily_delivery_stats', [(repo, time) for time in resolution_times], 0, [1])
+            conn.commit()
+        except psycopg2.Error as error:
+            print(f"  - ERROR: Failed to recompute incidents for {repo}: {error}")
+            conn.rollback()
 
 def main():
-    db_connection = get_db_connection()
+    parser = argparse.ArgumentParser(description="Collect CI runs, build durations and MTTR incidents.")
+    parser.add_argument('--recompute-incidents', action='store_true',
+                        help="re-derive incidents_for_mttr from the stored runs without calling GitHub")
+    args = parser.parse_args()
+
+    db_connection = db.get_db_connection()
     if not db_connection:
         return
     
     setup_database(db_connection)
+    sync_state.setup_sync_state(db_connection)
+    partitions.maintain(db_connection)
+    rollups.setup_rollups(db_connection)
+    dimensions.setup_dimensions(db_connection)
+    # The dashboard's repo picker lists the repos dimension
+    dimensions.repo_ids(db_connection, GITHUB_REPOS)
+
+    if args.recompute_incidents:
+        recompute_incidents(db_connection, GITHUB_REPOS)
+        db.release_connection(db_connection)
+        return
 
     for repo in GITHUB_REPOS:
         print(f"\n--- Processing repository: {repo} ---")
         default_branch = get_default_branch(repo)
+        watermark, _ = sync_state.get_watermark(db_connection, repo, 'mttr_cfr')
         
-        cfr_data, duration_data, mttr_data = process_repo(repo, default_branch)
+        cfr_data, duration_data, mttr_data, watermark_after = process_repo(repo, default_branch, watermark)
 
-        if cfr_data:
-            insert_cfr_data(db_connection, cfr_data)
-        
-        if duration_data:
-            insert_build_duration_data(db_connection, duration_data)
+        try:
+            if cfr_data:
+                insert_cfr_data(db_connection, cfr_data)
+            
+            if duration_data:
+                insert_build_duration_data(db_connection, duration_data)
+
+            touched = [(repo, row[3]) for row in cfr_data + duration_data]
+            if MTTR_MODE == 'sql':
+                if cfr_data:
+                    resolution_times = derive_incidents(db_connection, repo, min(row[3] for row in cfr_data))
+                    touched += [(repo, time) for time in resolution_times]
+            elif mttr_data:
+                insert_mttr_data(db_connection, mttr_data)
+                touched += [(repo, row[4]) for row in mttr_data]
+            # Same transaction: the daily rollups never disagree with the runs they summarise
+            rollups.refresh_rows(db_connection, 'daily_delivery_stats', touched, 0, [1])
+            bulk_loader.commit(db_connection)
+        except (Exception, psycopg2.Error) as error:
+            print(f"  - ERROR: Failed to store data for {repo}: {error}")
+            bulk_loader.rollback(db_connection)
+            continue
 
-        if mttr_data:
-            insert_mttr_data(db_connection, mttr_data)
+        sync_state.set_watermark(db_connection, repo, 'mttr_cfr', watermark_after)
 
-    db_connection.close()
+    db.release_connection(db_connection)
     print("\nProcess finished and database connection closed.")
 
 if __name__ == "__main__":
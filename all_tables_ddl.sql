@@ -22,17 +22,49 @@ SET default_tablespace = '';
 SET default_table_access_method = heap;
 
 --
--- Name: commit_details; Type: TABLE; Schema: public; Owner: postgres
+-- Name: authors; Type: TABLE; Schema: public; Owner: postgres
 --
 
-CREATE TABLE public.commit_details (
+CREATE TABLE public.authors (
+    author_id integer NOT NULL,
+    author_name character varying(255) NOT NULL
+);
+
+
+ALTER TABLE public.authors OWNER TO postgres;
+
+--
+-- Name: authors_author_id_seq; Type: SEQUENCE; Schema: public; Owner: postgres
+--
+
+CREATE SEQUENCE public.authors_author_id_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+
+ALTER SEQUENCE public.authors_author_id_seq OWNER TO postgres;
+
+--
+-- Name: authors_author_id_seq; Type: SEQUENCE OWNED BY; Schema: public; Owner: postgres
+--
+
+ALTER SEQUENCE public.authors_author_id_seq OWNED BY public.authors.author_id;
+
+
+--
+-- Name: commit_facts; Type: TABLE; Schema: public; Owner: postgres
+--
+
+CREATE TABLE public.commit_facts (
     id integer NOT NULL,
-    repo_name character varying(255),
-    start_date date,
-    end_date date,
+    repo_id integer NOT NULL,
     commit_date date,
     commit_hash character varying(255),
-    commit_user character varying(255),
+    author_id integer,
     commit_message text,
     files_changed integer,
     additions integer,
@@ -40,13 +72,13 @@ CREATE TABLE public.commit_details (
 );
 
 
-ALTER TABLE public.commit_details OWNER TO postgres;
+ALTER TABLE public.commit_facts OWNER TO postgres;
 
 --
--- Name: commit_details_id_seq; Type: SEQUENCE; Schema: public; Owner: postgres
+-- Name: commit_facts_id_seq; Type: SEQUENCE; Schema: public; Owner: postgres
 --
 
-CREATE SEQUENCE public.commit_details_id_seq
+CREATE SEQUENCE public.commit_facts_id_seq
     AS integer
     START WITH 1
     INCREMENT BY 1
@@ -55,14 +87,49 @@ CREATE SEQUENCE public.commit_details_id_seq
     CACHE 1;
 
 
-ALTER SEQUENCE public.commit_details_id_seq OWNER TO postgres;
+ALTER SEQUENCE public.commit_facts_id_seq OWNER TO postgres;
+
+--
+-- Name: commit_facts_id_seq; Type: SEQUENCE OWNED BY; Schema: public; Owner: postgres
+--
+
+ALTER SEQUENCE public.commit_facts_id_seq OWNED BY public.commit_facts.id;
+
 
 --
--- Name: commit_details_id_seq; Type: SEQUENCE OWNED BY; Schema: public; Owner: postgres
+-- Name: repos; Type: TABLE; Schema: public; Owner: postgres
 --
 
-ALTER SEQUENCE public.commit_details_id_seq OWNED BY public.commit_details.id;
+CREATE TABLE public.repos (
+    repo_id integer NOT NULL,
+    repo_name character varying(255) NOT NULL
+);
+
 
+ALTER TABLE public.repos OWNER TO postgres;
+
+--
+-- Name: commit_details; Type: VIEW; Schema: public; Owner: postgres
+--
+
+CREATE VIEW public.commit_details AS
+ SELECT f.id,
+    r.repo_name,
+    f.commit_date AS start_date,
+    f.commit_date AS end_date,
+    f.commit_date,
+    f.commit_hash,
+    a.author_name AS commit_user,
+    f.commit_message,
+    f.files_changed,
+    f.additions,
+    f.deletions
+   FROM ((public.commit_facts f
+     JOIN public.repos r ON ((r.repo_id = f.repo_id)))
+     LEFT JOIN public.authors a ON ((a.author_id = f.author_id)));
+
+
+ALTER VIEW public.commit_details OWNER TO postgres;
 
 --
 -- Name: ghcommitdetails; Type: TABLE; Schema: public; Owner: postgres
@@ -105,17 +172,16 @@ CREATE TABLE public.leads (
 ALTER TABLE public.leads OWNER TO postgres;
 
 --
--- Name: pr_details; Type: TABLE; Schema: public; Owner: postgres
+-- Name: pr_facts; Type: TABLE; Schema: public; Owner: postgres
 --
 
-CREATE TABLE public.pr_details (
+CREATE TABLE public.pr_facts (
     id integer NOT NULL,
-    repo_name character varying(255),
-    start_date date,
-    end_date date,
+    repo_id integer NOT NULL,
+    created_date date,
     pr_number integer,
     state character varying(50),
-    author character varying(255),
+    author_id integer,
     merged boolean,
     merge_time interval,
     review_time interval,
@@ -127,13 +193,40 @@ CREATE TABLE public.pr_details (
 );
 
 
-ALTER TABLE public.pr_details OWNER TO postgres;
+ALTER TABLE public.pr_facts OWNER TO postgres;
+
+--
+-- Name: pr_details; Type: VIEW; Schema: public; Owner: postgres
+--
+
+CREATE VIEW public.pr_details AS
+ SELECT f.id,
+    r.repo_name,
+    f.created_date AS start_date,
+    f.created_date AS end_date,
+    f.pr_number,
+    f.state,
+    a.author_name AS author,
+    f.merged,
+    f.merge_time,
+    f.review_time,
+    f.review_count,
+    f.comment_count,
+    f.additions,
+    f.deletions,
+    f.changed_files
+   FROM ((public.pr_facts f
+     JOIN public.repos r ON ((r.repo_id = f.repo_id)))
+     LEFT JOIN public.authors a ON ((a.author_id = f.author_id)));
+
+
+ALTER VIEW public.pr_details OWNER TO postgres;
 
 --
--- Name: pr_details_id_seq; Type: SEQUENCE; Schema: public; Owner: postgres
+-- Name: pr_facts_id_seq; Type: SEQUENCE; Schema: public; Owner: postgres
 --
 
-CREATE SEQUENCE public.pr_details_id_seq
+CREATE SEQUENCE public.pr_facts_id_seq
     AS integer
     START WITH 1
     INCREMENT BY 1
@@ -142,35 +235,95 @@ CREATE SEQUENCE public.pr_details_id_seq
     CACHE 1;
 
 
-ALTER SEQUENCE public.pr_details_id_seq OWNER TO postgres;
+ALTER SEQUENCE public.pr_facts_id_seq OWNER TO postgres;
+
+--
+-- Name: pr_facts_id_seq; Type: SEQUENCE OWNED BY; Schema: public; Owner: postgres
+--
+
+ALTER SEQUENCE public.pr_facts_id_seq OWNED BY public.pr_facts.id;
+
+
+--
+-- Name: repos_repo_id_seq; Type: SEQUENCE; Schema: public; Owner: postgres
+--
+
+CREATE SEQUENCE public.repos_repo_id_seq
+    AS integer
+    START WITH 1
+    INCREMENT BY 1
+    NO MINVALUE
+    NO MAXVALUE
+    CACHE 1;
+
+
+ALTER SEQUENCE public.repos_repo_id_seq OWNER TO postgres;
+
+--
+-- Name: repos_repo_id_seq; Type: SEQUENCE OWNED BY; Schema: public; Owner: postgres
+--
+
+ALTER SEQUENCE public.repos_repo_id_seq OWNED BY public.repos.repo_id;
+
+
+--
+-- Name: authors author_id; Type: DEFAULT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.authors ALTER COLUMN author_id SET DEFAULT nextval('public.authors_author_id_seq'::regclass);
+
+
+--
+-- Name: commit_facts id; Type: DEFAULT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.commit_facts ALTER COLUMN id SET DEFAULT nextval('public.commit_facts_id_seq'::regclass);
+
+
+--
+-- Name: pr_facts id; Type: DEFAULT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.pr_facts ALTER COLUMN id SET DEFAULT nextval('public.pr_facts_id_seq'::regclass);
+
 
 --
--- Name: pr_details_id_seq; Type: SEQUENCE OWNED BY; Schema: public; Owner: postgres
+-- Name: repos repo_id; Type: DEFAULT; Schema: public; Owner: postgres
 --
 
-ALTER SEQUENCE public.pr_details_id_seq OWNED BY public.pr_details.id;
+ALTER TABLE ONLY public.repos ALTER COLUMN repo_id SET DEFAULT nextval('public.repos_repo_id_seq'::regclass);
 
 
 --
--- Name: commit_details id; Type: DEFAULT; Schema: public; Owner: postgres
+-- Name: authors authors_author_name_key; Type: CONSTRAINT; Schema: public; Owner: postgres
 --
 
-ALTER TABLE ONLY public.commit_details ALTER COLUMN id SET DEFAULT nextval('public.commit_details_id_seq'::regclass);
+ALTER TABLE ONLY public.authors
+    ADD CONSTRAINT authors_author_name_key UNIQUE (author_name);
 
 
 --
--- Name: pr_details id; Type: DEFAULT; Schema: public; Owner: postgres
+-- Name: authors authors_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
 --
 
-ALTER TABLE ONLY public.pr_details ALTER COLUMN id SET DEFAULT nextval('public.pr_details_id_seq'::regclass);
+ALTER TABLE ONLY public.authors
+    ADD CONSTRAINT authors_pkey PRIMARY KEY (author_id);
 
 
 --
--- Name: commit_details commit_details_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
+-- Name: commit_facts commit_facts_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
 --
 
-ALTER TABLE ONLY public.commit_details
-    ADD CONSTRAINT commit_details_pkey PRIMARY KEY (id);
+ALTER TABLE ONLY public.commit_facts
+    ADD CONSTRAINT commit_facts_pkey PRIMARY KEY (id);
+
+
+--
+-- Name: commit_facts commit_facts_repo_id_commit_hash_key; Type: CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.commit_facts
+    ADD CONSTRAINT commit_facts_repo_id_commit_hash_key UNIQUE (repo_id, commit_hash);
 
 
 --
@@ -198,11 +351,95 @@ ALTER TABLE ONLY public.leads
 
 
 --
--- Name: pr_details pr_details_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
+-- Name: pr_facts pr_facts_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.pr_facts
+    ADD CONSTRAINT pr_facts_pkey PRIMARY KEY (id);
+
+
+--
+-- Name: pr_facts pr_facts_repo_id_pr_number_key; Type: CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.pr_facts
+    ADD CONSTRAINT pr_facts_repo_id_pr_number_key UNIQUE (repo_id, pr_number);
+
+
+--
+-- Name: repos repos_pkey; Type: CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.repos
+    ADD CONSTRAINT repos_pkey PRIMARY KEY (repo_id);
+
+
+--
+-- Name: repos repos_repo_name_key; Type: CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.repos
+    ADD CONSTRAINT repos_repo_name_key UNIQUE (repo_name);
+
+
+--
+-- Name: idx_commit_facts_commit_date_brin; Type: INDEX; Schema: public; Owner: postgres
+--
+
+CREATE INDEX idx_commit_facts_commit_date_brin ON public.commit_facts USING brin (commit_date);
+
+
+--
+-- Name: idx_commit_facts_repo_commit_date; Type: INDEX; Schema: public; Owner: postgres
+--
+
+CREATE INDEX idx_commit_facts_repo_commit_date ON public.commit_facts USING btree (repo_id, commit_date) INCLUDE (author_id, files_changed, additions, deletions);
+
+
+--
+-- Name: idx_pr_facts_repo_created_date; Type: INDEX; Schema: public; Owner: postgres
+--
+
+CREATE INDEX idx_pr_facts_repo_created_date ON public.pr_facts USING btree (repo_id, created_date) INCLUDE (state);
+
+
+--
+-- Name: idx_pr_facts_repo_created_date_merged; Type: INDEX; Schema: public; Owner: postgres
+--
+
+CREATE INDEX idx_pr_facts_repo_created_date_merged ON public.pr_facts USING btree (repo_id, created_date) WHERE merged;
+
+
+--
+-- Name: commit_facts commit_facts_author_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.commit_facts
+    ADD CONSTRAINT commit_facts_author_id_fkey FOREIGN KEY (author_id) REFERENCES public.authors(author_id);
+
+
+--
+-- Name: commit_facts commit_facts_repo_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.commit_facts
+    ADD CONSTRAINT commit_facts_repo_id_fkey FOREIGN KEY (repo_id) REFERENCES public.repos(repo_id);
+
+
+--
+-- Name: pr_facts pr_facts_author_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: postgres
+--
+
+ALTER TABLE ONLY public.pr_facts
+    ADD CONSTRAINT pr_facts_author_id_fkey FOREIGN KEY (author_id) REFERENCES public.authors(author_id);
+
+
+--
+-- Name: pr_facts pr_facts_repo_id_fkey; Type: FK CONSTRAINT; Schema: public; Owner: postgres
 --
 
-ALTER TABLE ONLY public.pr_details
-    ADD CONSTRAINT pr_details_pkey PRIMARY KEY (id);
+ALTER TABLE ONLY public.pr_facts
+    ADD CONSTRAINT pr_facts_repo_id_fkey FOREIGN KEY (repo_id) REFERENCES public.repos(repo_id);
 
 
 --
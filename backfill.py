@@ -0,0 +1,362 @@
+"""Parallel, resumable historical backfill of pull requests and commits.
+
+A repo's history is split into shards that worker threads fetch and store independently.
+Commits are sharded by date range (the commits endpoint filters by since / until). The
+pulls endpoint has no date filter, so pull requests are sharded by page range of the
+list sorted by creation date, oldest first: pages stay put as new PRs are appended, and
+only the pages holding PRs created in the window are visited. Every shard's outcome is
+checkpointed in backfill_progress once its rows are committed, so an interrupted run
+picks up where it stopped: re-run the same command and finished shards are skipped. A
+shard whose listing or any detail request (commit files, PR reviews / comments / files)
+failed is recorded as failed and retried by the next run.
+
+Before each shard a worker waits while the known GitHub budget (rate_limiter) is below
+BACKFILL_MIN_BUDGET, leaving headroom for the regular incremental syncs.
+
+Usage:
+    python backfill.py --from 2023-01-01 --repo grafana/grafana --workers 4
+    python backfill.py --status
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from urllib.parse import parse_qs, urlparse
+import psycopg2
+from dotenv import load_dotenv
+
+import db
+import dimensions
+import http_client
+import importpostgres
+import pagination
+import partitions
+import rate_limiter
+import rollups
+
+# --- Configuration ---
+load_dotenv()
+
+# Days of commits per shard; shards are aligned to multiples of this since a Monday, so
+# re-running with a different --from keeps every inner shard (and its checkpoint) the same
+BACKFILL_SHARD_DAYS = int(os.environ.get('BACKFILL_SHARD_DAYS', 7))
+# Pages of the creation-ordered PR list per shard (GITHUB_PAGE_SIZE PRs each)
+BACKFILL_PR_PAGES_PER_SHARD = int(os.environ.get('BACKFILL_PR_PAGES_PER_SHARD', 5))
+# Shards processed at once; each also runs FETCH_CONCURRENCY detail requests
+BACKFILL_WORKERS = int(os.environ.get('BACKFILL_WORKERS', 4))
+# Workers pause while fewer GitHub requests than this are left across the token pool
+BACKFILL_MIN_BUDGET = int(os.environ.get('BACKFILL_MIN_BUDGET', 500))
+BACKFILL_THROTTLE_SECONDS = int(os.environ.get('BACKFILL_THROTTLE_SECONDS', 60))
+
+PULLS_URL = 'https://api.github.com/repos/{repo}/pulls?state=all&sort=created&direction=asc'
+# Fact tables the backfill writes into
+BACKFILL_TABLES = ('pr_facts', 'commit_facts')
+_SHARD_ALIGNMENT = date(1970, 1, 5)
+
+
+def setup_backfill(conn):
+    """Creates the shard checkpoint table if it does not exist."""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS backfill_progress (
+                repo_name VARCHAR(255) NOT NULL,
+                kind VARCHAR(20) NOT NULL,
+                shard VARCHAR(50) NOT NULL,
+                status VARCHAR(20) NOT NULL,
+                items INTEGER,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (repo_name, kind, shard)
+            );
+            """)
+        conn.commit()
+        print("Database setup complete. Backfill progress table is ready.")
+    except psycopg2.Error as error:
+        print(f"Error during backfill setup: {error}")
+        conn.rollback()
+
+
+def record(conn, repo, kind, shard, status, items=None, error=None):
+    """Upserts a shard checkpoint ('running' counts an attempt). Commits."""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO backfill_progress (repo_name, kind, shard, status, items, attempts, error, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, now())
+            ON CONFLICT (repo_name, kind, shard) DO UPDATE
+            SET status = EXCLUDED.status, items = EXCLUDED.items, error = EXCLUDED.error,
+                attempts = backfill_progress.attempts + EXCLUDED.attempts, updated_at = now()
+        """, (repo, kind, shard, status, items, 1 if status == 'running' else 0, error))
+    conn.commit()
+
+
+def finished_shards(conn, repo):
+    """Returns {(kind, shard)} of the shards already committed for `repo`."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT kind, shard FROM backfill_progress WHERE repo_name = %s AND status = 'done'", (repo,)
+        )
+        return set(cursor.fetchall())
+
+
+def reset(conn, repo):
+    with conn.cursor() as cursor:
+        cursor.execute("DELETE FROM backfill_progress WHERE repo_name = %s", (repo,))
+    conn.commit()
+
+
+def print_status(conn, repos=None):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT repo_name, kind, status, count(*), COALESCE(sum(items), 0), max(updated_at)
+            FROM backfill_progress
+            WHERE %s::text[] IS NULL OR repo_name = ANY(%s)
+            GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+        """, (repos, repos))
+        rows = cursor.fetchall()
+    if not rows:
+        print("No backfill progress recorded.")
+    for repo, kind, status, shards, items, updated_at in rows:
+        print(f"{repo} {kind}: {shards} shards {status} ({items} items, last update {updated_at})")
+
+
+def date_shards(first_day, last_day, shard_days):
+    """Splits [first_day, last_day] into aligned (start, end) day ranges."""
+    shards = []
+    day = first_day
+    while day <= last_day:
+        offset = (day - _SHARD_ALIGNMENT).days % shard_days
+        end = min(day + timedelta(days=shard_days - offset - 1), last_day)
+        shards.append((day, end))
+        day = end + timedelta(days=1)
+    return shards
+
+
+def _pulls_page(repo, page):
+    response = http_client.get(
+        PULLS_URL.format(repo=repo), headers=importpostgres.HEADERS,
+        params={'per_page': pagination.GITHUB_PAGE_SIZE, 'page': page}
+    )
+    response.raise_for_status()
+    return response
+
+
+def _created_days(repo, page):
+    """(first, last) creation day on a page of the PR list; an empty page sorts after everything."""
+    prs = _pulls_page(repo, page).json()
+    if not prs:
+        return date.max, date.max
+    return date.fromisoformat(prs[0]['created_at'][:10]), date.fromisoformat(prs[-1]['created_at'][:10])
+
+
+def pr_page_range(repo, first_day, last_day):
+    """First and last page of the creation-ordered PR list with PRs created in the window.
+
+    Binary-searches the page bounds (a few requests) instead of listing every page.
+    Returns None when no PR was created in the window.
+    """
+    response = _pulls_page(repo, 1)
+    if not response.json():
+        return None
+    last_url = response.links.get('last', {}).get('url')
+    page_count = int(parse_qs(urlparse(last_url).query)['page'][0]) if last_url else 1
+
+    low, high = 1, page_count
+    while low < high:
+        middle = (low + high) // 2
+        if _created_days(repo, middle)[1] < first_day:
+            low = middle + 1
+        else:
+            high = middle
+    first_page = low
+    high = page_count
+    while low < high:
+        middle = (low + high + 1) // 2
+        if _created_days(repo, middle)[0] > last_day:
+            high = middle - 1
+        else:
+            low = middle
+    last_page = low
+
+    first_created, last_created = _created_days(repo, first_page)
+    if last_created < first_day or first_created > last_day:
+        return None
+    return first_page, last_page
+
+
+def page_shards(first_page, last_page, pages_per_shard):
+    """Splits [first_page, last_page] into (start, end) page ranges aligned to pages_per_shard."""
+    shards = []
+    page = first_page
+    while page <= last_page:
+        end = min(page - (page - 1) % pages_per_shard + pages_per_shard - 1, last_page)
+        shards.append((page, end))
+        page = end + 1
+    return shards
+
+
+def plan(repo, first_day, last_day, shard_days, pages_per_shard):
+    """Returns [(kind, shard_key, start, end)] covering the window for `repo`."""
+    shards = [
+        ('commits', f"{start}/{end}", start, end)
+        for start, end in date_shards(first_day, last_day, shard_days)
+    ]
+    page_range = pr_page_range(repo, first_day, last_day)
+    if page_range:
+        # Page shards only store the PRs created in the window, so the key carries it: a
+        # later run over a longer window must revisit the pages, its last one especially
+        shards.extend(
+            ('pull_requests', f"{first_day}/{last_day} pages {start}-{end}", start, end)
+            for start, end in page_shards(*page_range, pages_per_shard)
+        )
+    return shards
+
+
+def unfinished(shards, finished):
+    """The planned shards without a 'done' checkpoint in `finished` ({(kind, shard_key)})."""
+    return [shard for shard in shards if (shard[0], shard[1]) not in finished]
+
+
+def wait_for_budget(min_budget):
+    """Sleeps while the known remaining GitHub budget is below `min_budget`."""
+    while True:
+        remaining = rate_limiter.get_scheduler().remaining_budget()
+        if remaining is None or remaining >= min_budget:
+            return
+        print(f"  - GitHub budget at {remaining} requests (< {min_budget}); pausing {BACKFILL_THROTTLE_SECONDS}s")
+        time.sleep(BACKFILL_THROTTLE_SECONDS)
+
+
+def _stored(result, what):
+    loaded, errors = result
+    if errors:
+        raise RuntimeError(f"{len(errors)} {what} batches failed to load")
+    return loaded
+
+
+def backfill_commits(repo, start, end):
+    commit_metrics = importpostgres.fetch_commits(
+        repo, start.strftime('%Y-%m-%dT00:00:00Z'), end.strftime('%Y-%m-%dT23:59:59Z'),
+        raise_errors=True, raise_detail_errors=True
+    )
+    return _stored(importpostgres.store_commits_in_db(importpostgres.bucket_by_day(commit_metrics, 'commit_date')), 'commit')
+
+
+def backfill_pull_requests(repo, first_page, last_page, first_day, last_day):
+    prs = []
+    for page in range(first_page, last_page + 1):
+        page_prs = _pulls_page(repo, page).json()
+        prs.extend(pr for pr in page_prs if first_day <= date.fromisoformat(pr['created_at'][:10]) <= last_day)
+        if not page_prs or date.fromisoformat(page_prs[-1]['created_at'][:10]) > last_day:
+            break
+    pr_metrics = importpostgres.pr_metrics_for(
+        repo, prs, first_day.strftime('%Y-%m-%dT00:00:00Z'), last_day.strftime('%Y-%m-%dT23:59:59Z'),
+        raise_detail_errors=True
+    )
+    return _stored(importpostgres.store_pull_requests_in_db(importpostgres.bucket_by_day(pr_metrics, 'created_at')), 'pull request')
+
+
+def run_shard(repo, shard, first_day, last_day, min_budget):
+    """Processes one shard and checkpoints its outcome. Returns True once it is committed."""
+    kind, key, start, end = shard
+    try:
+        wait_for_budget(min_budget)
+        with db.connection() as conn:
+            record(conn, repo, kind, key, 'running')
+        if kind == 'commits':
+            items = backfill_commits(repo, start, end)
+        else:
+            items = backfill_pull_requests(repo, start, end, first_day, last_day)
+    except Exception as e:
+        print(f"  - {repo} {kind} {key} failed: {e}")
+        with db.connection() as conn:
+            record(conn, repo, kind, key, 'failed', error=str(e))
+        return False
+    with db.connection() as conn:
+        record(conn, repo, kind, key, 'done', items=items)
+    print(f"  - {repo} {kind} {key}: {items} stored")
+    return True
+
+
+def prepare_partitions(conn, first_day, last_day):
+    """Creates the monthly partitions of the window so backfilled rows skip the DEFAULT partition."""
+    for table in BACKFILL_TABLES:
+        try:
+            if not partitions.partition_column(conn, table):
+                continue
+            with conn.cursor() as cursor:
+                cursor.execute("SET LOCAL TIME ZONE 'UTC'")
+            created = partitions.ensure_partitions(conn, table, first_day, last_day)
+            conn.commit()
+            print(f"Partitions for {table}: {created} created for the backfill window")
+        except psycopg2.Error as error:
+            conn.rollback()
+            print(f"Error preparing partitions for {table}: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill pull requests and commits in parallel, resumable shards.")
+    parser.add_argument('--repo', action='append', help="repository to backfill (repeatable, default: importpostgres.GITHUB_REPOS)")
+    parser.add_argument('--from', dest='first_day', type=date.fromisoformat, help="first day (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='last_day', type=date.fromisoformat, default=date.today(),
+                        help="last day (YYYY-MM-DD, default today); PR shards are checkpointed per window, "
+                             "so pass it explicitly to resume on a later day")
+    parser.add_argument('--shard-days', type=int, default=BACKFILL_SHARD_DAYS)
+    parser.add_argument('--pr-pages', type=int, default=BACKFILL_PR_PAGES_PER_SHARD, help="PR list pages per shard")
+    parser.add_argument('--workers', type=int, default=BACKFILL_WORKERS)
+    parser.add_argument('--min-budget', type=int, default=BACKFILL_MIN_BUDGET,
+                        help="pause while fewer GitHub requests are left (0 disables)")
+    parser.add_argument('--restart', action='store_true', help="forget recorded progress and redo every shard")
+    parser.add_argument('--status', action='store_true', help="print recorded progress and exit")
+    args = parser.parse_args()
+    if not args.status and not args.first_day:
+        parser.error("--from is required unless --status is given")
+
+    conn = db.get_db_connection()
+    if not conn:
+        return
+    try:
+        setup_backfill(conn)
+        if args.status:
+            print_status(conn, args.repo)
+            return
+        dimensions.setup_dimensions(conn)
+        rollups.setup_rollups(conn)
+        prepare_partitions(conn, args.first_day, args.last_day)
+
+        repos = args.repo or importpostgres.GITHUB_REPOS
+        pending = []
+        for repo in repos:
+            if args.restart:
+                reset(conn, repo)
+            shards = plan(repo, args.first_day, args.last_day, args.shard_days, args.pr_pages)
+            todo = unfinished(shards, finished_shards(conn, repo))
+            print(f"{repo}: {len(shards)} shards, {len(shards) - len(todo)} already done")
+            pending.extend((repo, shard) for shard in todo)
+
+        failed = 0
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            futures = [
+                executor.submit(run_shard, repo, shard, args.first_day, args.last_day, args.min_budget)
+                for repo, shard in pending
+            ]
+            for future in as_completed(futures):
+                try:
+                    committed = future.result()
+                except Exception as e:
+                    # e.g. the database went away while checkpointing; the shard is retried next run
+                    print(f"  - Shard failed: {e}")
+                    committed = False
+                if not committed:
+                    failed += 1
+        print(f"Backfill finished: {len(pending) - failed} shards committed, {failed} failed"
+              + (" (re-run the same command to retry them)" if failed else ""))
+    finally:
+        db.release_connection(conn)
+        db.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import io
+import os
+from datetime import date, datetime, timedelta
+import psycopg2
+from dotenv import load_dotenv
+
+import partitions
+import row_hash_cache
+
+# --- Configuration ---
+load_dotenv()
+
+# Rows sent per COPY; each batch is committed on its own
+COPY_BATCH_SIZE = int(os.environ.get('COPY_BATCH_SIZE', 5000))
+
+
+def _copy_value(value):
+    """Renders one value in COPY's text format."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, timedelta):
+        return f"{value.total_seconds()} seconds"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    text = str(value)
+    return (text.replace('\\', '\\\\')
+                .replace('\t', '\\t')
+                .replace('\n', '\\n')
+                .replace('\r', '\\r'))
+
+
+def rows_to_buffer(rows):
+    """Writes rows into an in-memory tab-separated buffer ready for COPY FROM STDIN."""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    return buffer
+
+
+def copy_rows(conn, table, columns, rows, batch_size=None):
+    """Loads rows into `table` with COPY FROM STDIN, one committed batch at a time.
+
+    A failing batch is rolled back and reported without losing the batches before
+    it. Returns (rows_loaded, [(batch_number, row_count, error), ...]).
+    """
+    rows = list(rows)
+    batch_size = batch_size or COPY_BATCH_SIZE
+    copy_sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    loaded = 0
+    errors = []
+    for batch_number, start in enumerate(range(0, len(rows), batch_size), start=1):
+        batch = rows[start:start + batch_size]
+        try:
+            with conn.cursor() as cursor:
+                cursor.copy_expert(copy_sql, rows_to_buffer(batch))
+            conn.commit()
+            loaded += len(batch)
+        except psycopg2.Error as error:
+            conn.rollback()
+            errors.append((batch_number, len(batch), str(error)))
+            print(f"  - COPY batch {batch_number} into {table} failed ({len(batch)} rows): {error}")
+    return loaded, errors
+
+
+def copy_upsert(conn, table, columns, conflict_columns, rows, update_columns=None):
+    """Set-based upsert: COPY rows into a temp staging table, then merge with one
+    INSERT ... SELECT ... ON CONFLICT statement.
+
+    `update_columns` defaults to every non-key column; pass [] for DO NOTHING.
+    Unchanged rows are left untouched (IS DISTINCT FROM guard) and, with the row-hash
+    cache enabled, are not even sent. On a partitioned table the partition column is
+    added to the conflict target, and a row whose partition column changed replaces
+    its old version. Runs inside the caller's transaction and does not commit: finish
+    with bulk_loader.commit / rollback. Returns the number of rows inserted or updated.
+    """
+    rows = row_hash_cache.changed_rows(conn, table, columns, conflict_columns, rows)
+    if not rows:
+        return 0
+    target_columns = partitions.conflict_columns(conn, table, conflict_columns)
+    if update_columns is None:
+        update_columns = [column for column in columns if column not in target_columns]
+    stage = f"{table}_stage"
+    column_list = ', '.join(columns)
+    key_list = ', '.join(conflict_columns)
+    target_list = ', '.join(target_columns)
+    if update_columns:
+        # Only rewrite rows whose values actually changed: no dead tuples or WAL otherwise
+        conflict_action = (
+            "DO UPDATE SET " + ", ".join(f"{column} = EXCLUDED.{column}" for column in update_columns)
+            + f" WHERE ROW({', '.join(f'{table}.{column}' for column in update_columns)})"
+            + f" IS DISTINCT FROM ROW({', '.join(f'EXCLUDED.{column}' for column in update_columns)})"
+        )
+    else:
+        conflict_action = "DO NOTHING"
+
+    with conn.cursor() as cursor:
+        # Temp tables skip WAL and vanish at commit; only the loaded columns are copied
+        cursor.execute(f"DROP TABLE IF EXISTS pg_temp.{stage}")
+        cursor.execute(f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS SELECT {column_list} FROM {table} WITH NO DATA")
+        # Numbers the staged rows in COPY order, so the last row sent for a key wins
+        cursor.execute(f"ALTER TABLE {stage} ADD COLUMN stage_ordinal BIGSERIAL")
+        cursor.copy_expert(f"COPY {stage} ({column_list}) FROM STDIN", rows_to_buffer(rows))
+        if len(target_columns) > len(conflict_columns):
+            partition_column = target_columns[-1]
+            # The row lives in another partition now; ON CONFLICT cannot see it there
+            cursor.execute(f"""
+                DELETE FROM {table} USING {stage}
+                WHERE {' AND '.join(f'{table}.{column} = {stage}.{column}' for column in conflict_columns)}
+                  AND {table}.{partition_column} IS DISTINCT FROM {stage}.{partition_column};
+            """)
+        # DISTINCT ON keeps a single row per key, the last one sent, so ON CONFLICT never
+        # hits a row twice
+        cursor.execute(f"""
+            INSERT INTO {table} ({column_list})
+            SELECT DISTINCT ON ({key_list}) {column_list} FROM {stage}
+            ORDER BY {key_list}, stage_ordinal DESC
+            ON CONFLICT ({target_list}) {conflict_action};
+        """)
+        return cursor.rowcount
+
+
+def copy_upsert_batches(conn, table, columns, conflict_columns, rows, update_columns=None, batch_size=None):
+    """copy_upsert in committed batches, reporting failures like copy_rows.
+
+    Returns (rows_sent, [(batch_number, row_count, error), ...]).
+    """
+    rows = list(rows)
+    batch_size = batch_size or COPY_BATCH_SIZE
+    sent = 0
+    errors = []
+    for batch_number, start in enumerate(range(0, len(rows), batch_size), start=1):
+        batch = rows[start:start + batch_size]
+        try:
+            copy_upsert(conn, table, columns, conflict_columns, batch, update_columns)
+            commit(conn)
+            sent += len(batch)
+        except psycopg2.Error as error:
+            rollback(conn)
+            errors.append((batch_number, len(batch), str(error)))
+            print(f"  - Upsert batch {batch_number} into {table} failed ({len(batch)} rows): {error}")
+    return sent, errors
+
+
+def commit(conn):
+    """Commits conn and records the row hashes sent through copy_upsert."""
+    conn.commit()
+    row_hash_cache.commit(conn)
+
+
+def rollback(conn):
+    """Rolls back conn and forgets the row hashes sent through copy_upsert."""
+    conn.rollback()
+    row_hash_cache.discard(conn)
@@ -0,0 +1,63 @@
+import os
+import sqlite3
+import threading
+from dotenv import load_dotenv
+
+# --- Configuration ---
+load_dotenv()
+
+# A commit's files, additions and deletions never change, so entries never expire.
+# The cache is keyed by SHA only and is therefore shared by every repo and fork.
+COMMIT_CACHE_PATH = os.environ.get('COMMIT_CACHE_PATH', '.commit_cache.sqlite')
+
+_conn = None
+_lock = threading.Lock()
+
+
+def _get_conn():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(COMMIT_CACHE_PATH, check_same_thread=False)
+        _conn.execute("""
+        CREATE TABLE IF NOT EXISTS commit_detail_cache (
+            commit_hash TEXT PRIMARY KEY,
+            files_changed INTEGER NOT NULL,
+            additions INTEGER NOT NULL,
+            deletions INTEGER NOT NULL,
+            fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """)
+        _conn.commit()
+    return _conn
+
+
+def get_many(commit_hashes):
+    """Returns {sha: {'files_changed', 'additions', 'deletions'}} for every cached SHA."""
+    commit_hashes = list(commit_hashes)
+    found = {}
+    with _lock:
+        conn = _get_conn()
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(commit_hashes), 500):
+            chunk = commit_hashes[i:i + 500]
+            placeholders = ", ".join(["?"] * len(chunk))
+            rows = conn.execute(
+                f"SELECT commit_hash, files_changed, additions, deletions FROM commit_detail_cache WHERE commit_hash IN ({placeholders})",
+                chunk
+            ).fetchall()
+            for commit_hash, files_changed, additions, deletions in rows:
+                found[commit_hash] = {'files_changed': files_changed, 'additions': additions, 'deletions': deletions}
+    return found
+
+
+def put_many(details):
+    """Stores {sha: {'files_changed', 'additions', 'deletions'}} entries."""
+    if not details:
+        return
+    with _lock:
+        conn = _get_conn()
+        conn.executemany(
+            "INSERT OR IGNORE INTO commit_detail_cache (commit_hash, files_changed, additions, deletions) VALUES (?, ?, ?, ?)",
+            [(sha, d['files_changed'], d['additions'], d['deletions']) for sha, d in details.items()]
+        )
+        conn.commit()
@@ -0,0 +1,107 @@
+import os
+import threading
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import pool
+from dotenv import load_dotenv
+
+import row_hash_cache
+
+# --- Configuration ---
+load_dotenv()
+
+# Database Connection Details (read from environment)
+DB_HOST = os.environ.get("DB_HOST", "localhost")
+DB_NAME = os.environ.get("DB_NAME", "postgres")
+DB_USER = os.environ.get("DB_USER", "postgres")
+DB_PASS = os.environ.get("DB_PASS", "postgres")
+DB_PORT = os.environ.get("DB_PORT", "5432")
+
+# Connections kept open / allowed at once; raise DB_POOL_MAX for parallel writers
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", 8))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide thread-safe connection pool."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pool.ThreadedConnectionPool(
+                    DB_POOL_MIN, DB_POOL_MAX,
+                    dbname=DB_NAME,
+                    user=DB_USER,
+                    password=DB_PASS,
+                    host=DB_HOST,
+                    port=DB_PORT
+                )
+    return _pool
+
+
+def _is_healthy(conn):
+    if conn.closed:
+        return False
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def get_db_connection():
+    """Borrows a healthy connection from the pool, reconnecting if a pooled one died.
+
+    Returns None if the database cannot be reached. Hand the connection back with
+    release_connection().
+    """
+    try:
+        connection_pool = get_pool()
+        for _ in range(DB_POOL_MAX + 1):
+            conn = connection_pool.getconn()
+            if _is_healthy(conn):
+                return conn
+            # Drop the broken connection; the next getconn opens a fresh one
+            connection_pool.putconn(conn, close=True)
+        print("Error while connecting to PostgreSQL: no healthy connection available")
+    except (Exception, psycopg2.Error) as error:
+        print(f"Error while connecting to PostgreSQL: {error}")
+    return None
+
+
+def release_connection(conn):
+    """Returns a connection to the pool (closing it if it is broken)."""
+    if conn is None or _pool is None:
+        return
+    # The pool rolls back an unfinished transaction: forget the row hashes it sent
+    row_hash_cache.discard(conn)
+    _pool.putconn(conn, close=bool(conn.closed))
+
+
+@contextmanager
+def connection():
+    """Context manager around get_db_connection / release_connection.
+
+    Raises psycopg2.OperationalError when no connection can be obtained.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        raise psycopg2.OperationalError("Could not obtain a database connection")
+    try:
+        yield conn
+    finally:
+        release_connection(conn)
+
+
+def close_all():
+    """Closes every pooled connection (call once at the end of a run)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
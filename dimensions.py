@@ -0,0 +1,64 @@
+import threading
+import psycopg2
+
+# Repos and authors are stored once and referenced by integer id from the fact tables
+# (commit_facts, pr_facts); see migrate.py 004_dimensions.
+DIMENSION_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS repos (
+        repo_id SERIAL PRIMARY KEY,
+        repo_name VARCHAR(255) NOT NULL UNIQUE
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS authors (
+        author_id SERIAL PRIMARY KEY,
+        author_name VARCHAR(255) NOT NULL UNIQUE
+    );
+    """,
+]
+
+_lock = threading.Lock()
+# Ids never change once assigned, so they are cached for the life of the process
+_repo_ids = {}
+_author_ids = {}
+
+
+def setup_dimensions(conn):
+    """Creates the dimension tables if they do not exist."""
+    try:
+        with conn.cursor() as cursor:
+            for statement in DIMENSION_DDL:
+                cursor.execute(statement)
+        conn.commit()
+    except (Exception, psycopg2.Error) as error:
+        conn.rollback()
+        print(f"Error during dimension setup: {error}")
+
+
+def _ids(conn, table, id_column, name_column, names, cache):
+    names = {name for name in names if name is not None}
+    with _lock:
+        missing = sorted(names - cache.keys())
+        if missing:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {table} ({name_column}) SELECT unnest(%s::text[]) ON CONFLICT ({name_column}) DO NOTHING",
+                    (missing,)
+                )
+                cursor.execute(f"SELECT {name_column}, {id_column} FROM {table} WHERE {name_column} = ANY(%s)", (missing,))
+                found = dict(cursor.fetchall())
+            # Committed straight away so a later rollback can never leave a cached id dangling
+            conn.commit()
+            cache.update(found)
+        return {name: cache[name] for name in names}
+
+
+def repo_ids(conn, repo_names):
+    """Returns {repo_name: repo_id}, registering unknown repos. Commits."""
+    return _ids(conn, 'repos', 'repo_id', 'repo_name', repo_names, _repo_ids)
+
+
+def author_ids(conn, author_names):
+    """Returns {author_name: author_id}, registering unknown authors (None is skipped). Commits."""
+    return _ids(conn, 'authors', 'author_id', 'author_name', author_names, _author_ids)
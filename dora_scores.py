@@ -0,0 +1,206 @@
+"""Per-repo, per-day DORA component values and scores, read by the dashboard's score panels.
+
+Each row scores the trailing DORA_SCORE_WINDOW_DAYS ending on its day, using the daily
+rollups (see rollups.py) and the same CASE banding as the dashboard. Collectors refresh
+the days affected by the rollup days they rewrote; run this script daily so repos
+without new activity still get today's row.
+
+Usage:
+    python dora_scores.py              # recompute the last DORA_SCORE_WINDOW_DAYS days
+    python dora_scores.py --days 365   # recompute a longer history
+"""
+import argparse
+import os
+from datetime import datetime, timedelta, timezone
+import psycopg2
+from dotenv import load_dotenv
+
+import db
+
+# --- Configuration ---
+load_dotenv()
+
+# Trailing window each day's score covers (the dashboard's default range is 30 days)
+DORA_SCORE_WINDOW_DAYS = int(os.environ.get('DORA_SCORE_WINDOW_DAYS', 30))
+
+
+def setup_scores(conn):
+    """Creates the score table if it does not exist."""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS dora_daily_scores (
+                repo_name VARCHAR(255) NOT NULL,
+                day DATE NOT NULL,
+                window_days INTEGER NOT NULL,
+                lead_time_hours DOUBLE PRECISION,
+                deploys_per_day DOUBLE PRECISION,
+                change_failure_rate DOUBLE PRECISION,
+                mttr_hours DOUBLE PRECISION,
+                lead_time_score INTEGER NOT NULL,
+                delivery_lead_time_score INTEGER NOT NULL,
+                deploy_frequency_score INTEGER NOT NULL,
+                change_failure_rate_score INTEGER NOT NULL,
+                mttr_score INTEGER NOT NULL,
+                overall_score NUMERIC(4,2) NOT NULL,
+                rating INTEGER NOT NULL,
+                PRIMARY KEY (repo_name, day)
+            );
+            """)
+        conn.commit()
+    except (Exception, psycopg2.Error) as error:
+        conn.rollback()
+        print(f"Error during score table setup: {error}")
+
+
+# lead_time_score is the "Lead Time Score" panel's banding; delivery_lead_time_score is the
+# stricter one "Current Delivery Performance" uses inside its overall score.
+SCORE_QUERY = """
+    INSERT INTO dora_daily_scores (
+        repo_name, day, window_days, lead_time_hours, deploys_per_day, change_failure_rate, mttr_hours,
+        lead_time_score, delivery_lead_time_score, deploy_frequency_score, change_failure_rate_score,
+        mttr_score, overall_score, rating
+    )
+    WITH days AS (
+        SELECT unnest(%(days)s::date[]) AS day
+    ),
+    delivery AS (
+        SELECT d.day, SUM(s.builds) AS builds, SUM(s.successful_builds) AS successes,
+               SUM(s.failed_builds) AS failures, MIN(s.first_success_at) AS first_success,
+               MAX(s.last_success_at) AS last_success, SUM(s.recover_sum_seconds) AS recover_sum,
+               SUM(s.incidents) AS incidents
+        FROM days d
+        LEFT JOIN daily_delivery_stats s
+          ON s.repo_name = %(repo)s AND s.day > d.day - %(window)s AND s.day <= d.day
+        GROUP BY d.day
+    ),
+    lead_times AS (
+        SELECT d.day, SUM(l.lead_time_sum_seconds)::float / NULLIF(SUM(l.lead_time_count), 0) / 3600 AS hours
+        FROM days d
+        LEFT JOIN daily_lead_time l
+          ON l.repo_name = %(repo)s AND l.day > d.day - %(window)s AND l.day <= d.day
+        GROUP BY d.day
+    ),
+    metrics AS (
+        SELECT delivery.day,
+               lead_times.hours AS lead_time_hours,
+               CAST(delivery.successes AS REAL)
+                   / NULLIF(EXTRACT(DAYS FROM (delivery.last_success - delivery.first_success)), 0) AS deploys_per_day,
+               CAST(delivery.failures AS REAL) * 100 / NULLIF(delivery.builds, 0) AS change_failure_rate,
+               delivery.recover_sum::float / NULLIF(delivery.incidents, 0) / 3600 AS mttr_hours
+        FROM delivery JOIN lead_times USING (day)
+    ),
+    scores AS (
+        SELECT *,
+            CASE WHEN COALESCE(lead_time_hours, 99999) <= 1 THEN 10
+                 WHEN COALESCE(lead_time_hours, 99999) <= 24 THEN 8
+                 WHEN COALESCE(lead_time_hours, 99999) <= 168 THEN 6
+                 WHEN COALESCE(lead_time_hours, 99999) <= 720 THEN 4
+                 WHEN COALESCE(lead_time_hours, 99999) <= 4380 THEN 2
+                 ELSE 0 END AS lead_time_score,
+            CASE WHEN COALESCE(lead_time_hours, 8000) <= 24 THEN 10
+                 WHEN COALESCE(lead_time_hours, 8000) <= 168 THEN 8
+                 WHEN COALESCE(lead_time_hours, 8000) <= 720 THEN 5
+                 ELSE 2 END AS delivery_lead_time_score,
+            CASE WHEN COALESCE(deploys_per_day, 0) >= 1 THEN 10
+                 WHEN COALESCE(deploys_per_day, 0) >= 0.14 THEN 8
+                 WHEN COALESCE(deploys_per_day, 0) > 0.033 THEN 5
+                 ELSE 2 END AS deploy_frequency_score,
+            CASE WHEN COALESCE(change_failure_rate, 0) <= 15 THEN 10
+                 WHEN COALESCE(change_failure_rate, 0) <= 30 THEN 8
+                 WHEN COALESCE(change_failure_rate, 0) <= 45 THEN 5
+                 ELSE 2 END AS change_failure_rate_score,
+            CASE WHEN COALESCE(mttr_hours, 0) <= 1 THEN 10
+                 WHEN COALESCE(mttr_hours, 0) <= 24 THEN 8
+                 WHEN COALESCE(mttr_hours, 0) <= 168 THEN 5
+                 ELSE 2 END AS mttr_score
+        FROM metrics
+    ),
+    overall AS (
+        SELECT *, (delivery_lead_time_score + deploy_frequency_score + change_failure_rate_score + mttr_score) / 4.0 AS overall_score
+        FROM scores
+    )
+    SELECT %(repo)s, day, %(window)s, lead_time_hours, deploys_per_day, change_failure_rate, mttr_hours,
+           lead_time_score, delivery_lead_time_score, deploy_frequency_score, change_failure_rate_score,
+           mttr_score, overall_score,
+           CASE WHEN overall_score >= 9 THEN 4
+                WHEN overall_score >= 7 THEN 3
+                WHEN overall_score >= 4 THEN 2
+                ELSE 1 END
+    FROM overall
+"""
+
+
+def affected_days(touched_days, window_days=None, today=None):
+    """Days whose trailing window contains any of the touched rollup days (up to today, UTC)."""
+    window_days = window_days or DORA_SCORE_WINDOW_DAYS
+    today = today or datetime.now(timezone.utc).date()
+    days = set()
+    for touched in touched_days:
+        for offset in range(window_days):
+            day = touched + timedelta(days=offset)
+            if day > today:
+                break
+            days.add(day)
+    return sorted(days)
+
+
+def _write_scores(conn, repo, days):
+    params = {'repo': repo, 'days': days, 'window': DORA_SCORE_WINDOW_DAYS}
+    with conn.cursor() as cursor:
+        cursor.execute("DELETE FROM dora_daily_scores WHERE repo_name = %(repo)s AND day = ANY(%(days)s)", params)
+        cursor.execute(SCORE_QUERY, params)
+        return cursor.rowcount
+
+
+def refresh(conn, repo, touched_days):
+    """Recomputes the scores of `repo` for every day affected by the touched rollup days.
+
+    Runs in the caller's transaction and does not commit. Returns the rows written.
+    """
+    days = affected_days(touched_days)
+    if not days:
+        return 0
+    return _write_scores(conn, repo, days)
+
+
+def recompute(conn, days_back=None, repos=None):
+    """Recomputes the last `days_back` days for every repo with rollups. Commits per repo."""
+    days_back = days_back or DORA_SCORE_WINDOW_DAYS
+    today = datetime.now(timezone.utc).date()
+    days = [today - timedelta(days=offset) for offset in range(days_back)]
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT repo_name FROM daily_delivery_stats UNION SELECT repo_name FROM daily_lead_time")
+        all_repos = sorted(row[0] for row in cursor.fetchall())
+    conn.commit()
+    for repo in all_repos:
+        if repos and repo not in repos:
+            continue
+        try:
+            written = _write_scores(conn, repo, days)
+            conn.commit()
+            print(f"  - {repo}: {written} daily scores")
+        except psycopg2.Error as error:
+            conn.rollback()
+            print(f"Error computing scores for {repo}: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute the per-repo daily DORA scores.")
+    parser.add_argument('--days', type=int, help="number of days up to today to recompute")
+    parser.add_argument('--repo', action='append', help="only recompute this repository (repeatable)")
+    args = parser.parse_args()
+
+    conn = db.get_db_connection()
+    if not conn:
+        return
+    try:
+        setup_scores(conn)
+        recompute(conn, args.days, args.repo)
+    finally:
+        db.release_connection(conn)
+        db.close_all()
+
+
+if __name__ == "__main__":
+    main()
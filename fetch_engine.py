@@ -0,0 +1,58 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+import http_client
+import pagination
+
+# --- Configuration ---
+load_dotenv()
+
+# Maximum number of detail requests in flight at once. Keep this modest:
+# GitHub's secondary rate limits kick in well before the primary quota.
+FETCH_CONCURRENCY = int(os.environ.get('FETCH_CONCURRENCY', 8))
+
+
+async def _run_one(semaphore, executor, call):
+    async with semaphore:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(executor, call)
+        except Exception as e:
+            return e
+
+
+async def _run_all(calls, limit):
+    semaphore = asyncio.Semaphore(limit)
+    with ThreadPoolExecutor(max_workers=limit) as executor:
+        tasks = [_run_one(semaphore, executor, call) for call in calls]
+        return await asyncio.gather(*tasks)
+
+
+def _run(calls, limit):
+    if not calls:
+        return []
+    if limit is None:
+        limit = FETCH_CONCURRENCY
+    return asyncio.run(_run_all(calls, max(1, int(limit))))
+
+
+def fetch_all(urls, headers, limit=None):
+    """Fetches every URL with at most `limit` requests in flight.
+
+    Returns one entry per URL, in the same order: the response object, or the
+    exception raised while fetching it, so callers keep their per-call error handling.
+    """
+    calls = [lambda url=url: http_client.get(url, headers=headers) for url in urls]
+    return _run(calls, limit)
+
+
+def fetch_all_items(urls, headers, limit=None):
+    """Like fetch_all, but follows every page of each list endpoint.
+
+    Each entry is the full list of items for that URL, or the exception raised
+    (requests.HTTPError for a non-2xx page).
+    """
+    calls = [lambda url=url: list(pagination.paginate(url, headers=headers)) for url in urls]
+    return _run(calls, limit)
@@ -0,0 +1,124 @@
+import os
+from dotenv import load_dotenv
+
+import http_client
+
+# --- Configuration ---
+load_dotenv()
+
+GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN')
+GRAPHQL_URL = os.environ.get('GITHUB_GRAPHQL_URL', 'https://api.github.com/graphql')
+# PRs per GraphQL page (GitHub allows at most 100)
+GRAPHQL_PAGE_SIZE = int(os.environ.get('GRAPHQL_PAGE_SIZE', 100))
+# Reviews pulled per PR with the PR page; PRs with more get the rest paged separately
+GRAPHQL_REVIEWS_PER_PR = int(os.environ.get('GRAPHQL_REVIEWS_PER_PR', 20))
+
+HEADERS = {'Authorization': f'bearer {GITHUB_TOKEN}'}
+
+PULL_REQUESTS_QUERY = """
+query($owner: String!, $name: String!, $pageSize: Int!, $reviewsPerPr: Int!, $cursor: String) {
+  rateLimit { cost remaining resetAt }
+  repository(owner: $owner, name: $name) {
+    pullRequests(first: $pageSize, after: $cursor, orderBy: {field: UPDATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        number
+        state
+        createdAt
+        updatedAt
+        mergedAt
+        author { login }
+        additions
+        deletions
+        changedFiles
+        reviews(first: $reviewsPerPr) {
+          totalCount
+          pageInfo { hasNextPage endCursor }
+          nodes { submittedAt comments { totalCount } }
+        }
+      }
+    }
+  }
+}
+"""
+
+REVIEWS_QUERY = """
+query($owner: String!, $name: String!, $number: Int!, $pageSize: Int!, $cursor: String) {
+  rateLimit { cost remaining resetAt }
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      reviews(first: $pageSize, after: $cursor) {
+        pageInfo { hasNextPage endCursor }
+        nodes { submittedAt comments { totalCount } }
+      }
+    }
+  }
+}
+"""
+
+# Running totals of the GraphQL rate-limit points spent by this process
+QUERY_STATS = {'queries': 0, 'cost': 0, 'remaining': None, 'reset_at': None}
+
+
+class GraphQLError(Exception):
+    pass
+
+
+def run_query(query, variables, headers=None):
+    """Runs a GraphQL query and records its rate-limit cost in QUERY_STATS."""
+    response = http_client.post(GRAPHQL_URL, headers=headers or HEADERS, json={'query': query, 'variables': variables})
+    if response.status_code != 200:
+        raise GraphQLError(f"GraphQL request failed: {response.status_code} {response.text}")
+    payload = response.json()
+    if payload.get('errors'):
+        raise GraphQLError(f"GraphQL errors: {payload['errors']}")
+
+    data = payload.get('data') or {}
+    rate_limit = data.get('rateLimit')
+    QUERY_STATS['queries'] += 1
+    if rate_limit:
+        QUERY_STATS['cost'] += rate_limit.get('cost', 0)
+        QUERY_STATS['remaining'] = rate_limit.get('remaining')
+        QUERY_STATS['reset_at'] = rate_limit.get('resetAt')
+    return data
+
+
+def _complete_reviews(owner, name, node, page_size=None):
+    """Appends the reviews beyond the first page to node['reviews']['nodes'], so review
+    comment counts cover every review like the REST /comments listing does."""
+    reviews = node.get('reviews') or {}
+    page_info = reviews.get('pageInfo') or {}
+    while page_info.get('hasNextPage'):
+        data = run_query(REVIEWS_QUERY, {
+            'owner': owner,
+            'name': name,
+            'number': node['number'],
+            'pageSize': page_size or GRAPHQL_PAGE_SIZE,
+            'cursor': page_info.get('endCursor')
+        })
+        more = ((data.get('repository') or {}).get('pullRequest') or {}).get('reviews') or {}
+        reviews['nodes'].extend(more.get('nodes') or [])
+        page_info = more.get('pageInfo') or {}
+
+
+def iter_pull_requests(repo, page_size=None):
+    """Yields PR nodes for a repo, most recently updated first, following the GraphQL cursor."""
+    owner, name = repo.split('/', 1)
+    cursor = None
+    while True:
+        data = run_query(PULL_REQUESTS_QUERY, {
+            'owner': owner,
+            'name': name,
+            'pageSize': page_size or GRAPHQL_PAGE_SIZE,
+            'reviewsPerPr': GRAPHQL_REVIEWS_PER_PR,
+            'cursor': cursor
+        })
+        pull_requests = ((data.get('repository') or {}).get('pullRequests')) or {}
+        for node in pull_requests.get('nodes', []):
+            _complete_reviews(owner, name, node, page_size)
+            yield node
+
+        page_info = pull_requests.get('pageInfo') or {}
+        if not page_info.get('hasNextPage'):
+            return
+        cursor = page_info.get('endCursor')
@@ -0,0 +1,106 @@
+import os
+import threading
+import requests
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+import response_cache
+import rate_limiter
+
+# --- Configuration ---
+load_dotenv()
+
+# Number of distinct hosts we keep pools for (api.github.com, sonarcloud.io, ...)
+HTTP_POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', 4))
+# Keep-alive connections kept open per host
+HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 16))
+# (connect, read) timeouts in seconds applied when a caller does not pass one
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 5))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 30))
+DEFAULT_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Returns the process-wide requests.Session with a keep-alive pool per host."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=HTTP_POOL_MAXSIZE
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def _request(method, url, headers=None, cached=False, **kwargs):
+    """Sends one request; with `cached`, a GET goes through the response cache.
+
+    The cache key is built from the headers actually sent, so an ETag is only ever
+    replayed under the token that fetched it.
+    """
+    if not cached:
+        return get_session().request(method, url, headers=headers, **kwargs)
+    key = response_cache.cache_key(url, headers)
+    entry = response_cache.lookup(key)
+    request_headers = dict(headers or {})
+    if entry:
+        request_headers.update(response_cache.conditional_headers(entry))
+    response = get_session().request(method, url, headers=request_headers, **kwargs)
+    if response.status_code == 304 and entry:
+        return response_cache.build_cached_response(entry, response)
+    response_cache.store(key, url, response)
+    return response
+
+
+def _send(method, url, headers=None, cached=False, **kwargs):
+    """Sends one request; GitHub API calls are paced and retried by the rate-limit scheduler."""
+    if urlsplit(url).hostname not in rate_limiter.GITHUB_API_HOSTS:
+        return _request(method, url, headers=headers, cached=cached, **kwargs)
+
+    resource = 'graphql' if urlsplit(url).path.endswith('/graphql') else 'core'
+    scheduler = rate_limiter.get_scheduler()
+    for attempt in range(rate_limiter.RATE_LIMIT_MAX_RETRIES + 1):
+        token = scheduler.acquire(resource)
+        response = _request(method, url, headers=rate_limiter.with_token(headers, token), cached=cached, **kwargs)
+        if not scheduler.update(token, response):
+            return response
+        print(f"Rate limited on {url} (attempt {attempt + 1}); retrying...")
+    return response
+
+
+def get(url, headers=None, params=None, timeout=None, use_cache=True, **kwargs):
+    """Drop-in replacement for requests.get that reuses pooled connections.
+
+    When the response cache is enabled, a stored ETag / Last-Modified is sent as a
+    conditional request and a 304 is answered from the cache.
+    """
+    if timeout is None:
+        timeout = DEFAULT_TIMEOUT
+    if not (use_cache and response_cache.HTTP_CACHE_ENABLED):
+        return _send('GET', url, headers=headers, params=params, timeout=timeout, **kwargs)
+    return _send('GET', response_cache.full_url(url, params), headers=headers, cached=True, timeout=timeout, **kwargs)
+
+
+def post(url, headers=None, json=None, timeout=None, **kwargs):
+    """Drop-in replacement for requests.post that reuses pooled connections."""
+    if timeout is None:
+        timeout = DEFAULT_TIMEOUT
+    return _send('POST', url, headers=headers, json=json, timeout=timeout, **kwargs)
+
+
+def close():
+    """Closes every pooled connection (call once at the end of a run)."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
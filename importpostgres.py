@@ -1,9 +1,19 @@
 
 import os
 import requests
+import pagination
+import fetch_engine
+import commit_cache
+import bulk_loader
+import metric_kernel
+import github_graphql
+import sync_state
 import psycopg2
-import time
-from datetime import datetime, timedelta
+import db
+import dimensions
+import partitions
+import rollups
+from datetime import datetime, timedelta, timezone
 import logging
 from dotenv import load_dotenv
 load_dotenv()
@@ -12,52 +22,83 @@ logging.basicConfig(level=logging.INFO)
 
 # Load secrets from environment variables (.env)
 GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN')
-DB_HOST = os.environ.get('DB_HOST')
-DB_NAME = os.environ.get('DB_NAME')
-DB_USER = os.environ.get('DB_USER')
-DB_PASS = os.environ.get('DB_PASS')
 
 HEADERS = {'Authorization': f'token {GITHUB_TOKEN}'}
 GITHUB_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+# 'rest' (3 detail calls per PR) or 'graphql' (one query per 100 PRs)
+PR_FETCH_MODE = os.environ.get('PR_FETCH_MODE', 'rest')
+# 'range' fetches the whole window once and buckets rows into days locally;
+# 'daily' re-runs the fetch for every day of the window
+SYNC_MODE = os.environ.get('SYNC_MODE', 'range')
+# Repositories synced by main() and backfilled by default (see backfill.py)
+GITHUB_REPOS = ["grafana/grafana", "microsoft/TypeScript", "fastapi/fastapi",
+                "rvijaykumar74/github-actions-lab", "shantanu10839179/github-actions-lab",
+                "shantanu10839179/devsecopsdashboard"]
 
-def handle_rate_limit(response):
-    if response.status_code == 403 and 'X-RateLimit-Remaining' in response.headers:
-        remaining = int(response.headers['X-RateLimit-Remaining'])
-        if remaining == 0:
-            reset_time = int(response.headers['X-RateLimit-Reset'])
-            wait_time = reset_time - int(datetime.now().timestamp()) + 1
-            if wait_time > 0:
-                print(f"Rate limit exceeded. Waiting {wait_time} seconds...")
-                time.sleep(wait_time)
-                return True
-    return False
-
-def fetch_pull_requests(repo, start_date, end_date):
+class DetailFetchError(RuntimeError):
+    """Raised (with raise_detail_errors) when commit or pull request detail requests failed."""
+
+
+def _detail_items(result):
+    """Unwraps one fetch_engine.fetch_all_items entry, re-raising a failed fetch."""
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+def _stop_before(window_start, updated_since):
+    """Paging stops at the window start or the watermark, whichever is later."""
+    if updated_since and updated_since > window_start:
+        return updated_since
+    return window_start
+
+def fetch_pull_requests(repo, start_date, end_date, concurrency=None, updated_since=None, raise_errors=False,
+                        raise_detail_errors=False):
+    """With raise_errors, a failed listing raises instead of returning no pull requests; with
+    raise_detail_errors, failed detail requests raise (see pr_metrics_for)."""
     print(f"Fetching pull requests for {repo} from {start_date} to {end_date}")
-    prs_url = f'https://api.github.com/repos/{repo}/pulls?state=all&since={start_date}'
-    prs_response = requests.get(prs_url, headers=HEADERS)
-    
-    if prs_response.status_code != 200:
-        print(f"Error fetching pull requests: {prs_response.status_code}")
-        print(f"Response: {prs_response.text}")
-        return []
-        
-    prs_data = prs_response.json()
-    if not isinstance(prs_data, list):
-        print(f"Unexpected response format: {prs_data}")
+    # The pulls endpoint ignores `since`. Walk the most recently updated first: every PR
+    # created in the window was updated after its start, so we can stop once updated_at
+    # drops below the window start (or below the watermark on incremental runs).
+    prs_url = f'https://api.github.com/repos/{repo}/pulls?state=all&sort=updated&direction=desc'
+    window_start = datetime.strptime(start_date, GITHUB_DATETIME_FORMAT)
+    window_end = datetime.strptime(end_date, GITHUB_DATETIME_FORMAT)
+    stop_before = _stop_before(window_start, updated_since)
+
+    prs = []
+    try:
+        for pr in pagination.paginate(prs_url, headers=HEADERS):
+            if datetime.strptime(pr['updated_at'], GITHUB_DATETIME_FORMAT) < stop_before:
+                break
+            pr_created_at = datetime.strptime(pr['created_at'], GITHUB_DATETIME_FORMAT)
+            if pr_created_at > window_end or pr_created_at < window_start:
+                continue
+            prs.append(pr)
+    except requests.exceptions.HTTPError as e:
+        print(f"Error fetching pull requests: {e.response.status_code}")
+        print(f"Response: {e.response.text}")
+        if raise_errors:
+            raise
         return []
 
+    pr_metrics = pr_metrics_for(repo, prs, start_date, end_date, concurrency, raise_detail_errors)
+    print(f"Fetched {len(pr_metrics)} pull requests for {repo} from {start_date} to {end_date}")
+    return pr_metrics
+
+def pr_metrics_for(repo, prs, start_date, end_date, concurrency=None, raise_detail_errors=False):
+    """Builds the pr_metric rows of already listed PRs (fetches their reviews, comments and files).
+
+    With raise_detail_errors, failed detail requests raise once every row is built instead
+    of leaving their counts at zero.
+    """
     pr_metrics = []
-    for pr in prs_data:
-        pr_created_at = datetime.strptime(pr['created_at'], GITHUB_DATETIME_FORMAT)
-        if pr_created_at > datetime.strptime(end_date, GITHUB_DATETIME_FORMAT):
-            continue
+    for pr in prs:
 
         pr_metric = {
             'repo_name': repo,
             'start_date': start_date,
             'end_date': end_date,
             'pr_number': pr['number'],
+            'created_at': pr['created_at'],
             'state': pr['state'],
             'author': pr['user']['login'],
             'merged': pr['merged_at'] is not None,
@@ -70,90 +111,181 @@ def fetch_pull_requests(repo, start_date, end_date):
             'changed_files': 0
         }
 
-        if pr_metric['merged']:
-            pr_metric['merge_time'] = datetime.strptime(pr['merged_at'], GITHUB_DATETIME_FORMAT) - datetime.strptime(pr['created_at'], GITHUB_DATETIME_FORMAT)
+        pr_metrics.append(pr_metric)
+
+    # Merge times of the whole batch at once (None for unmerged PRs)
+    created_times = [pr['created_at'] for pr in prs]
+    merge_times = metric_kernel.intervals(created_times, [pr['merged_at'] for pr in prs])
+    for pr_metric, merge_time in zip(pr_metrics, merge_times):
+        pr_metric['merge_time'] = merge_time
+
+    # Issue the /reviews, /comments and /files calls for every PR concurrently, following every page
+    detail_urls = []
+    for pr in prs:
+        detail_urls.extend([pr['url'] + '/reviews', pr['url'] + '/comments', pr['url'] + '/files'])
+    detail_results = fetch_engine.fetch_all_items(detail_urls, HEADERS, limit=concurrency)
+
+    first_review_times = [None] * len(prs)
+    detail_errors = 0
+    for index, (pr, pr_metric) in enumerate(zip(prs, pr_metrics)):
+        reviews_result, comments_result, files_result = detail_results[index * 3:index * 3 + 3]
 
-        reviews_url = pr['url'] + '/reviews'
         try:
-            reviews_response = requests.get(reviews_url, headers=HEADERS)
-            if reviews_response.status_code == 200:
-                reviews_data = reviews_response.json()
-                pr_metric['review_count'] = len(reviews_data)
-                if reviews_data:
-                    pr_metric['review_time'] = datetime.strptime(reviews_data[0]['submitted_at'], GITHUB_DATETIME_FORMAT) - datetime.strptime(pr['created_at'], GITHUB_DATETIME_FORMAT)
-            else:
-                print(f"Error fetching reviews: {reviews_response.status_code}")
+            reviews_data = _detail_items(reviews_result)
+            pr_metric['review_count'] = len(reviews_data)
+            if reviews_data:
+                first_review_times[index] = reviews_data[0].get('submitted_at')
+        except requests.exceptions.HTTPError as e:
+            print(f"Error fetching reviews: {e.response.status_code}")
+            detail_errors += 1
         except Exception as e:
             print(f"Error processing reviews: {str(e)}")
             pr_metric['review_count'] = 0
+            detail_errors += 1
 
-        comments_url = pr['url'] + '/comments'
         try:
-            comments_response = requests.get(comments_url, headers=HEADERS)
-            if comments_response.status_code == 200:
-                comments_data = comments_response.json()
-                pr_metric['comment_count'] = len(comments_data)
-            else:
-                print(f"Error fetching comments: {comments_response.status_code}")
-                pr_metric['comment_count'] = 0
+            comments_data = _detail_items(comments_result)
+            pr_metric['comment_count'] = len(comments_data)
+        except requests.exceptions.HTTPError as e:
+            print(f"Error fetching comments: {e.response.status_code}")
+            pr_metric['comment_count'] = 0
+            detail_errors += 1
         except Exception as e:
             print(f"Error processing comments: {str(e)}")
             pr_metric['comment_count'] = 0
+            detail_errors += 1
 
-        files_url = pr['url'] + '/files'
         try:
-            files_response = requests.get(files_url, headers=HEADERS)
-            if files_response.status_code == 200:
-                files_data = files_response.json()
-                pr_metric['changed_files'] = len(files_data)
-                for file in files_data:
-                    pr_metric['additions'] += file.get('additions', 0)
-                    pr_metric['deletions'] += file.get('deletions', 0)
-            else:
-                print(f"Error fetching files: {files_response.status_code}")
+            files_data = _detail_items(files_result)
+            pr_metric['changed_files'] = len(files_data)
+            for file in files_data:
+                pr_metric['additions'] += file.get('additions', 0)
+                pr_metric['deletions'] += file.get('deletions', 0)
+        except requests.exceptions.HTTPError as e:
+            print(f"Error fetching files: {e.response.status_code}")
+            detail_errors += 1
         except Exception as e:
             print(f"Error processing files: {str(e)}")
             pr_metric['changed_files'] = 0
+            detail_errors += 1
 
-        pr_metrics.append(pr_metric)
+    review_times = metric_kernel.intervals(created_times, first_review_times)
+    for pr_metric, review_time in zip(pr_metrics, review_times):
+        pr_metric['review_time'] = review_time
+    if raise_detail_errors and detail_errors:
+        raise DetailFetchError(f"{detail_errors} pull request detail requests failed")
+    return pr_metrics
 
-    print(f"Fetched {len(pr_metrics)} pull requests for {repo} from {start_date} to {end_date}")
+def fetch_pull_requests_graphql(repo, start_date, end_date, updated_since=None, raise_errors=False):
+    """GraphQL variant of fetch_pull_requests: same pr_metric rows, one query per page of PRs."""
+    print(f"Fetching pull requests (GraphQL) for {repo} from {start_date} to {end_date}")
+    window_start = datetime.strptime(start_date, GITHUB_DATETIME_FORMAT)
+    window_end = datetime.strptime(end_date, GITHUB_DATETIME_FORMAT)
+    stop_before = _stop_before(window_start, updated_since)
+    cost_before = github_graphql.QUERY_STATS['cost']
+
+    pr_metrics = []
+    merged_times = []
+    first_review_times = []
+    try:
+        for pr in github_graphql.iter_pull_requests(repo):
+            # PRs come most recently updated first, same stopping rule as the REST path
+            if datetime.strptime(pr['updatedAt'], GITHUB_DATETIME_FORMAT) < stop_before:
+                break
+            pr_created_at = datetime.strptime(pr['createdAt'], GITHUB_DATETIME_FORMAT)
+            if pr_created_at > window_end or pr_created_at < window_start:
+                continue
+
+            reviews = pr.get('reviews') or {}
+            review_nodes = reviews.get('nodes') or []
+            pr_metric = {
+                'repo_name': repo,
+                'start_date': start_date,
+                'end_date': end_date,
+                'pr_number': pr['number'],
+                'created_at': pr['createdAt'],
+                'state': 'open' if pr['state'] == 'OPEN' else 'closed',
+                'author': (pr.get('author') or {}).get('login', 'ghost'),
+                'merged': pr['mergedAt'] is not None,
+                'merge_time': None,
+                'review_time': None,
+                'review_count': reviews.get('totalCount', 0),
+                'comment_count': sum((review.get('comments') or {}).get('totalCount', 0) for review in review_nodes),
+                'additions': pr.get('additions', 0),
+                'deletions': pr.get('deletions', 0),
+                'changed_files': pr.get('changedFiles', 0)
+            }
+
+            merged_times.append(pr['mergedAt'])
+            first_review_times.append(review_nodes[0].get('submittedAt') if review_nodes else None)
+            pr_metrics.append(pr_metric)
+    except github_graphql.GraphQLError as e:
+        print(f"Error fetching pull requests via GraphQL: {e}")
+        if raise_errors:
+            raise
+
+    # Merge and first-review times of the whole batch at once
+    created_times = [pr_metric['created_at'] for pr_metric in pr_metrics]
+    merge_times = metric_kernel.intervals(created_times, merged_times)
+    review_times = metric_kernel.intervals(created_times, first_review_times)
+    for pr_metric, merge_time, review_time in zip(pr_metrics, merge_times, review_times):
+        pr_metric['merge_time'] = merge_time
+        pr_metric['review_time'] = review_time
+
+    print(f"Fetched {len(pr_metrics)} pull requests for {repo} from {start_date} to {end_date} "
+          f"(GraphQL cost {github_graphql.QUERY_STATS['cost'] - cost_before}, remaining {github_graphql.QUERY_STATS['remaining']})")
     return pr_metrics
 
-def fetch_commits(repo, start_date, end_date):
+def _commit_metric(repo, start_date, end_date, commit):
+    commit_date = datetime.strptime(commit['commit']['author']['date'], GITHUB_DATETIME_FORMAT).date()
+    return {
+        'repo_name': repo,
+        'start_date': start_date,
+        'end_date': end_date,
+        'commit_date': commit_date.strftime('%Y-%m-%d'),  # Convert to string
+        'commit_hash': commit['sha'],
+        'commit_user': commit['commit']['author']['name'],
+        'commit_message': commit['commit']['message'],
+        'files_changed': 0,
+        'additions': 0,
+        'deletions': 0
+    }
+
+def fetch_commits(repo, start_date, end_date, concurrency=None, raise_errors=False, raise_detail_errors=False):
+    """With raise_errors, a failed listing raises instead of returning no commits; with
+    raise_detail_errors, failed detail requests raise instead of leaving file counts at zero."""
     print(f"Fetching commits for {repo} from {start_date} to {end_date}")
     commits_url = f'https://api.github.com/repos/{repo}/commits?since={start_date}&until={end_date}'
-    commits_response = requests.get(commits_url, headers=HEADERS)
-    
-    if commits_response.status_code != 200:
-        print(f"Error fetching commits: {commits_response.status_code}")
-        print(f"Response: {commits_response.text}")
-        return []
-        
-    commits_data = commits_response.json()
-    if not isinstance(commits_data, list):
-        print(f"Unexpected response format: {commits_data}")
-        return []
 
     commit_metrics = []
-    for commit in commits_data:
-        commit_date = datetime.strptime(commit['commit']['author']['date'], GITHUB_DATETIME_FORMAT).date()
-        commit_metric = {
-            'repo_name': repo,
-            'start_date': start_date,
-            'end_date': end_date,
-            'commit_date': commit_date.strftime('%Y-%m-%d'),  # Convert to string
-            'commit_hash': commit['sha'],
-            'commit_user': commit['commit']['author']['name'],
-            'commit_message': commit['commit']['message'],
-            'files_changed': 0,
-            'additions': 0,
-            'deletions': 0
-        }
+    try:
+        for commit in pagination.paginate(commits_url, headers=HEADERS):
+            commit_metrics.append(_commit_metric(repo, start_date, end_date, commit))
+    except requests.exceptions.HTTPError as e:
+        print(f"Error fetching commits: {e.response.status_code}")
+        print(f"Response: {e.response.text}")
+        if raise_errors:
+            raise
+        return []
+
+    # Commit details are immutable: serve what we can from the SHA cache
+    cached_details = commit_cache.get_many(commit_metric['commit_hash'] for commit_metric in commit_metrics)
+    for commit_metric in commit_metrics:
+        if commit_metric['commit_hash'] in cached_details:
+            commit_metric.update(cached_details[commit_metric['commit_hash']])
+    uncached = [commit_metric for commit_metric in commit_metrics if commit_metric['commit_hash'] not in cached_details]
+    print(f"Commit detail cache: {len(cached_details)} hits, {len(uncached)} to fetch")
 
-        commit_details_url = f'https://api.github.com/repos/{repo}/commits/{commit["sha"]}'
+    # Fetch the remaining per-SHA details concurrently
+    detail_urls = [f'https://api.github.com/repos/{repo}/commits/{commit_metric["commit_hash"]}' for commit_metric in uncached]
+    detail_responses = fetch_engine.fetch_all(detail_urls, HEADERS, limit=concurrency)
+
+    fetched_details = {}
+    detail_errors = 0
+    for commit_metric, commit_details_response in zip(uncached, detail_responses):
         try:
-            commit_details_response = requests.get(commit_details_url, headers=HEADERS)
+            if isinstance(commit_details_response, Exception):
+                raise commit_details_response
             if commit_details_response.status_code == 200:
                 commit_details_data = commit_details_response.json()
                 files_data = commit_details_data.get('files', [])
@@ -161,37 +293,64 @@ def fetch_commits(repo, start_date, end_date):
                 for file in files_data:
                     commit_metric['additions'] += file.get('additions', 0)
                     commit_metric['deletions'] += file.get('deletions', 0)
+                fetched_details[commit_metric['commit_hash']] = {
+                    'files_changed': commit_metric['files_changed'],
+                    'additions': commit_metric['additions'],
+                    'deletions': commit_metric['deletions']
+                }
             else:
                 print(f"Error fetching commit details: {commit_details_response.status_code}")
+                detail_errors += 1
         except Exception as e:
             print(f"Error processing commit details: {str(e)}")
             commit_metric['files_changed'] = 0
-
-        commit_metrics.append(commit_metric)
+            detail_errors += 1
+    commit_cache.put_many(fetched_details)
+    if raise_detail_errors and detail_errors:
+        raise DetailFetchError(f"{detail_errors} commit detail requests failed")
 
     print(f"Fetched {len(commit_metrics)} commits for {repo} from {start_date} to {end_date}")
     return commit_metrics
 
-def store_pull_requests_in_db(pr_metrics):
+PR_FACTS_COLUMNS = ['repo_id', 'created_date', 'pr_number', 'state', 'author_id', 'merged', 'merge_time', 'review_time', 'review_count', 'comment_count', 'additions', 'deletions', 'changed_files']
+COMMIT_FACTS_COLUMNS = ['repo_id', 'commit_date', 'commit_hash', 'author_id', 'commit_message', 'files_changed', 'additions', 'deletions']
+# Natural keys (see migrate.py 001_natural_keys / 004_dimensions): reruns update rows instead of appending duplicates
+PR_FACTS_KEY = ['repo_id', 'pr_number']
+COMMIT_FACTS_KEY = ['repo_id', 'commit_hash']
+
+def store_pull_requests_in_db(pr_metrics, batch_size=None):
     print(f"Storing {len(pr_metrics)} pull requests in the database")
     conn = None
     try:
-        conn = psycopg2.connect(host=DB_HOST, dbname=DB_NAME, user=DB_USER, password=DB_PASS)
-        cursor = conn.cursor()
-        insert_query = """
-        INSERT INTO pr_details (repo_name, start_date, end_date, pr_number, state, author, merged, merge_time, review_time, review_count, comment_count, additions, deletions, changed_files)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        for pr_metric in pr_metrics:
-            try:
-                cursor.execute(insert_query, (pr_metric['repo_name'], pr_metric['start_date'], pr_metric['end_date'], pr_metric['pr_number'], pr_metric['state'], pr_metric['author'], pr_metric['merged'], pr_metric['merge_time'], pr_metric['review_time'], pr_metric['review_count'], pr_metric['comment_count'], pr_metric['additions'], pr_metric['deletions'], pr_metric['changed_files']))
-            except Exception as e:
-                print(f"Error inserting PR metric: {e}")
-                print(f"PR metric data: {pr_metric}")
-                conn.rollback()
-                continue
+        conn = db.get_db_connection()
+        if conn is None:
+            raise psycopg2.OperationalError("Could not obtain a database connection")
+        repo_ids = dimensions.repo_ids(conn, [pr_metric['repo_name'] for pr_metric in pr_metrics])
+        author_ids = dimensions.author_ids(conn, [pr_metric['author'] for pr_metric in pr_metrics])
+        rows = [(
+            repo_ids[pr_metric['repo_name']],
+            pr_metric['start_date'],
+            pr_metric['pr_number'],
+            pr_metric['state'],
+            author_ids.get(pr_metric['author']),
+            pr_metric['merged'],
+            pr_metric['merge_time'],
+            pr_metric['review_time'],
+            pr_metric['review_count'],
+            pr_metric['comment_count'],
+            pr_metric['additions'],
+            pr_metric['deletions'],
+            pr_metric['changed_files']
+        ) for pr_metric in pr_metrics]
+        loaded, errors = bulk_loader.copy_upsert_batches(
+            conn, 'pr_facts', PR_FACTS_COLUMNS, PR_FACTS_KEY, rows, batch_size=batch_size
+        )
+        # Recompute the dashboard's daily rollups for the days just written
+        touched = [(pr_metric['repo_name'], pr_metric['start_date']) for pr_metric in pr_metrics]
+        rollups.refresh_rows(conn, 'daily_pr_activity', touched, 0, [1])
         conn.commit()
-        print(f"Stored {len(pr_metrics)} pull requests in the database")
+        print(f"Stored {loaded} pull requests in the database ({len(errors)} failed batches)")
+        return loaded, errors
     except Exception as e:
         print(f"Database connection error: {e}")
         if conn:
@@ -199,43 +358,36 @@ def store_pull_requests_in_db(pr_metrics):
         raise
     finally:
         if conn:
-            conn.close()
+            db.release_connection(conn)
 
-def store_commits_in_db(commit_metrics):
+def store_commits_in_db(commit_metrics, batch_size=None):
     print(f"Storing {len(commit_metrics)} commits in the database")
     conn = None
     try:
-        conn = psycopg2.connect(host=DB_HOST, dbname=DB_NAME, user=DB_USER, password=DB_PASS)
-        cursor = conn.cursor()
-        insert_query = """
-        INSERT INTO commit_details (repo_name, start_date, end_date, commit_date, commit_hash, commit_user, commit_message, files_changed, additions, deletions)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        for commit_metric in commit_metrics:
-            print(f"Inserting commit: {commit_metric}")
-            try:
-                # Ensure all values are strings, and provide default values for integer columns
-                sql_command = cursor.mogrify(insert_query, (
-                    str(commit_metric['repo_name']), 
-                    str(commit_metric['start_date']), 
-                    str(commit_metric['end_date']), 
-                    str(commit_metric['commit_date']), 
-                    str(commit_metric['commit_hash']),
-                    str(commit_metric['commit_user']),
-                    str(commit_metric['commit_message']),
-                    int(commit_metric['files_changed'] if commit_metric['files_changed'] is not None else 0),
-                    int(commit_metric['additions'] if commit_metric['additions'] is not None else 0),
-                    int(commit_metric['deletions'] if commit_metric['deletions'] is not None else 0)
-                ))
-                print(f"Executed SQL: {sql_command}")
-                cursor.execute(sql_command)
-            except Exception as e:
-                print(f"Error inserting commit: {commit_metric}")
-                print(e)
-                conn.rollback()
-                continue
+        conn = db.get_db_connection()
+        if conn is None:
+            raise psycopg2.OperationalError("Could not obtain a database connection")
+        repo_ids = dimensions.repo_ids(conn, [commit_metric['repo_name'] for commit_metric in commit_metrics])
+        author_ids = dimensions.author_ids(conn, [commit_metric['commit_user'] for commit_metric in commit_metrics])
+        rows = [(
+            repo_ids[commit_metric['repo_name']],
+            commit_metric['commit_date'],
+            commit_metric['commit_hash'],
+            author_ids.get(commit_metric['commit_user']),
+            commit_metric['commit_message'],
+            # Provide default values for integer columns
+            int(commit_metric['files_changed'] or 0),
+            int(commit_metric['additions'] or 0),
+            int(commit_metric['deletions'] or 0)
+        ) for commit_metric in commit_metrics]
+        loaded, errors = bulk_loader.copy_upsert_batches(
+            conn, 'commit_facts', COMMIT_FACTS_COLUMNS, COMMIT_FACTS_KEY, rows, batch_size=batch_size
+        )
+        touched = [(commit_metric['repo_name'], commit_metric['commit_date']) for commit_metric in commit_metrics]
+        rollups.refresh_rows(conn, 'daily_commit_activity', touched, 0, [1])
         conn.commit()
-        print(f"Stored {len(commit_metrics)} commits in the database")
+        print(f"Stored {loaded} commits in the database ({len(errors)} failed batches)")
+        return loaded, errors
     except Exception as e:
         print(f"Database connection error: {e}")
         if conn:
@@ -243,31 +395,92 @@ def store_commits_in_db(commit_metrics):
         raise
     finally:
         if conn:
-            cursor.close()
-            conn.close()
-######
-def main():
-    repos = ["grafana/grafana", "microsoft/TypeScript","fastapi/fastapi",
-    "rvijaykumar74/github-actions-lab","shantanu10839179/github-actions-lab",
-    "shantanu10839179/devsecopsdashboard"]  
-    # List of repositories
-    start_date = datetime.strptime('2025-08-25', '%Y-%m-%d')
-    end_date = datetime.strptime('2025-10-23', '%Y-%m-%d')
+            db.release_connection(conn)
+
+def bucket_by_day(metrics, date_key):
+    """Sets start_date / end_date on every row to the bounds of the day it falls on."""
+    for metric in metrics:
+        day = str(metric[date_key])[:10]
+        metric['start_date'] = f'{day}T00:00:00Z'
+        metric['end_date'] = f'{day}T23:59:59Z'
+    return metrics
+
+def fetch_pull_requests_for_mode(repo, start_datetime, end_datetime, updated_since=None, raise_errors=False,
+                                 raise_detail_errors=False):
+    if PR_FETCH_MODE == 'graphql':
+        return fetch_pull_requests_graphql(repo, start_datetime, end_datetime, updated_since, raise_errors)
+    return fetch_pull_requests(repo, start_datetime, end_datetime, updated_since=updated_since, raise_errors=raise_errors,
+                               raise_detail_errors=raise_detail_errors)
+
+def sync_range(repo, start_datetime, end_datetime, watermark=None):
+    """Fetches every PR and commit in the window once, then files them under their own day.
 
+    With a watermark, only PRs updated and commits authored after it are fetched.
+    Returns the watermark to store for the next run, or None when a batch failed to
+    load. A failed listing or detail request raises, so the window is fetched again next
+    time instead of keeping rows with zeroed counts.
+    """
+    run_started_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    updated_since = watermark.astimezone(timezone.utc).replace(tzinfo=None) if watermark else None
+
+    pr_metrics = fetch_pull_requests_for_mode(
+        repo, start_datetime, end_datetime, updated_since, raise_errors=True, raise_detail_errors=True
+    )
+    _, pr_errors = store_pull_requests_in_db(bucket_by_day(pr_metrics, 'created_at'))
+
+    commits_since = start_datetime
+    if updated_since and updated_since > datetime.strptime(start_datetime, GITHUB_DATETIME_FORMAT):
+        commits_since = updated_since.strftime(GITHUB_DATETIME_FORMAT)
+    commit_metrics = fetch_commits(repo, commits_since, end_datetime, raise_errors=True, raise_detail_errors=True)
+    _, commit_errors = store_commits_in_db(bucket_by_day(commit_metrics, 'commit_date'))
+
+    if pr_errors or commit_errors:
+        print(f"{len(pr_errors) + len(commit_errors)} batches failed to load for {repo}; keeping its watermark")
+        return None
+    return min(run_started_at, datetime.strptime(end_datetime, GITHUB_DATETIME_FORMAT)).replace(tzinfo=timezone.utc)
+
+def sync_daily(repo, start_date, end_date):
+    """Legacy mode: one fetch per repo per day of the window."""
     current_date = start_date
     while current_date <= end_date:
         start_datetime = current_date.strftime('%Y-%m-%dT00:00:00Z')
         end_datetime = current_date.strftime('%Y-%m-%dT23:59:59Z')
         print(f"Processing data for {current_date.strftime('%Y-%m-%d')}")
-        for repo in repos:
-            pr_metrics = fetch_pull_requests(repo, start_datetime, end_datetime)
-            store_pull_requests_in_db(pr_metrics)
-            
-            commit_metrics = fetch_commits(repo, start_datetime, end_datetime)
-            store_commits_in_db(commit_metrics)
-        
-        current_date += timedelta(days=1)
+        pr_metrics = fetch_pull_requests_for_mode(repo, start_datetime, end_datetime)
+        store_pull_requests_in_db(pr_metrics)
+
+        commit_metrics = fetch_commits(repo, start_datetime, end_datetime)
+        store_commits_in_db(commit_metrics)
         print(f"Completed processing for {current_date.strftime('%Y-%m-%d')}")
+        current_date += timedelta(days=1)
+
+######
+def main():
+    start_date = datetime.strptime('2025-08-25', '%Y-%m-%d')
+    end_date = datetime.strptime('2025-10-23', '%Y-%m-%d')
+
+    conn = db.get_db_connection()
+    if not conn:
+        return
+    sync_state.setup_sync_state(conn)
+    dimensions.setup_dimensions(conn)
+    partitions.maintain(conn)
+    rollups.setup_rollups(conn)
+    try:
+        for repo in GITHUB_REPOS:
+            if SYNC_MODE == 'daily':
+                sync_daily(repo, start_date, end_date)
+                continue
+            watermark, _ = sync_state.get_watermark(conn, repo, 'importpostgres')
+            try:
+                new_watermark = sync_range(repo, start_date.strftime('%Y-%m-%dT00:00:00Z'), end_date.strftime('%Y-%m-%dT23:59:59Z'), watermark)
+            except (requests.exceptions.RequestException, github_graphql.GraphQLError, DetailFetchError) as e:
+                print(f"Error syncing {repo}, keeping its watermark: {e}")
+                continue
+            sync_state.set_watermark(conn, repo, 'importpostgres', new_watermark)
+    finally:
+        db.release_connection(conn)
+        db.close_all()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""Batch timestamp parsing and duration math shared by the collectors.
+
+The timestamps of a whole batch are converted to datetime64 arrays once, and durations
+and filters are computed on the arrays. The results are the same tuples and values the
+inserters already take: timezone-aware UTC datetimes, integer seconds and timedeltas.
+Without NumPy the same results are computed record by record.
+"""
+from datetime import datetime, timedelta, timezone
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def parse_timestamp(value):
+    """ISO 8601 string (GitHub's ...Z form included) or datetime -> aware UTC datetime."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _naive_utc_text(value):
+    if value is None:
+        return 'NaT'
+    if isinstance(value, str) and value.endswith('+00:00'):
+        return value[:-6]
+    return parse_timestamp(value).replace(tzinfo=None).isoformat()
+
+
+def to_datetime64(values):
+    """Converts a batch of timestamps to a datetime64[us] array in UTC (NaT for None)."""
+    # GitHub's ...Z strings only need the suffix dropped; NumPy parses the rest in C
+    return np.array(
+        [value[:-1] if type(value) is str and value[-1:] == 'Z' else _naive_utc_text(value) for value in values],
+        dtype='datetime64[us]'
+    )
+
+
+def parse_timestamps(values):
+    """Parses a batch of timestamps into aware UTC datetimes (None stays None)."""
+    return [
+        datetime.fromisoformat(value[:-1] + '+00:00') if type(value) is str and value[-1:] == 'Z' else parse_timestamp(value)
+        for value in values
+    ]
+
+
+def seconds_between(starts, ends):
+    """Seconds from each start to its end, as floats (NaN / None where either is missing)."""
+    if np is None:
+        seconds = []
+        for start, end in zip(starts, ends):
+            start, end = parse_timestamp(start), parse_timestamp(end)
+            seconds.append(None if start is None or end is None else (end - start).total_seconds())
+        return seconds
+    return (to_datetime64(ends) - to_datetime64(starts)) / np.timedelta64(1, 's')
+
+
+def intervals(starts, ends):
+    """timedelta from each start to its end, or None where either is missing."""
+    if np is None:
+        return [None if seconds is None else timedelta(seconds=seconds) for seconds in seconds_between(starts, ends)]
+    return (to_datetime64(ends) - to_datetime64(starts)).tolist()
+
+
+def lead_time_rows(repo, records):
+    """(pr_number, first_commit_at, merged_at) records -> lead_time_to_change rows.
+
+    Rows are (repo, pr_number, first_commit_at, merged_at, lead_time_in_seconds); records
+    with a missing timestamp or a negative lead time are dropped.
+    """
+    numbers = [record[0] for record in records]
+    first_commits = [record[1] for record in records]
+    merges = [record[2] for record in records]
+    if np is None:
+        rows = []
+        for number, first_commit_at, merged_at, seconds in zip(numbers, first_commits, merges, seconds_between(first_commits, merges)):
+            if seconds is not None and seconds >= 0:
+                rows.append((repo, number, parse_timestamp(first_commit_at), parse_timestamp(merged_at), int(seconds)))
+        return rows
+    seconds = (to_datetime64(merges) - to_datetime64(first_commits)) / np.timedelta64(1, 's')
+    keep = np.flatnonzero(seconds >= 0).tolist()  # NaN compares False
+    first_at = parse_timestamps([first_commits[index] for index in keep])
+    merged_at = parse_timestamps([merges[index] for index in keep])
+    lead_seconds = seconds[keep].astype(np.int64).tolist()
+    return [
+        (repo, numbers[index], first, merged, lead)
+        for index, first, merged, lead in zip(keep, first_at, merged_at, lead_seconds)
+    ]
+
+
+def run_rows(repo, runs):
+    """Workflow runs ({'id', 'conclusion', 'started_at', 'completed_at'}) -> CFR and duration rows.
+
+    Returns (cfr_rows, duration_rows) in the order of `runs`: every success / failure is a
+    (repo, run_id, conclusion, completed_at) CFR row, and also a
+    (repo, run_id, duration_in_seconds, completed_at) duration row when the duration is not
+    negative.
+    """
+    counted = [run for run in runs if run['conclusion'] in ('success', 'failure')]
+    starts = [run['started_at'] for run in counted]
+    ends = [run['completed_at'] for run in counted]
+    if np is None:
+        completed = parse_timestamps(ends)
+        seconds = seconds_between(starts, ends)
+        cfr_rows = [(repo, run['id'], run['conclusion'], at) for run, at in zip(counted, completed)]
+        duration_rows = [
+            (repo, run['id'], int(duration), at)
+            for run, at, duration in zip(counted, completed, seconds) if duration is not None and duration >= 0
+        ]
+        return cfr_rows, duration_rows
+    seconds = (to_datetime64(ends) - to_datetime64(starts)) / np.timedelta64(1, 's')
+    completed = parse_timestamps(ends)
+    cfr_rows = [(repo, run['id'], run['conclusion'], at) for run, at in zip(counted, completed)]
+    keep = np.flatnonzero(seconds >= 0).tolist()
+    durations = seconds[keep].astype(np.int64).tolist()
+    duration_rows = [
+        (repo, counted[index]['id'], duration, completed[index])
+        for index, duration in zip(keep, durations)
+    ]
+    return cfr_rows, duration_rows
@@ -0,0 +1,560 @@
+"""Schema migrations for the collector tables.
+
+Usage:
+    python migrate.py            # apply every pending migration
+    python migrate.py --list     # show applied / pending migrations
+    python migrate.py NAME ...   # apply (or re-apply) the named migrations
+    python migrate.py --check    # EXPLAIN the dashboard queries against the current indexes
+    python migrate.py --maintain # create upcoming partitions and apply partition retention
+
+Migrations in OPTIONAL_MIGRATIONS are only applied when named explicitly.
+"""
+import argparse
+import json
+import os
+import re
+from datetime import date, datetime, timedelta, timezone
+import psycopg2
+
+import db
+import dimensions
+import partitions
+import rollups
+import workflow_runs
+
+
+# --- Migrations ---
+
+def _relation_exists(cursor, name):
+    cursor.execute("SELECT to_regclass(%s)", (name,))
+    return cursor.fetchone()[0] is not None
+
+
+def _constraint_exists(cursor, name):
+    cursor.execute("SELECT 1 FROM pg_constraint WHERE conname = %s", (name,))
+    return cursor.fetchone() is not None
+
+
+def dedupe_natural_keys(conn):
+    """Removes duplicate commit_details / pr_details rows and adds natural unique keys.
+
+    Reruns of importpostgres used to append a new row per commit / PR every time.
+    The most recently inserted row (highest id) is kept.
+    """
+    with conn.cursor() as cursor:
+        if _relation_exists(cursor, 'commit_facts'):
+            print("  - Skipped: the tables already use the 004_dimensions layout")
+            return
+        cursor.execute("""
+            DELETE FROM commit_details older
+            USING commit_details newer
+            WHERE older.repo_name = newer.repo_name
+              AND older.commit_hash = newer.commit_hash
+              AND older.id < newer.id;
+        """)
+        print(f"  - Removed {cursor.rowcount} duplicate commit_details rows")
+        cursor.execute("""
+            DELETE FROM pr_details older
+            USING pr_details newer
+            WHERE older.repo_name = newer.repo_name
+              AND older.pr_number = newer.pr_number
+              AND older.id < newer.id;
+        """)
+        print(f"  - Removed {cursor.rowcount} duplicate pr_details rows")
+        if not _constraint_exists(cursor, 'commit_details_repo_name_commit_hash_key'):
+            cursor.execute("""
+                ALTER TABLE commit_details
+                    ADD CONSTRAINT commit_details_repo_name_commit_hash_key UNIQUE (repo_name, commit_hash);
+            """)
+        if not _constraint_exists(cursor, 'pr_details_repo_name_pr_number_key'):
+            cursor.execute("""
+                ALTER TABLE pr_details
+                    ADD CONSTRAINT pr_details_repo_name_pr_number_key UNIQUE (repo_name, pr_number);
+            """)
+
+
+# Indexes serving the "$__timeFilter(<time>) AND repo IN (...)" filters of the dashboard and
+# of the rollup refreshes: (name, table, method, definition). INCLUDE columns let the
+# aggregates run as index-only scans; BRIN is kept on time columns that grow in insert order.
+DASHBOARD_INDEXES = [
+    ('idx_commit_facts_repo_commit_date', 'commit_facts', 'btree',
+     '(repo_id, commit_date) INCLUDE (author_id, files_changed, additions, deletions)'),
+    ('idx_commit_facts_commit_date_brin', 'commit_facts', 'brin', '(commit_date)'),
+    ('idx_pr_facts_repo_created_date', 'pr_facts', 'btree', '(repo_id, created_date) INCLUDE (state)'),
+    ('idx_pr_facts_repo_created_date_merged', 'pr_facts', 'btree', '(repo_id, created_date) WHERE merged'),
+    ('idx_lead_time_to_change_repo_merged_at', 'lead_time_to_change', 'btree',
+     '(repo_name, merged_at) INCLUDE (lead_time_in_seconds)'),
+    ('idx_change_failure_rate_runs_repo_completed_at', 'change_failure_rate_runs', 'btree',
+     '(repo_name, completed_at) INCLUDE (conclusion)'),
+    ('idx_change_failure_rate_runs_completed_at_brin', 'change_failure_rate_runs', 'brin', '(completed_at)'),
+    ('idx_build_durations_repo_completed_at', 'build_durations', 'btree',
+     '(repo_name, completed_at) INCLUDE (duration_in_seconds)'),
+    ('idx_build_durations_completed_at_brin', 'build_durations', 'brin', '(completed_at)'),
+    ('idx_incidents_for_mttr_repo_resolution_time', 'incidents_for_mttr', 'btree',
+     '(repo_name, resolution_time) INCLUDE (time_to_recover_in_seconds)'),
+]
+
+
+def create_dashboard_indexes(conn):
+    """Builds DASHBOARD_INDEXES with CREATE INDEX CONCURRENTLY so collectors keep writing.
+
+    Needs autocommit. An index left INVALID by an interrupted build is dropped and rebuilt;
+    tables that have not been created yet are skipped (re-run the migration later).
+    """
+    built = set()
+    with conn.cursor() as cursor:
+        for name, table, method, definition in DASHBOARD_INDEXES:
+            cursor.execute("SELECT to_regclass(%s)", (table,))
+            if cursor.fetchone()[0] is None:
+                print(f"  - Skipping {name}: table {table} does not exist")
+                continue
+            cursor.execute("""
+                SELECT i.indisvalid FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+            """, (name,))
+            existing = cursor.fetchone()
+            if existing and not existing[0]:
+                print(f"  - Dropping invalid index {name}")
+                cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            # Partitioned parents do not support CONCURRENTLY (their indexes are built with the table)
+            concurrently = '' if partitions.partition_column(conn, table) else 'CONCURRENTLY '
+            cursor.execute(f"CREATE INDEX {concurrently}IF NOT EXISTS {name} ON {table} USING {method} {definition}")
+            print(f"  - {name} ready")
+            built.add(table)
+        for table in sorted(built):
+            cursor.execute(f"ANALYZE {table}")
+
+
+# Natural keys of the partitionable fact tables; the partition column is appended when partitioned
+PARTITIONED_TABLE_KEYS = {
+    'commit_facts': ['repo_id', 'commit_hash'],
+    'pr_facts': ['repo_id', 'pr_number'],
+    'change_failure_rate_runs': ['repo_name', 'run_id'],
+    'build_durations': ['repo_name', 'run_id'],
+}
+
+
+# Views keeping the pre-004 table names and columns readable: fact table -> (view, definition)
+COMPATIBILITY_VIEWS = {
+    'commit_facts': ('commit_details', """
+        CREATE OR REPLACE VIEW commit_details AS
+        SELECT f.id, r.repo_name, f.commit_date AS start_date, f.commit_date AS end_date, f.commit_date,
+               f.commit_hash, a.author_name AS commit_user, f.commit_message, f.files_changed,
+               f.additions, f.deletions
+        FROM commit_facts f
+        JOIN repos r ON r.repo_id = f.repo_id
+        LEFT JOIN authors a ON a.author_id = f.author_id;
+    """),
+    'pr_facts': ('pr_details', """
+        CREATE OR REPLACE VIEW pr_details AS
+        SELECT f.id, r.repo_name, f.created_date AS start_date, f.created_date AS end_date, f.pr_number,
+               f.state, a.author_name AS author, f.merged, f.merge_time, f.review_time, f.review_count,
+               f.comment_count, f.additions, f.deletions, f.changed_files
+        FROM pr_facts f
+        JOIN repos r ON r.repo_id = f.repo_id
+        LEFT JOIN authors a ON a.author_id = f.author_id;
+    """),
+}
+
+
+def partition_fact_tables(conn):
+    """Rebuilds the fact tables in partitions.PARTITIONED_TABLES as monthly range partitions.
+
+    Each table is copied into a new partitioned table with a DEFAULT partition and one
+    partition per month of existing data (plus PARTITION_MONTHS_AHEAD), keeping its id
+    sequence. Primary and unique keys gain the partition column, as PostgreSQL requires.
+    Takes an exclusive lock on each table for the copy: run it in a quiet window.
+    """
+    this_month = partitions.month_start(date.today())
+    with conn.cursor() as cursor:
+        # Month boundaries are UTC, like the partition bounds
+        cursor.execute("SET LOCAL TIME ZONE 'UTC'")
+        for table, column in partitions.PARTITIONED_TABLES.items():
+            cursor.execute("SELECT to_regclass(%s)", (table,))
+            if cursor.fetchone()[0] is None:
+                print(f"  - Skipping {table}: table does not exist")
+                continue
+            if partitions.partition_column(conn, table):
+                print(f"  - {table} is already partitioned")
+                continue
+            view = COMPATIBILITY_VIEWS.get(table)
+            if view:
+                cursor.execute(f"DROP VIEW IF EXISTS {view[0]}")
+            old = f"{table}_unpartitioned"
+            cursor.execute(f"ALTER TABLE {table} RENAME TO {old}")
+            cursor.execute(f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY RANGE ({column})")
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", (old,))
+            sequence = cursor.fetchone()[0]
+            if sequence:
+                cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+            partitions.reset_cache()
+            cursor.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+
+            cursor.execute(f"SELECT min({column}), max({column}) FROM {old}")
+            first, last = cursor.fetchone()
+            first_month = partitions.month_start(first) if first else this_month
+            last_month = max(partitions.month_start(last) if last else this_month, this_month)
+            created = partitions.ensure_partitions(
+                conn, table, first_month, partitions.add_months(last_month, partitions.PARTITION_MONTHS_AHEAD)
+            )
+            cursor.execute(f"INSERT INTO {table} SELECT * FROM {old}")
+            print(f"  - {table}: copied {cursor.rowcount} rows into {created} monthly partitions")
+            cursor.execute(f"DROP TABLE {old}")
+
+            cursor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, {column})")
+            key = partitions.conflict_columns(conn, table, PARTITIONED_TABLE_KEYS[table])
+            cursor.execute(f"ALTER TABLE {table} ADD UNIQUE ({', '.join(key)})")
+            for name, index_table, method, definition in DASHBOARD_INDEXES:
+                if index_table == table:
+                    cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING {method} {definition}")
+            if view:
+                # CREATE TABLE ... LIKE does not copy foreign keys
+                cursor.execute(f"""
+                    ALTER TABLE {table}
+                        ADD FOREIGN KEY (repo_id) REFERENCES repos (repo_id),
+                        ADD FOREIGN KEY (author_id) REFERENCES authors (author_id)
+                """)
+                cursor.execute(view[1])
+
+
+# Other fact tables whose repos are registered in the repos dimension
+REPO_FACT_TABLES = ['lead_time_to_change', 'change_failure_rate_runs', 'build_durations', 'incidents_for_mttr']
+
+
+def _to_fact_table(conn, cursor, table, fact, author_column, dropped_columns, renamed_column=None):
+    """Turns one name-keyed table into a fact table referencing repos / authors."""
+    cursor.execute(f"DELETE FROM {table} WHERE repo_name IS NULL")
+    if cursor.rowcount:
+        print(f"  - Removed {cursor.rowcount} {table} rows without a repository")
+    cursor.execute(f"ALTER TABLE {table} RENAME TO {fact}")
+    # Monthly partitions (003_monthly_partitions) follow the parent's name
+    cursor.execute("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+    """, (fact,))
+    for (child,) in cursor.fetchall():
+        if child.startswith(f"{table}_"):
+            cursor.execute(f"ALTER TABLE {child} RENAME TO {fact}{child[len(table):]}")
+    partitions.reset_cache()
+    if renamed_column:
+        cursor.execute(f"ALTER TABLE {fact} RENAME COLUMN {renamed_column[0]} TO {renamed_column[1]}")
+
+    cursor.execute(f"""
+        ALTER TABLE {fact}
+            ADD COLUMN repo_id INTEGER REFERENCES repos (repo_id),
+            ADD COLUMN author_id INTEGER REFERENCES authors (author_id)
+    """)
+    cursor.execute(f"""
+        UPDATE {fact} f SET
+            repo_id = (SELECT r.repo_id FROM repos r WHERE r.repo_name = f.repo_name),
+            author_id = (SELECT a.author_id FROM authors a WHERE a.author_name = f.{author_column})
+    """)
+    print(f"  - {fact}: {cursor.rowcount} rows linked to repos / authors")
+
+    # The natural key and the dashboard indexes are rebuilt on repo_id below
+    cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'u'", (fact,))
+    for (constraint,) in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE {fact} DROP CONSTRAINT {constraint}")
+    cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s AND indexname LIKE %s", (fact, f"idx\\_{table}\\_%"))
+    for (index,) in cursor.fetchall():
+        cursor.execute(f"DROP INDEX IF EXISTS {index}")
+    dropped = ['repo_name', author_column] + dropped_columns
+    cursor.execute(f"ALTER TABLE {fact} " + ", ".join(f"DROP COLUMN {column}" for column in dropped))
+    cursor.execute(f"ALTER TABLE {fact} ALTER COLUMN repo_id SET NOT NULL")
+
+    key = partitions.conflict_columns(conn, fact, PARTITIONED_TABLE_KEYS[fact])
+    cursor.execute(f"ALTER TABLE {fact} ADD CONSTRAINT {fact}_{'_'.join(key)}_key UNIQUE ({', '.join(key)})")
+    for name, index_table, method, definition in DASHBOARD_INDEXES:
+        if index_table == fact:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {fact} USING {method} {definition}")
+    cursor.execute(COMPATIBILITY_VIEWS[fact][1])
+
+
+def normalize_dimensions(conn):
+    """Moves commit_details / pr_details onto integer-keyed repos and authors dimensions.
+
+    The tables become commit_facts / pr_facts with repo_id / author_id in place of the
+    repeated names. pr_details' start_date/end_date window (always the PR's creation day)
+    becomes created_date and commits drop theirs (always commit_date). Views named
+    commit_details / pr_details keep the old columns for existing queries. Repos of the
+    other fact tables are registered too, so repos lists every repository.
+    """
+    with conn.cursor() as cursor:
+        if _relation_exists(cursor, 'commit_facts'):
+            print("  - Skipped: commit_facts already exists")
+            return
+        for statement in dimensions.DIMENSION_DDL:
+            cursor.execute(statement)
+        sources = [table for table in ['commit_details', 'pr_details'] + REPO_FACT_TABLES if _relation_exists(cursor, table)]
+        if sources:
+            cursor.execute(
+                "INSERT INTO repos (repo_name) "
+                + " UNION ".join(f"SELECT repo_name FROM {table} WHERE repo_name IS NOT NULL" for table in sources)
+                + " ON CONFLICT (repo_name) DO NOTHING"
+            )
+            print(f"  - Registered {cursor.rowcount} repositories")
+        cursor.execute("""
+            INSERT INTO authors (author_name)
+            SELECT commit_user FROM commit_details WHERE commit_user IS NOT NULL
+            UNION
+            SELECT author FROM pr_details WHERE author IS NOT NULL
+            ON CONFLICT (author_name) DO NOTHING
+        """)
+        print(f"  - Registered {cursor.rowcount} authors")
+        _to_fact_table(conn, cursor, 'commit_details', 'commit_facts', 'commit_user', ['start_date', 'end_date'])
+        _to_fact_table(conn, cursor, 'pr_details', 'pr_facts', 'author', ['end_date'], ('start_date', 'created_date'))
+        for table in ['commit_facts', 'pr_facts']:
+            cursor.execute(f"ANALYZE {table}")
+
+
+# Tables keyed by CI run id: (table, run id column, time column their daily rollup buckets by)
+RUN_TABLES = [
+    ('change_failure_rate_runs', 'run_id', 'completed_at'),
+    ('build_durations', 'run_id', 'completed_at'),
+    ('incidents_for_mttr', 'failed_run_id', 'resolution_time'),
+]
+# GitHub deletes workflow runs after this many days; older rows cannot be checked or re-collected
+RUN_RETENTION_DAYS = int(os.environ.get('RUN_RETENTION_DAYS', 400))
+GITHUB_HEADERS = {
+    'Authorization': f"token {os.environ.get('GITHUB_TOKEN')}",
+    'Accept': 'application/vnd.github.v3+json'
+}
+
+
+def remove_check_run_ids(conn):
+    """Removes the runs stored under check-run ids, before runs came from /actions/runs.
+
+    UNIQUE (repo_name, run_id) cannot tell a commit's old check-run row from its new
+    workflow-run row, so keeping both would count the commit twice. Every run id of the
+    last RUN_RETENTION_DAYS is looked up on /actions/runs/{id}, and only the ids GitHub
+    does not know as workflow runs are removed; older rows are kept, as their runs could
+    not be collected again. The mttr_cfr watermarks of the repos that lost rows are
+    cleared so the next MTTRCFR run collects its PR_LOOKBACK_DAYS window again, and the
+    emptied rollup days are recomputed.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=RUN_RETENTION_DAYS)
+    tables = []
+    is_workflow_run = {}
+    with conn.cursor() as cursor:
+        for table, id_column, time_column in RUN_TABLES:
+            if not _relation_exists(cursor, table):
+                continue
+            tables.append((table, id_column, time_column))
+            cursor.execute(
+                f"SELECT DISTINCT repo_name, {id_column} FROM {table} WHERE {time_column} >= %s", (cutoff,)
+            )
+            for key in cursor.fetchall():
+                is_workflow_run[key] = None
+        print(f"  - Checking {len(is_workflow_run)} run ids from the last {RUN_RETENTION_DAYS} days against GitHub")
+        # A failed lookup raises, which rolls the migration back
+        for repo, run_id in is_workflow_run:
+            is_workflow_run[(repo, run_id)] = workflow_runs.is_workflow_run(repo, run_id, GITHUB_HEADERS)
+        stale = [key for key, known in is_workflow_run.items() if not known]
+
+        touched = []
+        for table, id_column, time_column in tables:
+            cursor.execute(f"""
+                DELETE FROM {table}
+                WHERE {time_column} >= %s
+                  AND (repo_name, {id_column}) IN (SELECT unnest(%s::text[]), unnest(%s::bigint[]))
+                RETURNING repo_name, {time_column}
+            """, (cutoff, [repo for repo, _ in stale], [run_id for _, run_id in stale]))
+            rows = cursor.fetchall()
+            touched.extend(rows)
+            print(f"  - Removed {len(rows)} {table} rows keyed by check-run ids")
+        repos = sorted({repo for repo, _ in touched})
+        if repos and _relation_exists(cursor, 'sync_state'):
+            cursor.execute("DELETE FROM sync_state WHERE collector = 'mttr_cfr' AND repo_name = ANY(%s)", (repos,))
+        rollups_exist = _relation_exists(cursor, 'daily_delivery_stats')
+    if rollups_exist:
+        rollups.refresh_rows(conn, 'daily_delivery_stats', touched, 0, [1])
+    times = [time for _, time in touched if time is not None]
+    if times:
+        days = (date.today() - min(times).date()).days + 1
+        print(f"  - The oldest removed run is from {min(times):%Y-%m-%d}; run MTTRCFR.py once with "
+              f"PR_LOOKBACK_DAYS={days} to collect that history again")
+
+
+# Applied in order. Each entry is (name, function, runs_in_transaction).
+MIGRATIONS = [
+    ('001_natural_keys', dedupe_natural_keys, True),
+    ('002_dashboard_indexes', create_dashboard_indexes, False),
+    ('003_monthly_partitions', partition_fact_tables, True),
+    ('004_dimensions', normalize_dimensions, True),
+    ('005_workflow_run_ids', remove_check_run_ids, True),
+]
+# Opt-in: skipped by a plain `python migrate.py`, applied with `python migrate.py NAME`
+OPTIONAL_MIGRATIONS = {'003_monthly_partitions', '005_workflow_run_ids'}
+
+
+# --- Dashboard query check ---
+
+DASHBOARD_PATH = 'Final DevOps Grafana Dashboard.json'
+CHECKED_TABLES = {table for _, table, _, _ in DASHBOARD_INDEXES} | set(rollups.ROLLUP_QUERIES) | {'dora_daily_scores'}
+_RELATIVE_TIME = re.compile(r'now-(\d+)([mhdwMy])')
+_TIME_UNITS = {'m': 'minutes', 'h': 'hours', 'd': 'days', 'w': 'weeks', 'M': 'months', 'y': 'years'}
+
+
+def dashboard_queries(path=DASHBOARD_PATH):
+    """Returns (panel title, rawSql, default repos, default 'from') for every SQL panel."""
+    with open(path) as f:
+        dashboard = json.load(f)
+    repos = []
+    for variable in dashboard.get('templating', {}).get('list', []):
+        if variable.get('name') == 'repo':
+            repos = variable.get('current', {}).get('value', [])
+    time_from = dashboard.get('time', {}).get('from', 'now-30d')
+
+    def walk(panels):
+        for panel in panels:
+            yield panel
+            yield from walk(panel.get('panels', []))
+
+    queries = []
+    for panel in walk(dashboard.get('panels', [])):
+        for target in panel.get('targets', []):
+            if target.get('rawSql'):
+                queries.append((panel.get('title', ''), target['rawSql']))
+    return queries, repos, time_from
+
+
+def render_query(sql, repos, time_from):
+    """Expands the Grafana macros the way the PostgreSQL data source does."""
+    match = _RELATIVE_TIME.fullmatch(time_from)
+    interval = f"{match.group(1)} {_TIME_UNITS[match.group(2)]}" if match else '30 days'
+    sql = re.sub(r'\$__timeFilter\((\w+)\)', rf"\1 BETWEEN now() - interval '{interval}' AND now()", sql)
+    repo_list = ', '.join("'" + repo.replace("'", "''") + "'" for repo in repos) or 'NULL'
+    return sql.replace('${repo:sqlstring}', repo_list)
+
+
+def _plan_scans(plan):
+    """Yields (node type, relation, index) for every scan in an EXPLAIN (FORMAT JSON) plan."""
+    if 'Relation Name' in plan:
+        yield plan['Node Type'], plan['Relation Name'], plan.get('Index Name')
+    for child in plan.get('Plans', []):
+        yield from _plan_scans(child)
+
+
+def check_dashboard_queries(conn, repos=None, time_from=None):
+    """EXPLAINs every dashboard panel query and reports sequential scans on the fact tables.
+
+    Returns the number of panels that still sequentially scan a fact table.
+    """
+    queries, default_repos, default_from = dashboard_queries()
+    repos = repos or default_repos
+    time_from = time_from or default_from
+    seq_scans = 0
+    for title, sql in queries:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("EXPLAIN (FORMAT JSON) " + render_query(sql, repos, time_from))
+                plan = cursor.fetchone()[0][0]['Plan']
+            conn.rollback()
+        except psycopg2.Error as error:
+            conn.rollback()
+            print(f"[error] {title}: {error}".rstrip())
+            continue
+        scans = [(node, relation, index) for node, relation, index in _plan_scans(plan) if relation in CHECKED_TABLES]
+        sequential = [relation for node, relation, _ in scans if node == 'Seq Scan']
+        status = 'seq ' if sequential else 'ok  '
+        seq_scans += bool(sequential)
+        used = ', '.join(f"{node} on {relation}" + (f" using {index}" if index else '') for node, relation, index in scans)
+        print(f"[{status}] {title}: {used or 'no fact table scans'}")
+    # On small tables the planner rightly prefers a sequential scan; judge on production-sized data
+    print(f"{seq_scans} of {len(queries)} panel queries use a sequential scan on a fact table")
+    return seq_scans
+
+
+# --- Runner ---
+
+def setup_migrations_table(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            name VARCHAR(255) PRIMARY KEY,
+            applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        );
+        """)
+    conn.commit()
+
+
+def applied_migrations(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT name FROM schema_migrations")
+        return {row[0] for row in cursor.fetchall()}
+
+
+def run_migration(conn, name, function, in_transaction):
+    print(f"Applying migration {name}...")
+    if not in_transaction:
+        # e.g. CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        conn.rollback()
+        conn.autocommit = True
+    try:
+        function(conn)
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO schema_migrations (name) VALUES (%s)
+                ON CONFLICT (name) DO UPDATE SET applied_at = CURRENT_TIMESTAMP;
+            """, (name,))
+        if in_transaction:
+            conn.commit()
+        print(f"Migration {name} applied.")
+        return True
+    except (Exception, psycopg2.Error) as error:
+        if in_transaction:
+            conn.rollback()
+        print(f"Migration {name} failed: {error}")
+        return False
+    finally:
+        conn.autocommit = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply schema migrations to the metrics database.")
+    parser.add_argument('names', nargs='*', help="migrations to apply (default: every pending one)")
+    parser.add_argument('--list', action='store_true', help="list migrations and whether they are applied")
+    parser.add_argument('--maintain', action='store_true', help="create upcoming monthly partitions and apply retention")
+    parser.add_argument('--check', action='store_true', help="EXPLAIN the dashboard panel queries and report sequential scans")
+    parser.add_argument('--repo', action='append', help="repository used by --check (default: the dashboard's selection)")
+    parser.add_argument('--from', dest='time_from', help="relative start used by --check, e.g. now-90d (default: the dashboard's range)")
+    args = parser.parse_args()
+
+    conn = db.get_db_connection()
+    if not conn:
+        return
+    try:
+        setup_migrations_table(conn)
+        applied = applied_migrations(conn)
+
+        if args.list:
+            for name, _, _ in MIGRATIONS:
+                optional = ' (optional)' if name in OPTIONAL_MIGRATIONS else ''
+                print(f"{'[x]' if name in applied else '[ ]'} {name}{optional}")
+            return
+        if args.maintain:
+            partitions.maintain(conn)
+            return
+        if args.check:
+            check_dashboard_queries(conn, args.repo, args.time_from)
+            return
+
+        known = {name for name, _, _ in MIGRATIONS}
+        for name in args.names:
+            if name not in known:
+                print(f"Unknown migration: {name}")
+                return
+        for name, function, in_transaction in MIGRATIONS:
+            if args.names:
+                wanted = name in args.names
+            else:
+                wanted = name not in applied and name not in OPTIONAL_MIGRATIONS
+            if wanted and not run_migration(conn, name, function, in_transaction):
+                break
+    finally:
+        db.release_connection(conn)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import os
-import requests
-import psycopg2
+import http_client
+import pagination
+import db
 from dotenv import load_dotenv
 from datetime import datetime
 
@@ -9,11 +10,6 @@ load_dotenv()
 SONAR_TOKEN = os.environ.get('SONAR_TOKEN')
 SONAR_ORG = 'shantanu10839179'
 SONAR_HOST = "https://sonarcloud.io"
-DB_HOST = os.environ.get('DB_HOST', 'localhost')
-DB_NAME = os.environ.get('DB_NAME', 'postgres')
-DB_USER = os.environ.get('DB_USER', 'postgres')
-DB_PASS = os.environ.get('DB_PASS', 'postgres')
-DB_PORT = os.environ.get('DB_PORT', '5432')
 
 HEADERS = {'Authorization': f'Bearer {SONAR_TOKEN}'}
 
@@ -25,10 +21,8 @@ METRICS = [
 ]
 
 def get_public_projects():
-    url = f"{SONAR_HOST}/api/projects/search?organization={SONAR_ORG}&ps=500"
-    resp = requests.get(url, headers=HEADERS)
-    resp.raise_for_status()
-    projects = resp.json().get('components', [])
+    url = f"{SONAR_HOST}/api/projects/search"
+    projects = pagination.paginate_sonar(url, headers=HEADERS, params={'organization': SONAR_ORG}, item_key='components')
     return [p for p in projects if p.get('visibility') == 'public']
 
 def get_project_measures(project_key):
@@ -38,7 +32,7 @@ def get_project_measures(project_key):
         'metricKeys': ','.join(METRICS),
         'organization': SONAR_ORG
     }
-    resp = requests.get(url, headers=HEADERS, params=params)
+    resp = http_client.get(url, headers=HEADERS, params=params)
     if resp.status_code == 404:
         return None
     resp.raise_for_status()
@@ -48,7 +42,7 @@ def get_project_measures(project_key):
 def get_latest_analysis_date(project_key):
     url = f"{SONAR_HOST}/api/project_analyses/search"
     params = {'project': project_key, 'organization': SONAR_ORG}
-    resp = requests.get(url, headers=HEADERS, params=params)
+    resp = http_client.get(url, headers=HEADERS, params=params)
     if resp.status_code != 200:
         return None
     data = resp.json()
@@ -109,9 +103,9 @@ def main():
     projects = get_public_projects()
     print(f"Found {len(projects)} public projects.")
 
-    conn = psycopg2.connect(
-        dbname=DB_NAME, user=DB_USER, password=DB_PASS, host=DB_HOST, port=DB_PORT
-    )
+    conn = db.get_db_connection()
+    if not conn:
+        return
     setup_database(conn)
 
     all_data = []
@@ -147,7 +141,7 @@ def main():
     else:
         print("No SonarQube data to insert.")
 
-    conn.close()
+    db.release_connection(conn)
     print("Done.")
 
 if __name__ == "__main__":
@@ -0,0 +1,69 @@
+import os
+from dotenv import load_dotenv
+
+import http_client
+
+# --- Configuration ---
+load_dotenv()
+
+# Items requested per page (GitHub caps this at 100, SonarCloud at 500)
+GITHUB_PAGE_SIZE = int(os.environ.get('GITHUB_PAGE_SIZE', 100))
+SONAR_PAGE_SIZE = int(os.environ.get('SONAR_PAGE_SIZE', 500))
+
+
+def _with_page_size(url, params, key, size):
+    # Leave an explicit page size in the URL or params alone
+    if f'{key}=' in url or (params and key in params):
+        return params
+    params = dict(params or {})
+    params[key] = size
+    return params
+
+
+def paginate(url, headers=None, params=None, item_key=None, per_page=None, max_items=None):
+    """Yields items from a GitHub list endpoint, following Link: rel="next".
+
+    `item_key` selects the list inside wrapped payloads such as {"check_runs": [...]}.
+    Pages are only requested as the caller consumes items, so breaking out of the
+    loop stops paging. Raises requests.HTTPError on a non-2xx page.
+    """
+    params = _with_page_size(url, params, 'per_page', per_page or GITHUB_PAGE_SIZE)
+    yielded = 0
+    while url:
+        response = http_client.get(url, headers=headers, params=params)
+        response.raise_for_status()
+        payload = response.json()
+        items = payload.get(item_key, []) if item_key else payload
+        for item in items:
+            yield item
+            yielded += 1
+            if max_items is not None and yielded >= max_items:
+                return
+        # The next link already carries every query parameter
+        url = response.links.get('next', {}).get('url')
+        params = None
+
+
+def paginate_sonar(url, headers=None, params=None, item_key='components', page_size=None, max_items=None):
+    """Yields items from a SonarCloud list endpoint using its p / ps / paging.total scheme."""
+    params = dict(params or {})
+    params['ps'] = page_size or params.get('ps') or SONAR_PAGE_SIZE
+    page = 1
+    yielded = 0
+    while True:
+        params['p'] = page
+        response = http_client.get(url, headers=headers, params=params)
+        response.raise_for_status()
+        payload = response.json()
+        items = payload.get(item_key, [])
+        for item in items:
+            yield item
+            yielded += 1
+            if max_items is not None and yielded >= max_items:
+                return
+
+        paging = payload.get('paging', {})
+        total = paging.get('total', 0)
+        if not items or page * int(params['ps']) >= total:
+            return
+        page += 1
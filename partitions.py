@@ -0,0 +1,192 @@
+import os
+import re
+from datetime import date, datetime, timezone
+import psycopg2
+from dotenv import load_dotenv
+
+# --- Configuration ---
+load_dotenv()
+
+# Monthly partitions kept ready beyond the current month
+PARTITION_MONTHS_AHEAD = int(os.environ.get('PARTITION_MONTHS_AHEAD', 3))
+# Partitions whose whole month is older than this many months are retired; 0 keeps everything
+PARTITION_RETENTION_MONTHS = int(os.environ.get('PARTITION_RETENTION_MONTHS', 0))
+# 'detach' keeps retired partitions as standalone tables, 'drop' deletes them
+PARTITION_RETENTION_ACTION = os.environ.get('PARTITION_RETENTION_ACTION', 'detach')
+
+# Fact tables that can be range-partitioned by month (see migrate.py 003_monthly_partitions)
+PARTITIONED_TABLES = {
+    'commit_facts': 'commit_date',
+    'pr_facts': 'created_date',
+    'change_failure_rate_runs': 'completed_at',
+    'build_durations': 'completed_at',
+}
+
+_PARTITION_NAME = re.compile(r'_p(\d{4})(\d{2})$')
+# table -> partition column, or None when the table is a plain heap; looked up once per process
+_partition_columns = {}
+
+
+def partition_column(conn, table):
+    """Returns the monthly partition column of `table`, or None if it is not partitioned."""
+    if table not in _partition_columns:
+        column = None
+        if table in PARTITIONED_TABLES:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", (table,))
+                if cursor.fetchone():
+                    column = PARTITIONED_TABLES[table]
+        _partition_columns[table] = column
+    return _partition_columns[table]
+
+
+def reset_cache():
+    """Forgets which tables are partitioned (after converting one)."""
+    _partition_columns.clear()
+
+
+def conflict_columns(conn, table, key_columns):
+    """Unique keys on a partitioned table must contain the partition column."""
+    column = partition_column(conn, table)
+    if column and column not in key_columns:
+        return list(key_columns) + [column]
+    return list(key_columns)
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month.year:04d}{month.month:02d}"
+
+
+def _bound(conn, table, column, month):
+    """Partition bound in the column's own type (midnight UTC for timestamptz columns)."""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT format_type(atttypid, atttypmod) FROM pg_attribute
+            WHERE attrelid = to_regclass(%s) AND attname = %s
+        """, (table, column))
+        column_type = cursor.fetchone()[0]
+    if column_type == 'date':
+        return month
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+
+
+def ensure_partition(conn, table, month):
+    """Creates the partition holding `month`, moving matching rows out of the DEFAULT partition.
+
+    Runs in the caller's transaction. Returns True if a partition was created.
+    """
+    column = PARTITIONED_TABLES[table]
+    name = partition_name(table, month)
+    default = f"{table}_default"
+    lower = _bound(conn, table, column, month)
+    upper = _bound(conn, table, column, add_months(month, 1))
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", (name,))
+        if cursor.fetchone()[0] is not None:
+            return False
+        cursor.execute("SELECT to_regclass(%s)", (default,))
+        has_default = cursor.fetchone()[0] is not None
+        if has_default:
+            cursor.execute(f"SELECT 1 FROM {default} WHERE {column} >= %s AND {column} < %s LIMIT 1", (lower, upper))
+            has_default = cursor.fetchone() is not None
+        if not has_default:
+            cursor.execute(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)", (lower, upper))
+            return True
+        # Rows already sitting in DEFAULT would make a plain CREATE ... PARTITION OF fail
+        cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)")
+        cursor.execute(f"""
+            WITH moved AS (
+                DELETE FROM {default} WHERE {column} >= %s AND {column} < %s RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """, (lower, upper))
+        print(f"  - Moved {cursor.rowcount} rows from {default} into {name}")
+        cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", (lower, upper))
+    return True
+
+
+def ensure_partitions(conn, table, first_month, last_month):
+    """Creates every monthly partition from first_month to last_month inclusive."""
+    created = 0
+    month = month_start(first_month)
+    while month <= last_month:
+        created += ensure_partition(conn, table, month)
+        month = add_months(month, 1)
+    return created
+
+
+def list_partitions(conn, table):
+    """Returns [(partition_name, month)] for the monthly partitions of `table`."""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+        """, (table,))
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = []
+    for name in names:
+        match = _PARTITION_NAME.search(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def apply_retention(conn, table, retention_months=None, action=None):
+    """Detaches (or drops) partitions entirely older than the retention window.
+
+    Retiring a month is a catalog change, not a bulk DELETE followed by vacuum.
+    """
+    retention_months = PARTITION_RETENTION_MONTHS if retention_months is None else retention_months
+    action = action or PARTITION_RETENTION_ACTION
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(month_start(date.today()), -retention_months)
+    retired = []
+    with conn.cursor() as cursor:
+        for name, month in list_partitions(conn, table):
+            if month >= cutoff:
+                break
+            cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+            if action == 'drop':
+                cursor.execute(f"DROP TABLE {name}")
+            print(f"  - Retention: {'dropped' if action == 'drop' else 'detached'} {name}")
+            retired.append(name)
+    return retired
+
+
+def maintain(conn):
+    """Keeps partitioned fact tables ready: upcoming months, months stranded in DEFAULT, retention.
+
+    Does nothing for tables that are still plain heaps. Commits per table.
+    """
+    this_month = month_start(date.today())
+    for table, column in PARTITIONED_TABLES.items():
+        try:
+            if not partition_column(conn, table):
+                continue
+            with conn.cursor() as cursor:
+                # Month boundaries are UTC, like the partition bounds
+                cursor.execute("SET LOCAL TIME ZONE 'UTC'")
+            created = ensure_partitions(conn, table, this_month, add_months(this_month, PARTITION_MONTHS_AHEAD))
+            # Backfilled rows older than the existing partitions land in DEFAULT until their month exists
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT DISTINCT date_trunc('month', {column})::date FROM {table}_default WHERE {column} IS NOT NULL")
+                stranded = [row[0] for row in cursor.fetchall()]
+            for month in stranded:
+                created += ensure_partition(conn, table, month)
+            retired = apply_retention(conn, table)
+            conn.commit()
+            print(f"Partitions for {table}: {created} created, {len(retired)} retired")
+        except psycopg2.Error as error:
+            conn.rollback()
+            print(f"Error maintaining partitions for {table}: {error}")
@@ -1,4 +1,37 @@
 import json
+import os
+
+# 'long' reads the typed sonar_measures table instead of sonarqube_results (see sonar_storage.py)
+SONAR_STORAGE_MODE = os.environ.get('SONAR_STORAGE_MODE', 'wide')
+SONAR_PROJECT_KEY = 'shantanu10839179_github-actions-lab'
+
+def long_format_sql(metric_keys, latest=False, project_column=False):
+    """Same columns as the sonarqube_results queries, read from sonar_measures (no casts)."""
+    columns = ", ".join(f"MAX(m.value) FILTER (WHERE k.metric_key = '{key}') AS {key}" for key in metric_keys)
+    if project_column:
+        columns = f"a.project_key, {columns}"
+    if not latest:
+        columns = f"a.analysis_date AS \"time\", {columns}"
+    keys = ", ".join(f"'{key}'" for key in metric_keys)
+    sql = (
+        f"SELECT {columns} "
+        "FROM sonar_analyses a "
+        "JOIN sonar_measures m ON m.analysis_id = a.analysis_id "
+        "JOIN sonar_metrics k ON k.metric_id = m.metric_id "
+        f"WHERE k.metric_key IN ({keys}) AND a.project_key = '{SONAR_PROJECT_KEY}' "
+    )
+    if latest:
+        return sql + "GROUP BY a.analysis_date, a.project_key ORDER BY a.analysis_date DESC LIMIT 1;"
+    return sql + "AND $__timeFilter(a.analysis_date) GROUP BY a.analysis_date, a.project_key ORDER BY a.analysis_date ASC;"
+
+# Panel id -> long-format query
+LONG_FORMAT_QUERIES = {
+    200: long_format_sql(['coverage'], project_column=True),
+    201: long_format_sql(['bugs', 'vulnerabilities', 'code_smells']),
+    202: long_format_sql(['reliability_rating'], latest=True),
+    203: long_format_sql(['security_rating'], latest=True),
+    204: long_format_sql(['maintainability_rating'], latest=True),
+}
 
 # Load your existing dashboard JSON
 with open("Final DevOps Grafana Dashboard.json", "r", encoding="utf-8") as f:
@@ -115,6 +148,10 @@ sonarqube_panels = [
     }
 ]
 
+if SONAR_STORAGE_MODE == 'long':
+    for panel in sonarqube_panels:
+        panel["targets"][0]["rawSql"] = LONG_FORMAT_QUERIES[panel["id"]]
+
 # Remove any SonarQube panels from inside targets arrays (if any were accidentally placed there)
 for panel in dashboard.get("panels", []):
     if "targets" in panel and isinstance(panel["targets"], list):
@@ -0,0 +1,159 @@
+import os
+import time
+import threading
+from dotenv import load_dotenv
+
+# --- Configuration ---
+load_dotenv()
+
+# Comma separated pool of tokens to rotate across, e.g. GITHUB_TOKENS=a,b,c.
+# Falls back to the single GITHUB_TOKEN.
+GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN')
+GITHUB_TOKENS = [t.strip() for t in os.environ.get('GITHUB_TOKENS', '').split(',') if t.strip()]
+if not GITHUB_TOKENS and GITHUB_TOKEN:
+    GITHUB_TOKENS = [GITHUB_TOKEN.strip()]
+
+GITHUB_API_HOSTS = {'api.github.com'}
+# Token bucket per token: sustained requests per second and burst size
+RATE_LIMIT_RPS = float(os.environ.get('RATE_LIMIT_RPS', 10))
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', 20))
+# Requests kept in reserve per token before we stop using it until its reset
+RATE_LIMIT_RESERVE = int(os.environ.get('RATE_LIMIT_RESERVE', 50))
+# Retries after a primary or secondary rate-limit response
+RATE_LIMIT_MAX_RETRIES = int(os.environ.get('RATE_LIMIT_MAX_RETRIES', 5))
+# Wait used for a secondary limit that does not send Retry-After
+SECONDARY_LIMIT_WAIT = int(os.environ.get('SECONDARY_LIMIT_WAIT', 60))
+
+
+class RateLimitScheduler:
+    """Paces GitHub requests and rotates across a pool of tokens.
+
+    Every token has a token bucket (RATE_LIMIT_RPS / RATE_LIMIT_BURST). It also
+    tracks the budget reported in X-RateLimit-Remaining / X-RateLimit-Reset for
+    each resource (core, graphql, search...). acquire() hands out the token with
+    the most budget left and blocks when every token is exhausted or cooling down.
+    """
+
+    def __init__(self, tokens, rate=RATE_LIMIT_RPS, burst=RATE_LIMIT_BURST, reserve=RATE_LIMIT_RESERVE):
+        self.tokens = list(tokens) or [None]
+        self.rate = rate
+        self.burst = burst
+        self.reserve = reserve
+        self.lock = threading.Lock()
+        now = time.monotonic()
+        self.bucket = {token: burst for token in self.tokens}
+        self.last_refill = {token: now for token in self.tokens}
+        self.blocked_until = {token: 0.0 for token in self.tokens}
+        # (token, resource) -> {'remaining': int, 'reset': epoch seconds}
+        self.budgets = {}
+
+    def _refill(self, token, now):
+        elapsed = now - self.last_refill[token]
+        self.bucket[token] = min(self.burst, self.bucket[token] + elapsed * self.rate)
+        self.last_refill[token] = now
+
+    def _budget(self, token, resource):
+        budget = self.budgets.get((token, resource))
+        if budget is None:
+            return None
+        if budget['reset'] <= time.time():
+            # The window has rolled over since we last heard from GitHub
+            del self.budgets[(token, resource)]
+            return None
+        return budget
+
+    def acquire(self, resource='core'):
+        """Blocks until a request may be sent and returns the token to send it with."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                best = None
+                best_remaining = -1
+                wait = None
+                for token in self.tokens:
+                    self._refill(token, now)
+                    if self.blocked_until[token] > now:
+                        token_wait = self.blocked_until[token] - now
+                    else:
+                        budget = self._budget(token, resource)
+                        if budget is not None and budget['remaining'] <= self.reserve:
+                            token_wait = max(budget['reset'] - time.time(), 1)
+                        elif self.bucket[token] < 1:
+                            token_wait = (1 - self.bucket[token]) / self.rate if self.rate > 0 else 1
+                        else:
+                            remaining = budget['remaining'] if budget else float('inf')
+                            if remaining > best_remaining:
+                                best, best_remaining = token, remaining
+                            continue
+                    wait = token_wait if wait is None else min(wait, token_wait)
+
+                if best_remaining >= 0:
+                    self.bucket[best] -= 1
+                    budget = self._budget(best, resource)
+                    if budget is not None:
+                        budget['remaining'] -= 1
+                    return best
+            if wait and wait > 5:
+                print(f"Rate limit budget exhausted. Waiting {int(wait)} seconds...")
+            time.sleep(wait or 0.1)
+
+    def update(self, token, response):
+        """Records the budget from response headers.
+
+        Returns True when the response was rate limited and should be retried.
+        """
+        headers = response.headers
+        resource = headers.get('X-RateLimit-Resource', 'core')
+        with self.lock:
+            if 'X-RateLimit-Remaining' in headers and 'X-RateLimit-Reset' in headers:
+                self.budgets[(token, resource)] = {
+                    'remaining': int(headers['X-RateLimit-Remaining']),
+                    'reset': int(headers['X-RateLimit-Reset'])
+                }
+
+            if response.status_code not in (403, 429):
+                return False
+
+            retry_after = headers.get('Retry-After')
+            if retry_after is not None:
+                # Secondary rate limit: GitHub tells us how long to back off
+                self.blocked_until[token] = time.monotonic() + int(retry_after)
+                return True
+            if headers.get('X-RateLimit-Remaining') == '0':
+                reset_in = int(headers.get('X-RateLimit-Reset', 0)) - time.time() + 1
+                self.blocked_until[token] = time.monotonic() + max(reset_in, 1)
+                return True
+            if 'secondary rate limit' in response.text.lower():
+                self.blocked_until[token] = time.monotonic() + SECONDARY_LIMIT_WAIT
+                return True
+            return False
+
+    def remaining_budget(self, resource='core'):
+        """Total known requests left across the pool (None if nothing reported yet)."""
+        with self.lock:
+            budgets = [self._budget(token, resource) for token in self.tokens]
+        known = [budget['remaining'] for budget in budgets if budget is not None]
+        return sum(known) if known else None
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Returns the process-wide scheduler built from GITHUB_TOKENS."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RateLimitScheduler(GITHUB_TOKENS)
+    return _scheduler
+
+
+def with_token(headers, token):
+    """Swaps the token in an Authorization header, keeping its scheme (token / bearer)."""
+    headers = dict(headers or {})
+    if token and 'Authorization' in headers:
+        scheme = headers['Authorization'].split(' ', 1)[0]
+        headers['Authorization'] = f"{scheme} {token}"
+    return headers
@@ -0,0 +1,118 @@
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+import requests
+from requests.structures import CaseInsensitiveDict
+from dotenv import load_dotenv
+
+# --- Configuration ---
+load_dotenv()
+
+# Set HTTP_CACHE_ENABLED=0 to always download full responses
+HTTP_CACHE_ENABLED = os.environ.get('HTTP_CACHE_ENABLED', '1') not in ('0', 'false', 'False', '')
+HTTP_CACHE_PATH = os.environ.get('HTTP_CACHE_PATH', '.http_cache.sqlite')
+
+_conn = None
+_lock = threading.Lock()
+
+
+def _get_conn():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(HTTP_CACHE_PATH, check_same_thread=False)
+        _conn.execute("""
+        CREATE TABLE IF NOT EXISTS http_responses (
+            cache_key TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            etag TEXT,
+            last_modified TEXT,
+            headers TEXT,
+            encoding TEXT,
+            body BLOB,
+            stored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        """)
+        _conn.commit()
+    return _conn
+
+
+def cache_key(url, headers):
+    """Cache entries are scoped by the full URL and the credentials used to fetch it."""
+    authorization = (headers or {}).get('Authorization', '')
+    scope = hashlib.sha256(authorization.encode('utf-8')).hexdigest()
+    return hashlib.sha256(f"{scope} {url}".encode('utf-8')).hexdigest()
+
+
+def full_url(url, params=None):
+    """Returns the URL with its query string, as it will be sent."""
+    return requests.Request('GET', url, params=params).prepare().url
+
+
+def lookup(key):
+    """Returns the stored entry for a cache key, or None."""
+    with _lock:
+        row = _get_conn().execute(
+            "SELECT etag, last_modified, headers, encoding, body FROM http_responses WHERE cache_key = ?",
+            (key,)
+        ).fetchone()
+    if not row:
+        return None
+    return {
+        'etag': row[0],
+        'last_modified': row[1],
+        'headers': json.loads(row[2] or '{}'),
+        'encoding': row[3],
+        'body': row[4]
+    }
+
+
+def conditional_headers(entry):
+    """Builds the If-None-Match / If-Modified-Since headers for a stored entry."""
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def store(key, url, response):
+    """Stores a 200 response that carries a validator (ETag or Last-Modified)."""
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if response.status_code != 200 or not (etag or last_modified):
+        return
+    with _lock:
+        conn = _get_conn()
+        conn.execute("""
+            INSERT INTO http_responses (cache_key, url, etag, last_modified, headers, encoding, body, stored_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (cache_key) DO UPDATE SET
+                etag = excluded.etag,
+                last_modified = excluded.last_modified,
+                headers = excluded.headers,
+                encoding = excluded.encoding,
+                body = excluded.body,
+                stored_at = excluded.stored_at;
+        """, (key, url, etag, last_modified, json.dumps(dict(response.headers)), response.encoding, response.content))
+        conn.commit()
+
+
+def build_cached_response(entry, not_modified_response):
+    """Turns a 304 into a 200 response carrying the cached body.
+
+    Headers from the 304 (rate-limit counters, dates) override the cached ones.
+    """
+    response = requests.Response()
+    response.status_code = 200
+    response._content = entry['body']
+    response.encoding = entry['encoding']
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response.headers.update(not_modified_response.headers)
+    response.url = not_modified_response.url
+    response.request = not_modified_response.request
+    response.reason = 'OK (cached)'
+    response.from_cache = True
+    return response
@@ -0,0 +1,303 @@
+"""Daily rollups of the fact tables, read by the Grafana dashboard.
+
+Collectors call refresh_rows for the rows they wrote; each call recomputes those
+(repo, day) rows from the fact tables, so reruns and late updates stay exact.
+Refreshing a delivery or lead-time day also refreshes the DORA scores it feeds and
+the day's percentile sketches (sketches.py).
+Averages are stored as sum + count so any date range can be re-averaged.
+
+Usage:
+    python rollups.py                      # rebuild every rollup from the fact tables
+    python rollups.py --since 2025-08-01   # rebuild from a date onwards
+"""
+import argparse
+from datetime import date, datetime, time, timedelta, timezone
+import psycopg2
+
+import db
+import dora_scores
+import sketches
+
+
+def setup_rollups(conn):
+    """Creates the rollup tables (and the DORA score and sketch tables) if they do not exist."""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS daily_commit_activity (
+                repo_name VARCHAR(255) NOT NULL,
+                day DATE NOT NULL,
+                commit_user VARCHAR(255) NOT NULL,
+                commits INTEGER NOT NULL,
+                files_changed BIGINT NOT NULL,
+                lines_added BIGINT NOT NULL,
+                lines_deleted BIGINT NOT NULL,
+                PRIMARY KEY (repo_name, day, commit_user)
+            );
+            """)
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS daily_pr_activity (
+                repo_name VARCHAR(255) NOT NULL,
+                day DATE NOT NULL,
+                prs INTEGER NOT NULL,
+                closed_prs INTEGER NOT NULL,
+                merged_prs INTEGER NOT NULL,
+                PRIMARY KEY (repo_name, day)
+            );
+            """)
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS daily_delivery_stats (
+                repo_name VARCHAR(255) NOT NULL,
+                day DATE NOT NULL,
+                builds INTEGER NOT NULL,
+                successful_builds INTEGER NOT NULL,
+                failed_builds INTEGER NOT NULL,
+                first_success_at TIMESTAMP WITH TIME ZONE,
+                last_success_at TIMESTAMP WITH TIME ZONE,
+                duration_sum_seconds BIGINT NOT NULL,
+                duration_count INTEGER NOT NULL,
+                recover_sum_seconds BIGINT NOT NULL,
+                incidents INTEGER NOT NULL,
+                PRIMARY KEY (repo_name, day)
+            );
+            """)
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS daily_lead_time (
+                repo_name VARCHAR(255) NOT NULL,
+                day DATE NOT NULL,
+                lead_time_sum_seconds BIGINT NOT NULL,
+                lead_time_count INTEGER NOT NULL,
+                PRIMARY KEY (repo_name, day)
+            );
+            """)
+        conn.commit()
+    except (Exception, psycopg2.Error) as error:
+        conn.rollback()
+        print(f"Error during rollup setup: {error}")
+    dora_scores.setup_scores(conn)
+    sketches.setup_sketches(conn)
+
+
+# Each query rebuilds one rollup for %(repo)s and the days in %(days)s. Date columns are
+# bounded by %(first_day)s / %(after_day)s and timestamps by %(first_at)s / %(after_at)s so
+# the (repo_name, time) indexes are used; timestamps are bucketed into UTC days.
+ROLLUP_QUERIES = {
+    'daily_commit_activity': """
+        INSERT INTO daily_commit_activity (repo_name, day, commit_user, commits, files_changed, lines_added, lines_deleted)
+        SELECT repo_name, commit_date, COALESCE(commit_user, ''), count(*),
+               COALESCE(sum(files_changed), 0), COALESCE(sum(additions), 0), COALESCE(sum(deletions), 0)
+        FROM commit_details
+        WHERE repo_name = %(repo)s AND commit_date >= %(first_day)s AND commit_date < %(after_day)s
+          AND commit_date = ANY(%(days)s)
+        GROUP BY repo_name, commit_date, COALESCE(commit_user, '')
+    """,
+    'daily_pr_activity': """
+        INSERT INTO daily_pr_activity (repo_name, day, prs, closed_prs, merged_prs)
+        SELECT repo_name, day, sum(prs), sum(closed_prs), sum(merged_prs)
+        FROM (
+            SELECT repo_name, start_date AS day, count(*) AS prs,
+                   count(*) FILTER (WHERE state = 'closed') AS closed_prs, 0 AS merged_prs
+            FROM pr_details
+            WHERE repo_name = %(repo)s AND start_date >= %(first_day)s AND start_date < %(after_day)s
+              AND start_date = ANY(%(days)s)
+            GROUP BY repo_name, start_date
+            UNION ALL
+            SELECT repo_name, end_date, 0, 0, count(*)
+            FROM pr_details
+            WHERE repo_name = %(repo)s AND merged AND end_date >= %(first_day)s AND end_date < %(after_day)s
+              AND end_date = ANY(%(days)s)
+            GROUP BY repo_name, end_date
+        ) activity
+        GROUP BY repo_name, day
+    """,
+    'daily_delivery_stats': """
+        INSERT INTO daily_delivery_stats (
+            repo_name, day, builds, successful_builds, failed_builds, first_success_at, last_success_at,
+            duration_sum_seconds, duration_count, recover_sum_seconds, incidents
+        )
+        SELECT repo_name, day, sum(builds), sum(successful_builds), sum(failed_builds),
+               min(first_success_at), max(last_success_at), sum(duration_sum_seconds), sum(duration_count),
+               sum(recover_sum_seconds), sum(incidents)
+        FROM (
+            SELECT repo_name, (completed_at AT TIME ZONE 'UTC')::date AS day, count(*) AS builds,
+                   count(*) FILTER (WHERE conclusion = 'success') AS successful_builds,
+                   count(*) FILTER (WHERE conclusion = 'failure') AS failed_builds,
+                   min(completed_at) FILTER (WHERE conclusion = 'success') AS first_success_at,
+                   max(completed_at) FILTER (WHERE conclusion = 'success') AS last_success_at,
+                   0 AS duration_sum_seconds, 0 AS duration_count, 0 AS recover_sum_seconds, 0 AS incidents
+            FROM change_failure_rate_runs
+            WHERE repo_name = %(repo)s AND completed_at >= %(first_at)s AND completed_at < %(after_at)s
+              AND (completed_at AT TIME ZONE 'UTC')::date = ANY(%(days)s)
+            GROUP BY 1, 2
+            UNION ALL
+            SELECT repo_name, (completed_at AT TIME ZONE 'UTC')::date, 0, 0, 0, NULL, NULL,
+                   COALESCE(sum(duration_in_seconds), 0), count(duration_in_seconds), 0, 0
+            FROM build_durations
+            WHERE repo_name = %(repo)s AND completed_at >= %(first_at)s AND completed_at < %(after_at)s
+              AND (completed_at AT TIME ZONE 'UTC')::date = ANY(%(days)s)
+            GROUP BY 1, 2
+            UNION ALL
+            SELECT repo_name, (resolution_time AT TIME ZONE 'UTC')::date, 0, 0, 0, NULL, NULL, 0, 0,
+                   COALESCE(sum(time_to_recover_in_seconds), 0), count(time_to_recover_in_seconds)
+            FROM incidents_for_mttr
+            WHERE repo_name = %(repo)s AND resolution_time >= %(first_at)s AND resolution_time < %(after_at)s
+              AND (resolution_time AT TIME ZONE 'UTC')::date = ANY(%(days)s)
+            GROUP BY 1, 2
+        ) delivery
+        GROUP BY repo_name, day
+    """,
+    'daily_lead_time': """
+        INSERT INTO daily_lead_time (repo_name, day, lead_time_sum_seconds, lead_time_count)
+        SELECT repo_name, (merged_at AT TIME ZONE 'UTC')::date,
+               COALESCE(sum(lead_time_in_seconds), 0), count(lead_time_in_seconds)
+        FROM lead_time_to_change
+        WHERE repo_name = %(repo)s AND merged_at >= %(first_at)s AND merged_at < %(after_at)s
+          AND (merged_at AT TIME ZONE 'UTC')::date = ANY(%(days)s)
+        GROUP BY 1, 2
+    """,
+}
+
+
+# Rollups the DORA score table (dora_scores.py) is computed from
+SCORE_INPUTS = {'daily_delivery_stats', 'daily_lead_time'}
+
+
+def days_of(values):
+    """Returns the sorted UTC days of ISO strings, dates or datetimes (None is skipped)."""
+    days = set()
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value.replace('Z', '+00:00')) if 'T' in value else date.fromisoformat(value[:10])
+        if isinstance(value, datetime):
+            if value.tzinfo:
+                value = value.astimezone(timezone.utc)
+            value = value.date()
+        days.add(value)
+    return sorted(days)
+
+
+def refresh(conn, table, repo, days):
+    """Recomputes the `table` rollup rows of `repo` for `days` from the fact tables.
+
+    Runs in the caller's transaction and does not commit. Returns the rows written.
+    """
+    days = sorted(set(days))
+    if not days:
+        return 0
+    params = {
+        'repo': repo,
+        'days': days,
+        'first_day': days[0],
+        'after_day': days[-1] + timedelta(days=1),
+        'first_at': datetime.combine(days[0], time.min, tzinfo=timezone.utc),
+        'after_at': datetime.combine(days[-1] + timedelta(days=1), time.min, tzinfo=timezone.utc),
+    }
+    with conn.cursor() as cursor:
+        # Parallel writers (backfill.py workers) refreshing the same repo take turns until commit
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"{table}:{repo}",))
+        cursor.execute(f"DELETE FROM {table} WHERE repo_name = %(repo)s AND day = ANY(%(days)s)", params)
+        cursor.execute(ROLLUP_QUERIES[table], params)
+        written = cursor.rowcount
+    sketches.refresh(conn, table, params)
+    return written
+
+
+def refresh_rows(conn, table, rows, repo_index, time_indexes):
+    """Refreshes `table` for every (repo, day) touched by freshly written fact rows.
+
+    `rows` are the tuples sent to the fact table (or (repo_name, day) pairs derived from
+    them); `repo_index` points at repo_name and `time_indexes` at the time columns the
+    rollup buckets by. Does not commit.
+    """
+    values_by_repo = {}
+    for row in rows:
+        values_by_repo.setdefault(row[repo_index], []).extend(row[index] for index in time_indexes)
+    written = 0
+    for repo, values in values_by_repo.items():
+        days = days_of(values)
+        written += refresh(conn, table, repo, days)
+        if table in SCORE_INPUTS:
+            dora_scores.refresh(conn, repo, days)
+    return written
+
+
+# (fact table, time column, day expression, extra condition) feeding each rollup, used by rebuild()
+_SOURCES = {
+    'daily_commit_activity': [('commit_details', 'commit_date', 'commit_date', '')],
+    'daily_pr_activity': [
+        ('pr_details', 'start_date', 'start_date', ''),
+        ('pr_details', 'end_date', 'end_date', 'merged AND '),
+    ],
+    'daily_delivery_stats': [
+        ('change_failure_rate_runs', 'completed_at', "(completed_at AT TIME ZONE 'UTC')::date", ''),
+        ('build_durations', 'completed_at', "(completed_at AT TIME ZONE 'UTC')::date", ''),
+        ('incidents_for_mttr', 'resolution_time', "(resolution_time AT TIME ZONE 'UTC')::date", ''),
+    ],
+    'daily_lead_time': [('lead_time_to_change', 'merged_at', "(merged_at AT TIME ZONE 'UTC')::date", '')],
+}
+
+
+def _rebuild_days(conn, table, since, repos):
+    """Returns {repo: {day}} for every day with facts, or an existing rollup row, since `since`."""
+    days_by_repo = {}
+    with conn.cursor() as cursor:
+        queries = [f"SELECT DISTINCT repo_name, day FROM {table} WHERE day >= %(since)s"]
+        for source, column, day, condition in _SOURCES[table]:
+            cursor.execute("SELECT to_regclass(%s)", (source,))
+            if cursor.fetchone()[0] is not None:
+                queries.append(f"SELECT DISTINCT repo_name, {day} FROM {source} WHERE {condition}{column} >= %(since)s")
+        for query in queries:
+            cursor.execute(query, {'since': since})
+            for repo, day in cursor.fetchall():
+                if day is not None and (not repos or repo in repos):
+                    days_by_repo.setdefault(repo, set()).add(day)
+    conn.commit()
+    return days_by_repo
+
+
+def rebuild(conn, since=None, repos=None):
+    """Recomputes every rollup day present in the fact tables (from `since` onwards).
+
+    Rollup days whose facts are gone are cleared. Commits once per rollup table and repo.
+    """
+    since = since or date(1970, 1, 1)
+    for table in _SOURCES:
+        try:
+            days_by_repo = _rebuild_days(conn, table, since, repos)
+        except psycopg2.Error as error:
+            conn.rollback()
+            print(f"Error reading days for {table}: {error}")
+            continue
+        for repo, days in sorted(days_by_repo.items()):
+            try:
+                written = refresh(conn, table, repo, days)
+                if table in SCORE_INPUTS:
+                    dora_scores.refresh(conn, repo, days)
+                conn.commit()
+                print(f"  - {table}: {repo} rebuilt ({len(days)} days, {written} rows)")
+            except psycopg2.Error as error:
+                conn.rollback()
+                print(f"Error rebuilding {table} for {repo}: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the daily rollup tables from the fact tables.")
+    parser.add_argument('--since', type=date.fromisoformat, help="first day to rebuild (YYYY-MM-DD)")
+    parser.add_argument('--repo', action='append', help="only rebuild this repository (repeatable)")
+    args = parser.parse_args()
+
+    conn = db.get_db_connection()
+    if not conn:
+        return
+    try:
+        setup_rollups(conn)
+        rebuild(conn, args.since, args.repo)
+    finally:
+        db.release_connection(conn)
+        db.close_all()
+
+
+if __name__ == "__main__":
+    main()
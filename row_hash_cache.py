@@ -0,0 +1,132 @@
+import os
+import hashlib
+import sqlite3
+import threading
+import weakref
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+
+# --- Configuration ---
+load_dotenv()
+
+# Set ROW_HASH_CACHE_ENABLED=1 to skip sending rows whose content was already written
+ROW_HASH_CACHE_ENABLED = os.environ.get('ROW_HASH_CACHE_ENABLED', '0') not in ('0', 'false', 'False', '')
+ROW_HASH_CACHE_PATH = os.environ.get('ROW_HASH_CACHE_PATH', '.row_hash_cache.sqlite')
+
+_conn = None
+_lock = threading.Lock()
+# Hashes of rows sent on a database connection but not yet committed: conn -> [(scope, table, key, hash)].
+# Pooled connections are reused, so db.release_connection drops whatever was not committed.
+_pending = weakref.WeakKeyDictionary()
+# (host, port, dbname) -> scope of the database currently behind it (see _scope)
+_scopes = {}
+
+
+def _get_conn():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(ROW_HASH_CACHE_PATH, check_same_thread=False)
+        # Hashes recorded before they were scoped by target database cannot be trusted
+        _conn.execute("DROP TABLE IF EXISTS row_hashes")
+        _conn.execute("""
+        CREATE TABLE IF NOT EXISTS scoped_row_hashes (
+            scope TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            row_key TEXT NOT NULL,
+            row_hash TEXT NOT NULL,
+            PRIMARY KEY (scope, table_name, row_key)
+        );
+        """)
+        _conn.commit()
+    return _conn
+
+
+def _digest(values):
+    return hashlib.sha1('\x1f'.join('' if v is None else str(v) for v in values).encode('utf-8')).hexdigest()
+
+
+def _scope(db_conn):
+    """Identifies the target database by host, port, name and oid.
+
+    Pointing .env at another database, or restoring into a re-created one, starts
+    from an empty cache.
+    """
+    target = (db_conn.info.host, db_conn.info.port, db_conn.info.dbname)
+    scope = _scopes.get(target)
+    if scope is None:
+        with db_conn.cursor() as cursor:
+            cursor.execute("SELECT oid FROM pg_database WHERE datname = current_database()")
+            scope = f"{target[0]}:{target[1]}/{target[2]}#{cursor.fetchone()[0]}"
+        _scopes[target] = scope
+    return scope
+
+
+def _present(db_conn, table, key_columns, key_rows):
+    """Returns the positions in key_rows whose key exists in `table` (catches truncated tables)."""
+    columns = ', '.join(key_columns)
+    match = ' AND '.join(f"t.{column} = v.{column}" for column in key_columns)
+    with db_conn.cursor() as cursor:
+        found = execute_values(cursor, f"""
+            SELECT v.position FROM (VALUES %s) AS v (position, {columns})
+            WHERE EXISTS (SELECT 1 FROM {table} t WHERE {match})
+        """, [(position,) + tuple(key) for position, key in enumerate(key_rows)], page_size=1000, fetch=True)
+    return {row[0] for row in found}
+
+
+def changed_rows(db_conn, table, columns, key_columns, rows):
+    """Drops rows whose content matches what was last committed for their key.
+
+    A row is only dropped if its key is still present in the target table; a key sent
+    more than once is judged by its last row, which copy_upsert keeps. The hashes
+    of the rows that are kept are held until commit(db_conn) so a rolled-back
+    transaction never marks a row as written.
+    """
+    rows = list(rows)
+    if not ROW_HASH_CACHE_ENABLED or not rows:
+        return rows
+    scope = _scope(db_conn)
+    key_indexes = [columns.index(column) for column in key_columns]
+    keyed = [(_digest([row[i] for i in key_indexes]), _digest(row), row) for row in rows]
+
+    known = {}
+    with _lock:
+        conn = _get_conn()
+        for i in range(0, len(keyed), 500):
+            chunk = [key for key, _, _ in keyed[i:i + 500]]
+            placeholders = ", ".join(["?"] * len(chunk))
+            for row_key, row_hash in conn.execute(
+                f"SELECT row_key, row_hash FROM scoped_row_hashes WHERE scope = ? AND table_name = ? AND row_key IN ({placeholders})",
+                [scope, table] + chunk
+            ):
+                known[row_key] = row_hash
+
+    last_positions = {key: position for position, (key, _, _) in enumerate(keyed)}
+    unchanged = [position for key, position in last_positions.items() if known.get(key) == keyed[position][1]]
+    skipped = set()
+    if unchanged:
+        present = _present(db_conn, table, key_columns, [[keyed[position][2][i] for i in key_indexes] for position in unchanged])
+        skipped = {keyed[unchanged[index]][0] for index in present}
+    changed = [entry for entry in keyed if entry[0] not in skipped]
+    with _lock:
+        _pending.setdefault(db_conn, []).extend((scope, table, key, digest) for key, digest, _ in changed)
+    return [row for _, _, row in changed]
+
+
+def commit(db_conn):
+    """Records the hashes sent on db_conn once its transaction has committed."""
+    with _lock:
+        pending = _pending.pop(db_conn, [])
+        if not pending:
+            return
+        conn = _get_conn()
+        conn.executemany("""
+            INSERT INTO scoped_row_hashes (scope, table_name, row_key, row_hash) VALUES (?, ?, ?, ?)
+            ON CONFLICT (scope, table_name, row_key) DO UPDATE SET row_hash = excluded.row_hash;
+        """, pending)
+        conn.commit()
+
+
+def discard(db_conn):
+    """Forgets the hashes sent on db_conn after a rollback (or when it goes back to the pool)."""
+    with _lock:
+        _pending.pop(db_conn, None)
@@ -0,0 +1,238 @@
+"""Per-repo, per-day quantile sketches (DDSketch) for lead time, build duration and MTTR.
+
+A sketch counts values in logarithmic bins whose width keeps every quantile within
+SKETCH_RELATIVE_ACCURACY of the true value, so sketches of any range of days merge by
+adding bin counts. They are stored as jsonb in daily_metric_sketches and refreshed with
+the daily rollups (see rollups.py). Merge them in Python (merge / quantile below) or in
+SQL with sketch_quantile(), e.g. for a dashboard panel:
+
+    SELECT sketch_quantile(array_agg(sketch), 0.9) / 3600 AS p90_lead_time_hours
+    FROM daily_metric_sketches
+    WHERE metric = 'lead_time' AND $__timeFilter(day) AND repo_name IN (${repo:sqlstring})
+
+Usage:
+    python sketches.py --metric lead_time --from 2025-08-01 --to 2025-08-31
+"""
+import argparse
+import math
+import os
+from datetime import date, timedelta
+import psycopg2
+from dotenv import load_dotenv
+
+import db
+
+# --- Configuration ---
+load_dotenv()
+
+# Relative error bound of every reported quantile (0.01 = within 1%)
+SKETCH_RELATIVE_ACCURACY = float(os.environ.get('SKETCH_RELATIVE_ACCURACY', 0.01))
+
+# metric -> (rollup refreshed alongside, fact table, value column, time column)
+SKETCH_METRICS = {
+    'lead_time': ('daily_lead_time', 'lead_time_to_change', 'lead_time_in_seconds', 'merged_at'),
+    'build_duration': ('daily_delivery_stats', 'build_durations', 'duration_in_seconds', 'completed_at'),
+    'time_to_recover': ('daily_delivery_stats', 'incidents_for_mttr', 'time_to_recover_in_seconds', 'resolution_time'),
+}
+
+
+def gamma_for(relative_accuracy=None):
+    relative_accuracy = relative_accuracy or SKETCH_RELATIVE_ACCURACY
+    return (1 + relative_accuracy) / (1 - relative_accuracy)
+
+
+def empty_sketch(relative_accuracy=None):
+    """The serialized form: bins maps str(bin index) -> count; values <= 0 count as zero."""
+    return {'gamma': gamma_for(relative_accuracy), 'count': 0, 'zero': 0, 'min': None, 'max': None, 'sum': 0, 'bins': {}}
+
+
+def add(sketch, value):
+    if value <= 0:
+        sketch['zero'] += 1
+    else:
+        index = str(math.ceil(math.log(value) / math.log(sketch['gamma'])))
+        sketch['bins'][index] = sketch['bins'].get(index, 0) + 1
+    sketch['count'] += 1
+    sketch['sum'] += value
+    sketch['min'] = value if sketch['min'] is None else min(sketch['min'], value)
+    sketch['max'] = value if sketch['max'] is None else max(sketch['max'], value)
+    return sketch
+
+
+def build(values, relative_accuracy=None):
+    sketch = empty_sketch(relative_accuracy)
+    for value in values:
+        if value is not None:
+            add(sketch, value)
+    return sketch
+
+
+def merge(sketches):
+    """Adds sketches built with the same accuracy into a new one."""
+    merged = None
+    for sketch in sketches:
+        if merged is None:
+            merged = {**sketch, 'bins': dict(sketch['bins'])}
+            continue
+        if not math.isclose(merged['gamma'], sketch['gamma']):
+            raise ValueError("Cannot merge sketches built with different relative accuracies")
+        merged['count'] += sketch['count']
+        merged['zero'] += sketch['zero']
+        merged['sum'] += sketch['sum']
+        for bound, pick in (('min', min), ('max', max)):
+            values = [value for value in (merged[bound], sketch[bound]) if value is not None]
+            merged[bound] = pick(values) if values else None
+        for index, count in sketch['bins'].items():
+            merged['bins'][index] = merged['bins'].get(index, 0) + count
+    return merged or empty_sketch()
+
+
+def quantile(sketch, q):
+    """Value at quantile q (0..1), or None for an empty sketch."""
+    if not sketch['count']:
+        return None
+    rank = q * (sketch['count'] - 1)
+    gamma = sketch['gamma']
+    running = sketch['zero']
+    value = 0.0
+    if running <= rank:
+        for index in sorted(sketch['bins'], key=int):
+            running += sketch['bins'][index]
+            if running > rank:
+                value = 2 * gamma ** int(index) / (gamma + 1)
+                break
+    # The bin midpoint can fall outside the observed range at the extremes
+    return min(max(value, sketch['min']), sketch['max'])
+
+
+def setup_sketches(conn):
+    """Creates the sketch table and the sketch_quantile() SQL merge function."""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS daily_metric_sketches (
+                repo_name VARCHAR(255) NOT NULL,
+                day DATE NOT NULL,
+                metric VARCHAR(50) NOT NULL,
+                sketch JSONB NOT NULL,
+                PRIMARY KEY (metric, repo_name, day)
+            );
+            """)
+            # Same algorithm as merge() + quantile() above
+            cursor.execute("""
+            CREATE OR REPLACE FUNCTION sketch_quantile(sketches JSONB[], q DOUBLE PRECISION)
+            RETURNS DOUBLE PRECISION LANGUAGE sql STABLE AS $$
+                WITH parts AS (
+                    SELECT unnest(sketches) AS sketch
+                ),
+                summary AS (
+                    SELECT max((sketch->>'gamma')::float8) AS gamma, sum((sketch->>'count')::bigint) AS total,
+                           sum((sketch->>'zero')::bigint) AS zero,
+                           min((sketch->>'min')::float8) AS low, max((sketch->>'max')::float8) AS high
+                    FROM parts
+                ),
+                bins AS (
+                    SELECT bin.key::int AS index, sum(bin.value::bigint) AS n
+                    FROM parts, jsonb_each_text(parts.sketch->'bins') bin
+                    GROUP BY 1
+                ),
+                ranked AS (
+                    SELECT NULL::int AS index, zero AS running FROM summary
+                    UNION ALL
+                    SELECT index, (SELECT zero FROM summary) + sum(n) OVER (ORDER BY index) FROM bins
+                )
+                SELECT least(greatest(
+                           CASE WHEN ranked.index IS NULL THEN 0
+                                ELSE 2 * power(summary.gamma, ranked.index) / (summary.gamma + 1) END,
+                           summary.low), summary.high)
+                FROM ranked, summary
+                WHERE summary.total > 0 AND ranked.running > q * (summary.total - 1)
+                ORDER BY ranked.index NULLS FIRST
+                LIMIT 1
+            $$;
+            """)
+        conn.commit()
+    except (Exception, psycopg2.Error) as error:
+        conn.rollback()
+        print(f"Error during sketch setup: {error}")
+
+
+# Bins are counted in the database, so refreshing a day never pulls its raw rows
+_BUILD_QUERY = """
+    INSERT INTO daily_metric_sketches (repo_name, day, metric, sketch)
+    SELECT repo_name, day, %(metric)s, jsonb_build_object(
+        'gamma', %(gamma)s::float8, 'count', sum(n), 'zero', COALESCE(sum(n) FILTER (WHERE index IS NULL), 0),
+        'min', min(low), 'max', max(high), 'sum', sum(total),
+        'bins', COALESCE(jsonb_object_agg(index, n) FILTER (WHERE index IS NOT NULL), '{{}}'::jsonb)
+    )
+    FROM (
+        SELECT repo_name, ({time} AT TIME ZONE 'UTC')::date AS day,
+               CASE WHEN {value} > 0 THEN ceil(ln({value}::float8) / ln(%(gamma)s::float8))::int END AS index,
+               count(*) AS n, min({value}) AS low, max({value}) AS high, sum({value}) AS total
+        FROM {table}
+        WHERE repo_name = %(repo)s AND {value} IS NOT NULL AND {time} >= %(first_at)s AND {time} < %(after_at)s
+          AND ({time} AT TIME ZONE 'UTC')::date = ANY(%(days)s)
+        GROUP BY 1, 2, 3
+    ) bins
+    GROUP BY repo_name, day
+"""
+
+
+def refresh(conn, rollup, params):
+    """Rebuilds the sketches fed by the facts of `rollup` for params' repo and days.
+
+    `params` are the rollup refresh parameters (repo, days, first_at, after_at).
+    Runs in the caller's transaction and does not commit. Returns the rows written.
+    """
+    written = 0
+    with conn.cursor() as cursor:
+        for metric, (source_rollup, table, value, time_column) in SKETCH_METRICS.items():
+            if source_rollup != rollup:
+                continue
+            metric_params = {**params, 'metric': metric, 'gamma': gamma_for()}
+            cursor.execute(
+                "DELETE FROM daily_metric_sketches WHERE metric = %(metric)s AND repo_name = %(repo)s AND day = ANY(%(days)s)",
+                metric_params
+            )
+            cursor.execute(_BUILD_QUERY.format(table=table, value=value, time=time_column), metric_params)
+            written += cursor.rowcount
+    return written
+
+
+def load(conn, metric, first_day, last_day, repos=None):
+    """Returns the merged sketch of `metric` over [first_day, last_day] (optionally some repos)."""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT sketch FROM daily_metric_sketches
+            WHERE metric = %s AND day >= %s AND day <= %s AND (%s::text[] IS NULL OR repo_name = ANY(%s))
+        """, (metric, first_day, last_day, repos, repos))
+        return merge(row[0] for row in cursor.fetchall())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print percentiles merged from the daily metric sketches.")
+    parser.add_argument('--metric', choices=sorted(SKETCH_METRICS), default='lead_time')
+    parser.add_argument('--from', dest='first_day', type=date.fromisoformat,
+                        default=date.today() - timedelta(days=30), help="first day (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='last_day', type=date.fromisoformat, default=date.today(),
+                        help="last day (YYYY-MM-DD)")
+    parser.add_argument('--repo', action='append', help="only this repository (repeatable)")
+    args = parser.parse_args()
+
+    conn = db.get_db_connection()
+    if not conn:
+        return
+    try:
+        sketch = load(conn, args.metric, args.first_day, args.last_day, args.repo)
+        print(f"{args.metric} from {args.first_day} to {args.last_day}: {sketch['count']} values")
+        for q in (0.5, 0.9, 0.99):
+            value = quantile(sketch, q)
+            if value is not None:
+                print(f"  p{round(q * 100)}: {value / 3600:.2f} hours")
+    finally:
+        db.release_connection(conn)
+        db.close_all()
+
+
+if __name__ == "__main__":
+    main()
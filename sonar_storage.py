@@ -0,0 +1,207 @@
+import os
+import requests
+import http_client
+import psycopg2
+from dotenv import load_dotenv
+
+# --- Configuration ---
+load_dotenv()
+
+# 'wide' keeps one VARCHAR column per metric in sonarqube_results; 'long' stores typed
+# values in sonar_measures, one row per (analysis, metric), described by sonar_metrics
+SONAR_STORAGE_MODE = os.environ.get('SONAR_STORAGE_MODE', 'wide')
+
+# Sonar metric types (api/metrics/search) stored as numbers; anything else (LEVEL,
+# STRING, DATA, DISTRIB) goes to text_value
+NUMERIC_TYPES = {'INT', 'FLOAT', 'PERCENT', 'MILLISEC', 'RATING', 'WORK_DUR'}
+
+# Types of the metrics the collectors request, used when api/metrics/search cannot be
+# read or does not list a metric, so values are never stored as text by accident
+KNOWN_METRIC_TYPES = {
+    'coverage': 'PERCENT', 'bugs': 'INT', 'vulnerabilities': 'INT', 'code_smells': 'INT',
+    'sqale_index': 'WORK_DUR', 'ncloc': 'INT', 'duplicated_lines_density': 'PERCENT',
+    'maintainability_rating': 'RATING', 'reliability_rating': 'RATING', 'security_rating': 'RATING',
+    'alert_status': 'LEVEL', 'blocker_violations': 'INT', 'critical_violations': 'INT',
+    'major_violations': 'INT', 'minor_violations': 'INT', 'info_violations': 'INT',
+    'tests': 'INT', 'test_errors': 'INT', 'test_failures': 'INT', 'test_execution_time': 'MILLISEC',
+    'test_success_density': 'PERCENT', 'lines': 'INT', 'comment_lines_density': 'PERCENT',
+    'complexity': 'INT', 'functions': 'INT', 'statements': 'INT', 'classes': 'INT', 'files': 'INT',
+    'branch_coverage': 'PERCENT', 'line_coverage': 'PERCENT', 'new_coverage': 'PERCENT',
+    'new_bugs': 'INT', 'new_vulnerabilities': 'INT', 'new_code_smells': 'INT',
+    'new_duplicated_lines_density': 'PERCENT', 'new_lines': 'INT',
+    'new_maintainability_rating': 'RATING', 'new_reliability_rating': 'RATING',
+    'new_security_rating': 'RATING', 'new_technical_debt': 'WORK_DUR',
+    'new_lines_to_cover': 'INT', 'new_uncovered_lines': 'INT', 'new_violations': 'INT',
+}
+
+
+def setup_long_storage(conn):
+    """Creates the metric dimension, analysis and measure tables if they do not exist."""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sonar_metrics (
+                metric_id SERIAL PRIMARY KEY,
+                metric_key VARCHAR(100) NOT NULL UNIQUE,
+                name VARCHAR(255),
+                value_type VARCHAR(20) NOT NULL,
+                domain VARCHAR(100)
+            );
+            """)
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sonar_analyses (
+                analysis_id SERIAL PRIMARY KEY,
+                repo_name VARCHAR(255) NOT NULL,
+                project_key VARCHAR(255) NOT NULL,
+                analysis_date TIMESTAMP WITH TIME ZONE NOT NULL,
+                branch VARCHAR(100) NOT NULL DEFAULT 'main',
+                quality_gate_status VARCHAR(20),
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (project_key, branch, analysis_date)
+            );
+            """)
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sonar_measures (
+                analysis_id INTEGER NOT NULL REFERENCES sonar_analyses (analysis_id) ON DELETE CASCADE,
+                metric_id INTEGER NOT NULL REFERENCES sonar_metrics (metric_id),
+                value DOUBLE PRECISION,
+                text_value TEXT,
+                PRIMARY KEY (analysis_id, metric_id)
+            );
+            """)
+            # Trend panels filter one project over time, then pick metrics per analysis
+            cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_sonar_analyses_project_date
+            ON sonar_analyses (project_key, analysis_date);
+            """)
+            cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_sonar_measures_metric
+            ON sonar_measures (metric_id, analysis_id) INCLUDE (value);
+            """)
+        conn.commit()
+        print("Database setup complete. Sonar metric, analysis and measure tables are ready.")
+    except psycopg2.Error as error:
+        print(f"Error during Sonar storage setup: {error}")
+        conn.rollback()
+
+
+def fetch_metric_types(host, headers):
+    """Returns {metric_key: {'name', 'type', 'domain'}} from api/metrics/search.
+
+    KNOWN_METRIC_TYPES fills in every metric the API did not describe, including all of
+    them when it cannot be reached.
+    """
+    url = f"{host}/api/metrics/search"
+    metric_types = {}
+    page = 1
+    try:
+        while True:
+            response = http_client.get(url, headers=headers, params={'ps': 500, 'p': page}, timeout=15)
+            response.raise_for_status()
+            data = response.json()
+            for metric in data.get('metrics', []):
+                metric_types[metric['key']] = {
+                    'name': metric.get('name'),
+                    'type': metric.get('type', 'STRING'),
+                    'domain': metric.get('domain'),
+                }
+            if page * data.get('ps', 500) >= data.get('total', 0):
+                break
+            page += 1
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f" - ERROR: Failed to fetch Sonar metric types, using the built-in types: {e}")
+    for key, value_type in KNOWN_METRIC_TYPES.items():
+        metric_types.setdefault(key, {'name': None, 'type': value_type, 'domain': None})
+    return metric_types
+
+
+def parse_value(value, value_type):
+    """Converts a raw measure string to (number, text) according to its Sonar metric type."""
+    if value is None:
+        return None, None
+    if value_type in NUMERIC_TYPES:
+        try:
+            return float(value), None
+        except ValueError:
+            return None, value
+    if value_type == 'BOOL':
+        return (1.0 if str(value).lower() == 'true' else 0.0), None
+    return None, value
+
+
+def sync_metrics(conn, metric_keys, metric_types):
+    """Upserts the metric dimension and returns {metric_key: (metric_id, value_type)}.
+
+    Metrics missing from `metric_types` keep their stored type (STRING if new). A metric
+    that becomes numeric has the values it stored as text converted.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT metric_key, value_type FROM sonar_metrics WHERE metric_key = ANY(%s)", (list(metric_keys),))
+        stored_types = dict(cursor.fetchall())
+        for key in metric_keys:
+            info = metric_types.get(key)
+            if info:
+                cursor.execute("""
+                    INSERT INTO sonar_metrics (metric_key, name, value_type, domain)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (metric_key) DO UPDATE
+                    SET name = COALESCE(EXCLUDED.name, sonar_metrics.name), value_type = EXCLUDED.value_type,
+                        domain = COALESCE(EXCLUDED.domain, sonar_metrics.domain)
+                """, (key, info['name'], info['type'], info['domain']))
+            else:
+                cursor.execute("""
+                    INSERT INTO sonar_metrics (metric_key, value_type) VALUES (%s, 'STRING')
+                    ON CONFLICT (metric_key) DO NOTHING
+                """, (key,))
+        cursor.execute(
+            "SELECT metric_key, metric_id, value_type FROM sonar_metrics WHERE metric_key = ANY(%s)",
+            (list(metric_keys),)
+        )
+        metric_ids = {key: (metric_id, value_type) for key, metric_id, value_type in cursor.fetchall()}
+        retyped = [
+            metric_id for key, (metric_id, value_type) in metric_ids.items()
+            if key in stored_types and stored_types[key] not in NUMERIC_TYPES and value_type in NUMERIC_TYPES
+        ]
+        if retyped:
+            cursor.execute(r"""
+                UPDATE sonar_measures SET value = text_value::float8, text_value = NULL
+                WHERE metric_id = ANY(%s) AND text_value ~ '^\s*[-+]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]+)?\s*$'
+            """, (retyped,))
+            print(f" - Converted {cursor.rowcount} stored text values of {len(retyped)} metrics that are numeric now.")
+        return metric_ids
+
+
+def store_analyses(conn, rows, metric_keys, metric_types):
+    """Writes collector rows (repo_name, project_key, analysis_date, branch, quality_gate, *values)
+    as one sonar_analyses row plus one typed sonar_measures row per metric.
+
+    Re-collecting an analysis updates it in place. Commits.
+    """
+    metric_ids = sync_metrics(conn, metric_keys, metric_types)
+    with conn.cursor() as cursor:
+        for row in rows:
+            repo_name, project_key, analysis_date, branch, quality_gate = row[:5]
+            cursor.execute("""
+                INSERT INTO sonar_analyses (repo_name, project_key, analysis_date, branch, quality_gate_status)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (project_key, branch, analysis_date) DO UPDATE
+                SET repo_name = EXCLUDED.repo_name, quality_gate_status = EXCLUDED.quality_gate_status
+                RETURNING analysis_id
+            """, (repo_name, project_key, analysis_date, branch or 'main', quality_gate))
+            analysis_id = cursor.fetchone()[0]
+            ids, numbers, texts = [], [], []
+            for key, raw in zip(metric_keys, row[5:]):
+                metric_id, value_type = metric_ids[key]
+                number, text = parse_value(raw, value_type)
+                if number is None and text is None:
+                    continue
+                ids.append(metric_id)
+                numbers.append(number)
+                texts.append(text)
+            cursor.execute("DELETE FROM sonar_measures WHERE analysis_id = %s", (analysis_id,))
+            cursor.execute("""
+                INSERT INTO sonar_measures (analysis_id, metric_id, value, text_value)
+                SELECT %s, unnest(%s::int[]), unnest(%s::float8[]), unnest(%s::text[])
+            """, (analysis_id, ids, numbers, texts))
+    conn.commit()
+    print(f" - Stored {len(rows)} SonarQube analyses as typed measures.")
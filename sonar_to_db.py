@@ -1,6 +1,6 @@
 import os
-import requests
-import psycopg2
+import http_client
+import db
 from datetime import datetime
 from dotenv import load_dotenv
 import base64
@@ -13,11 +13,6 @@ SONAR_HOST_URL = os.getenv("SONAR_HOST_URL")
 SONAR_PROJECT_KEY = os.getenv("SONAR_PROJECT_KEY")
 SONAR_ORGANIZATION = os.getenv("SONAR_ORGANIZATION")
 
-DB_HOST = os.getenv("DB_HOST")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASS = os.getenv("DB_PASS")
-DB_PORT = os.getenv("DB_PORT", 5432)
 
 # SonarQube API endpoint and metrics
 SONAR_API = f"{SONAR_HOST_URL}/api/measures/component"
@@ -34,7 +29,7 @@ def get_latest_analysis_date():
         "project": SONAR_PROJECT_KEY,
         "organization": SONAR_ORGANIZATION
     }
-    response = requests.get(analysis_api, params=params, headers=headers)
+    response = http_client.get(analysis_api, params=params, headers=headers)
     response.raise_for_status()
     data = response.json()
     # Get the date of the most recent analysis
@@ -53,7 +48,7 @@ params = {
     "metricKeys": METRICS,
     "organization": SONAR_ORGANIZATION
 }
-response = requests.get(SONAR_API, params=params, headers=headers)
+response = http_client.get(SONAR_API, params=params, headers=headers)
 response.raise_for_status()
 data = response.json()
 
@@ -66,13 +61,10 @@ coverage = float(metrics.get("coverage", 0))
 bugs = int(metrics.get("bugs", 0))
 
 # Insert or update into PostgreSQL
-conn = psycopg2.connect(
-    host=DB_HOST,
-    port=DB_PORT,
-    dbname=DB_NAME,
-    user=DB_USER,
-    password=DB_PASS
-)
+conn = db.get_db_connection()
+if not conn:
+    print("Failed to connect to database. Exiting.")
+    raise SystemExit(1)
 cur = conn.cursor()
 cur.execute("""
     INSERT INTO sonarqube_results (
@@ -82,6 +74,8 @@ cur.execute("""
     ON CONFLICT (project_key, analysis_date) DO UPDATE
     SET coverage = EXCLUDED.coverage,
         bugs = EXCLUDED.bugs
+    WHERE (sonarqube_results.coverage, sonarqube_results.bugs)
+        IS DISTINCT FROM (EXCLUDED.coverage, EXCLUDED.bugs)
 """, (
     SONAR_PROJECT_KEY,
     analysis_date,
@@ -90,5 +84,5 @@ cur.execute("""
 ))
 conn.commit()
 cur.close()
-conn.close()
+db.release_connection(conn)
 print("Metrics inserted/updated in DB.")
\ No newline at end of file
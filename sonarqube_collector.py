@@ -1,6 +1,9 @@
 import os
 import requests
+import http_client
 import psycopg2
+import db
+import sonar_storage
 from dotenv import load_dotenv
 from datetime import datetime
 
@@ -12,11 +15,6 @@ print("DB_HOST:", os.environ.get("DB_HOST"))
 print("GITHUB_TOKEN:", "✓" if os.environ.get("GITHUB_TOKEN") else "✗")
 
 # --- Configuration ---
-DB_HOST = os.environ.get("DB_HOST", "localhost")
-DB_NAME = os.environ.get("DB_NAME", "postgres")
-DB_USER = os.environ.get("DB_USER", "postgres")
-DB_PASS = os.environ.get("DB_PASS", "postgres")
-DB_PORT = os.environ.get("DB_PORT", "5432")
 
 SONAR_TOKEN = os.environ.get('SONAR_TOKEN')
 SONAR_HOST = "https://sonarcloud.io"
@@ -56,20 +54,6 @@ metrics = [
 ]
 
 # --- Database Functions ---
-def get_db_connection():
-    try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASS,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        return conn
-    except psycopg2.Error as error:
-        print(f"Error while connecting to PostgreSQL: {error}")
-        return None
-
 def setup_database(conn):
     try:
         with conn.cursor() as cursor:
@@ -123,7 +107,7 @@ def get_project_measures(project_key):
     }
     try:
         print(f" - Fetching measures from {url}")
-        response = requests.get(url, headers=HEADERS, params=params, timeout=15)
+        response = http_client.get(url, headers=HEADERS, params=params, timeout=15)
         print(f" - Response status code: {response.status_code}")
         if response.status_code == 401:
             print(" - Authentication failed. Please check your SONAR_TOKEN")
@@ -149,7 +133,7 @@ def get_quality_gate_status(project_key):
     url = f"{SONAR_HOST}/api/qualitygates/project_status"
     params = {'projectKey': project_key}
     try:
-        response = requests.get(url, headers=HEADERS, params=params, timeout=15)
+        response = http_client.get(url, headers=HEADERS, params=params, timeout=15)
         response.raise_for_status()
         data = response.json()
         return data.get('projectStatus', {}).get('status', 'UNKNOWN')
@@ -164,7 +148,7 @@ def get_latest_analysis(project_key):
         'ps': 1  # Get only the latest analysis
     }
     try:
-        response = requests.get(url, headers=HEADERS, params=params, timeout=15)
+        response = http_client.get(url, headers=HEADERS, params=params, timeout=15)
         response.raise_for_status()
         data = response.json()
         analyses = data.get('analyses', [])
@@ -188,7 +172,7 @@ def verify_project_exists(project_key):
     }
     print(f"DEBUG: Checking project existence with URL: {url} and params: {params}")
     try:
-        response = requests.get(url, headers=HEADERS, params=params, timeout=15)
+        response = http_client.get(url, headers=HEADERS, params=params, timeout=15)
         print(f"DEBUG: Response status code: {response.status_code}")
         print(f"DEBUG: Response text: {response.text}")
         if response.status_code == 200:
@@ -247,7 +231,7 @@ def process_project(project_info):
 def verify_sonar_access():
     validate_url = f"{SONAR_HOST}/api/authentication/validate"
     try:
-        validate_response = requests.get(validate_url, headers=HEADERS, timeout=15)
+        validate_response = http_client.get(validate_url, headers=HEADERS, timeout=15)
         if validate_response.status_code == 401:
             print("ERROR: Invalid SonarCloud token")
             return False
@@ -257,7 +241,7 @@ def verify_sonar_access():
             return False
         org_url = f"{SONAR_HOST}/api/organizations/search"
         org_params = {'organizations': SONAR_ORGANIZATION}
-        org_response = requests.get(org_url, headers=HEADERS, params=org_params, timeout=15)
+        org_response = http_client.get(org_url, headers=HEADERS, params=org_params, timeout=15)
         if org_response.status_code == 400:
             print(f"ERROR: Invalid organization key '{SONAR_ORGANIZATION}'")
             print("Please check your SONAR_ORGANIZATION value")
@@ -287,10 +271,10 @@ def verify_sonar_access():
 def main():
     required_vars = {
         'SONAR_TOKEN': SONAR_TOKEN,
-        'DB_HOST': DB_HOST,
-        'DB_NAME': DB_NAME,
-        'DB_USER': DB_USER,
-        'DB_PASS': DB_PASS
+        'DB_HOST': db.DB_HOST,
+        'DB_NAME': db.DB_NAME,
+        'DB_USER': db.DB_USER,
+        'DB_PASS': db.DB_PASS
     }
     missing_vars = [var for var, value in required_vars.items() if not value]
     if missing_vars:
@@ -302,11 +286,15 @@ def main():
     if not verify_sonar_access():
         return
     print("Starting SonarQube analysis data collection...")
-    db_connection = get_db_connection()
+    db_connection = db.get_db_connection()
     if not db_connection:
         print("Failed to connect to database. Exiting.")
         return
-    setup_database(db_connection)
+    long_storage = sonar_storage.SONAR_STORAGE_MODE == 'long'
+    if long_storage:
+        sonar_storage.setup_long_storage(db_connection)
+    else:
+        setup_database(db_connection)
     all_data = []
     for project in SONAR_PROJECTS:
         try:
@@ -315,12 +303,17 @@ def main():
         except Exception as e:
             print(f"Error processing project {project['project_key']}: {e}")
             continue
-    if all_data:
+    if all_data and long_storage:
+        # Values are typed at ingest from the metric types Sonar reports
+        metric_types = sonar_storage.fetch_metric_types(SONAR_HOST, HEADERS)
+        sonar_storage.store_analyses(db_connection, all_data, metrics, metric_types)
+        print(f"Successfully processed {len(all_data)} SonarQube analysis records")
+    elif all_data:
         insert_sonar_data(db_connection, all_data)
         print(f"Successfully processed {len(all_data)} SonarQube analysis records")
     else:
         print("No SonarQube data to insert")
-    db_connection.close()
+    db.release_connection(db_connection)
     print("SonarQube data collection completed.")
 
 if __name__ == "__main__":
@@ -1,6 +1,8 @@
 import os
 import requests
+import http_client
 import psycopg2
+import db
 from dotenv import load_dotenv
 
 from datetime import datetime
@@ -16,12 +18,7 @@ print("GITHUB_TOKEN:", "✓" if os.environ.get("GITHUB_TOKEN") else "✗")
 
 
 # --- Configuration ---
-# Database Connection Details
-DB_HOST = os.environ.get("DB_HOST", "localhost")
-DB_NAME = os.environ.get("DB_NAME", "postgres")
-DB_USER = os.environ.get("DB_USER", "postgres")
-DB_PASS = os.environ.get("DB_PASS", "postgres")
-DB_PORT = os.environ.get("DB_PORT", "5432")
+# Database connection details are read from .env by db.py
 
 # SonarCloud Configuration
 SONAR_TOKEN = os.environ.get('SONAR_TOKEN')
@@ -69,21 +66,6 @@ HEADERS = {
 
 # --- Database Functions ---
 
-def get_db_connection():
-    """Establishes a connection to the PostgreSQL database."""
-    try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASS,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        return conn
-    except psycopg2.Error as error:
-        print(f"Error while connecting to PostgreSQL: {error}")
-        return None
-
 def setup_database(conn):
     """Creates the sonarqube_results table if it doesn't exist."""
     try:
@@ -156,7 +138,7 @@ def get_project_measures(project_key):
     
     try:
         print(f"  - Fetching measures from {url}")
-        response = requests.get(url, headers=HEADERS, params=params)
+        response = http_client.get(url, headers=HEADERS, params=params)
         print(f"  - Response status code: {response.status_code}")
         
         if response.status_code == 401:
@@ -195,7 +177,7 @@ def get_quality_gate_status(project_key):
     params = {'projectKey': project_key}
     
     try:
-        response = requests.get(url, headers=HEADERS, params=params)
+        response = http_client.get(url, headers=HEADERS, params=params)
         response.raise_for_status()
         data = response.json()
         return data.get('projectStatus', {}).get('status', 'UNKNOWN')
@@ -212,7 +194,7 @@ def get_latest_analysis(project_key):
     }
     
     try:
-        response = requests.get(url, headers=HEADERS, params=params)
+        response = http_client.get(url, headers=HEADERS, params=params)
         response.raise_for_status()
         data = response.json()
         
@@ -256,7 +238,7 @@ def verify_project_exists(project_key):
     }
     print(f"DEBUG: Checking project existence with URL: {url} and params: {params}")
     try:
-        response = requests.get(url, headers=HEADERS, params=params)
+        response = http_client.get(url, headers=HEADERS, params=params)
         print(f"DEBUG: Response status code: {response.status_code}")
         print(f"DEBUG: Response text: {response.text}")
         if response.status_code == 200:
@@ -333,7 +315,7 @@ def verify_sonar_access():
     # First verify the token with a simpler API endpoint
     validate_url = f"{SONAR_HOST}/api/authentication/validate"
     try:
-        validate_response = requests.get(validate_url, headers=HEADERS)
+        validate_response = http_client.get(validate_url, headers=HEADERS)
         if validate_response.status_code == 401:
             print("ERROR: Invalid SonarCloud token")
             return False
@@ -347,7 +329,7 @@ def verify_sonar_access():
         # Now check organization access
         org_url = f"{SONAR_HOST}/api/organizations/search"
         org_params = {'organizations': SONAR_ORGANIZATION}
-        org_response = requests.get(org_url, headers=HEADERS, params=org_params)
+        org_response = http_client.get(org_url, headers=HEADERS, params=org_params)
         if org_response.status_code == 400:
             print(f"ERROR: Invalid organization key '{SONAR_ORGANIZATION}'")
             print("Please check your SONAR_ORGANIZATION value")
@@ -380,10 +362,10 @@ def main():
     # Validate required environment variables
     required_vars = {
         'SONAR_TOKEN': SONAR_TOKEN,
-        'DB_HOST': DB_HOST,
-        'DB_NAME': DB_NAME,
-        'DB_USER': DB_USER,
-        'DB_PASS': DB_PASS
+        'DB_HOST': db.DB_HOST,
+        'DB_NAME': db.DB_NAME,
+        'DB_USER': db.DB_USER,
+        'DB_PASS': db.DB_PASS
     }
     
     missing_vars = [var for var, value in required_vars.items() if not value]
@@ -401,7 +383,7 @@ def main():
     print("Starting SonarQube analysis data collection...")
     
     # Connect to database
-    db_connection = get_db_connection()
+    db_connection = db.get_db_connection()
     if not db_connection:
         print("Failed to connect to database. Exiting.")
         return
@@ -427,7 +409,7 @@ def main():
         print("No SonarQube data to insert")
     
     # Close database connection
-    db_connection.close()
+    db.release_connection(db_connection)
     print("SonarQube data collection completed.")
 
 if __name__ == "__main__":
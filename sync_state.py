@@ -0,0 +1,58 @@
+import os
+import psycopg2
+from dotenv import load_dotenv
+
+# --- Configuration ---
+load_dotenv()
+
+# Set FULL_RESYNC=1 to ignore stored watermarks and re-crawl everything
+FULL_RESYNC = os.environ.get('FULL_RESYNC', '0') not in ('0', 'false', 'False', '')
+
+
+def setup_sync_state(conn):
+    """Creates the sync_state table holding one watermark per repo and collector."""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sync_state (
+                repo_name VARCHAR(255) NOT NULL,
+                collector VARCHAR(64) NOT NULL,
+                watermark TIMESTAMP WITH TIME ZONE,
+                cursor TEXT,
+                updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (repo_name, collector)
+            );
+            """)
+        conn.commit()
+    except (Exception, psycopg2.Error) as error:
+        print(f"Error during sync_state setup: {error}")
+        conn.rollback()
+
+
+def get_watermark(conn, repo_name, collector):
+    """Returns (watermark, cursor) for a repo and collector, or (None, None) on a full re-crawl."""
+    if FULL_RESYNC:
+        return None, None
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT watermark, cursor FROM sync_state WHERE repo_name = %s AND collector = %s",
+            (repo_name, collector)
+        )
+        row = cursor.fetchone()
+    return (row[0], row[1]) if row else (None, None)
+
+
+def set_watermark(conn, repo_name, collector, watermark, cursor_value=None):
+    """Advances the watermark for a repo and collector. Never moves it backwards."""
+    if watermark is None:
+        return
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO sync_state (repo_name, collector, watermark, cursor, updated_at)
+            VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
+            ON CONFLICT (repo_name, collector) DO UPDATE SET
+                watermark = GREATEST(sync_state.watermark, EXCLUDED.watermark),
+                cursor = COALESCE(EXCLUDED.cursor, sync_state.cursor),
+                updated_at = EXCLUDED.updated_at;
+        """, (repo_name, collector, watermark, cursor_value))
+    conn.commit()
@@ -0,0 +1,185 @@
+"""
+Test module for backfill.py
+Covers shard planning, the PR page binary searches and checkpoint skipping.
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+import backfill
+
+
+class FakePage:
+    """Stands in for a /pulls response: the PRs of one page plus the pagination links."""
+
+    def __init__(self, prs, page_count):
+        self.prs = prs
+        self.links = {'last': {'url': f'https://api.github.com/x?page={page_count}'}} if page_count > 1 else {}
+
+    def json(self):
+        return self.prs
+
+
+@pytest.fixture
+def pulls(monkeypatch):
+    """Serves a creation-ordered PR list (one PR per creation day given) in pages of 3."""
+    pages = {}
+    requested = []
+
+    def serve(created_days, per_page=3):
+        prs = [{'number': number, 'created_at': f'{day}T12:00:00Z'} for number, day in enumerate(created_days, 1)]
+        chunks = [prs[start:start + per_page] for start in range(0, len(prs), per_page)]
+        pages.update({page: FakePage(chunk, len(chunks)) for page, chunk in enumerate(chunks, 1)})
+
+    def pulls_page(repo, page):
+        requested.append(page)
+        return pages.get(page, FakePage([], len(pages)))
+
+    monkeypatch.setattr(backfill, '_pulls_page', pulls_page)
+    serve.requested = requested
+    return serve
+
+
+class FakeConnection:
+    """Stands in for db.connection() so checkpoints can be recorded without a database."""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+def days(first, count):
+    return [first + timedelta(days=offset) for offset in range(count)]
+
+
+class TestDateShards:
+    """Test cases for date_shards."""
+
+    def test_covers_window_without_gaps(self):
+        first, last = date(2025, 1, 1), date(2025, 3, 15)
+        shards = backfill.date_shards(first, last, 7)
+        assert shards[0][0] == first
+        assert shards[-1][1] == last
+        for (_, end), (start, _) in zip(shards, shards[1:]):
+            assert start == end + timedelta(days=1)
+
+    def test_inner_shards_are_aligned_to_mondays(self):
+        shards = backfill.date_shards(date(2025, 1, 1), date(2025, 3, 15), 7)
+        for start, end in shards[1:-1]:
+            assert start.weekday() == 0
+            assert (end - start).days == 6
+
+    def test_inner_shards_do_not_depend_on_first_day(self):
+        earlier = backfill.date_shards(date(2025, 1, 1), date(2025, 3, 15), 7)
+        later = backfill.date_shards(date(2025, 1, 10), date(2025, 3, 15), 7)
+        assert set(later[1:]) <= set(earlier)
+
+    def test_single_day(self):
+        assert backfill.date_shards(date(2025, 1, 1), date(2025, 1, 1), 7) == [(date(2025, 1, 1), date(2025, 1, 1))]
+
+    def test_empty_window(self):
+        assert backfill.date_shards(date(2025, 1, 2), date(2025, 1, 1), 7) == []
+
+
+class TestPageShards:
+    """Test cases for page_shards."""
+
+    def test_aligned_to_pages_per_shard(self):
+        assert backfill.page_shards(3, 12, 5) == [(3, 5), (6, 10), (11, 12)]
+
+    def test_whole_shards(self):
+        assert backfill.page_shards(1, 10, 5) == [(1, 5), (6, 10)]
+
+    def test_single_page(self):
+        assert backfill.page_shards(7, 7, 5) == [(7, 7)]
+
+
+class TestPrPageRange:
+    """Test cases for pr_page_range."""
+
+    def test_window_inside_the_list(self, pulls):
+        pulls(days(date(2025, 1, 1), 30))  # 10 pages, 3 days each
+        assert backfill.pr_page_range('o/r', date(2025, 1, 8), date(2025, 1, 14)) == (3, 5)
+
+    def test_window_covering_everything(self, pulls):
+        pulls(days(date(2025, 1, 1), 30))
+        assert backfill.pr_page_range('o/r', date(2024, 1, 1), date(2026, 1, 1)) == (1, 10)
+
+    def test_window_before_the_first_pr(self, pulls):
+        pulls(days(date(2025, 1, 1), 30))
+        assert backfill.pr_page_range('o/r', date(2024, 1, 1), date(2024, 12, 31)) is None
+
+    def test_window_after_the_last_pr(self, pulls):
+        pulls(days(date(2025, 1, 1), 30))
+        assert backfill.pr_page_range('o/r', date(2025, 2, 1), date(2025, 2, 28)) is None
+
+    def test_window_between_two_prs(self, pulls):
+        pulls([date(2025, 1, 1)] * 3 + [date(2025, 3, 1)] * 3)
+        assert backfill.pr_page_range('o/r', date(2025, 2, 1), date(2025, 2, 28)) is None
+
+    def test_no_pull_requests(self, pulls):
+        pulls([])
+        assert backfill.pr_page_range('o/r', date(2025, 1, 1), date(2025, 1, 31)) is None
+
+    def test_empty_page_sorts_after_everything(self, pulls, monkeypatch):
+        # The last page can be empty when PRs are deleted between requests
+        pulls(days(date(2025, 1, 1), 30))
+        last_page = backfill._pulls_page('o/r', 10)
+        monkeypatch.setattr(last_page, 'prs', [])
+        assert backfill._created_days('o/r', 10) == (date.max, date.max)
+        assert backfill.pr_page_range('o/r', date(2025, 1, 25), date(2025, 2, 28)) == (9, 9)
+
+    def test_binary_search_reads_few_pages(self, pulls):
+        pulls(days(date(2020, 1, 1), 3000))  # 1000 pages
+        assert backfill.pr_page_range('o/r', date(2022, 1, 1), date(2022, 1, 31)) is not None
+        assert len(pulls.requested) < 30
+
+
+class TestCheckpoints:
+    """Test cases for shard keys and skipping finished shards."""
+
+    def test_finished_shards_are_skipped(self, pulls):
+        pulls(days(date(2025, 1, 1), 30))
+        shards = backfill.plan('o/r', date(2025, 1, 1), date(2025, 1, 14), 7, 2)
+        finished = {(kind, key) for kind, key, _, _ in shards[:2]}
+        assert backfill.unfinished(shards, finished) == shards[2:]
+
+    def test_pr_shard_keys_carry_the_window(self, pulls):
+        pulls(days(date(2025, 1, 1), 30))
+        first_run = backfill.plan('o/r', date(2025, 1, 1), date(2025, 1, 14), 7, 2)
+        finished = {(kind, key) for kind, key, _, _ in first_run}
+        later_run = backfill.plan('o/r', date(2025, 1, 1), date(2025, 1, 20), 7, 2)
+        todo = backfill.unfinished(later_run, finished)
+        # The page holding Jan 13-15 was only stored up to Jan 14: it must be visited again
+        assert ('pull_requests', '2025-01-01/2025-01-20 pages 5-6', 5, 6) in todo
+        assert all(len(key) <= 50 for _, key, _, _ in later_run)
+
+    def test_failed_shard_is_recorded_failed(self, monkeypatch):
+        recorded = []
+
+        def failing_backfill(*args):
+            raise RuntimeError("2 commit detail requests failed")
+
+        monkeypatch.setattr(backfill.db, 'connection', FakeConnection)
+        monkeypatch.setattr(backfill, 'record', lambda conn, repo, kind, key, status, **kw: recorded.append(status))
+        monkeypatch.setattr(backfill, 'backfill_commits', failing_backfill)
+        shard = ('commits', '2025-01-06/2025-01-12', date(2025, 1, 6), date(2025, 1, 12))
+        assert backfill.run_shard('o/r', shard, date(2025, 1, 1), date(2025, 1, 31), 0) is False
+        assert recorded == ['running', 'failed']
+
+    def test_checkpoint_error_is_recorded_failed(self, monkeypatch):
+        recorded = []
+
+        def flaky_record(conn, repo, kind, key, status, **kw):
+            recorded.append(status)
+            if status == 'running':
+                raise RuntimeError("connection lost")
+
+        monkeypatch.setattr(backfill.db, 'connection', FakeConnection)
+        monkeypatch.setattr(backfill, 'record', flaky_record)
+        shard = ('commits', '2025-01-06/2025-01-12', date(2025, 1, 6), date(2025, 1, 12))
+        assert backfill.run_shard('o/r', shard, date(2025, 1, 1), date(2025, 1, 31), 0) is False
+        assert recorded == ['running', 'failed']
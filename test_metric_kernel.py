@@ -0,0 +1,95 @@
+"""
+Test module for metric_kernel.py
+Checks that the NumPy batch path and the pure-Python fallback give the same results.
+"""
+
+import math
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import metric_kernel
+
+pytest.importorskip('numpy')
+
+STARTS = [
+    '2025-08-01T10:00:00Z',
+    '2025-08-01T10:00:00+00:00',
+    '2025-08-01T12:00:00+02:00',
+    datetime(2025, 8, 1, 10, 0, 0),
+    datetime(2025, 8, 1, 10, 0, 0, tzinfo=timezone.utc),
+    None,
+    '2025-08-03T00:00:00Z',
+    '2025-08-01T10:00:00.250000Z',
+]
+ENDS = [
+    '2025-08-02T11:30:15Z',
+    '2025-08-01T10:00:01Z',
+    datetime(2025, 8, 1, 12, 0, 0, tzinfo=timezone(timedelta(hours=-3))),
+    '2025-08-01T10:05:00Z',
+    None,
+    '2025-08-01T10:00:00Z',
+    '2025-08-02T00:00:00Z',  # ends before it starts
+    '2025-08-01T10:00:01Z',
+]
+
+
+@pytest.fixture
+def fallback(monkeypatch):
+    """Runs a metric_kernel function with NumPy hidden, as on an install without it."""
+    def run(function, *args):
+        with monkeypatch.context() as patch:
+            patch.setattr(metric_kernel, 'np', None)
+            return function(*args)
+    return run
+
+
+def as_optional_floats(values):
+    return [None if value is None or math.isnan(value) else float(value) for value in values]
+
+
+def test_seconds_between(fallback):
+    vectorized = as_optional_floats(metric_kernel.seconds_between(STARTS, ENDS))
+    assert vectorized == fallback(metric_kernel.seconds_between, STARTS, ENDS)
+    assert vectorized[0] == 91815.0
+
+
+def test_intervals(fallback):
+    vectorized = metric_kernel.intervals(STARTS, ENDS)
+    assert vectorized == fallback(metric_kernel.intervals, STARTS, ENDS)
+    assert vectorized[1] == timedelta(seconds=1)
+    assert vectorized[4] is None and vectorized[5] is None
+
+
+def test_parse_timestamps():
+    parsed = metric_kernel.parse_timestamps(STARTS)
+    assert parsed == [metric_kernel.parse_timestamp(value) for value in STARTS]
+    assert all(value is None or value.tzinfo is not None for value in parsed)
+
+
+def test_lead_time_rows(fallback):
+    records = [(number, start, end) for number, (start, end) in enumerate(zip(STARTS, ENDS), 1)]
+    vectorized = metric_kernel.lead_time_rows('o/r', records)
+    assert vectorized == fallback(metric_kernel.lead_time_rows, 'o/r', records)
+    # Missing timestamps and negative lead times are dropped
+    assert [row[1] for row in vectorized] == [1, 2, 3, 4, 8]
+    assert all(type(row[4]) is int for row in vectorized)
+
+
+def test_run_rows(fallback):
+    conclusions = ['success', 'failure', 'cancelled', 'success', 'failure', 'success', 'success', 'skipped']
+    runs = [
+        {'id': run_id, 'conclusion': conclusion, 'started_at': start, 'completed_at': end}
+        for run_id, (conclusion, start, end) in enumerate(zip(conclusions, STARTS, ENDS), 100)
+        if end is not None
+    ]
+    vectorized = metric_kernel.run_rows('o/r', runs)
+    assert vectorized == fallback(metric_kernel.run_rows, 'o/r', runs)
+    cfr_rows, duration_rows = vectorized
+    assert [row[1] for row in cfr_rows] == [100, 101, 103, 105, 106]
+    assert [row[1] for row in duration_rows] == [100, 101, 103]
+
+
+def test_empty_batches(fallback):
+    assert metric_kernel.lead_time_rows('o/r', []) == fallback(metric_kernel.lead_time_rows, 'o/r', []) == []
+    assert metric_kernel.run_rows('o/r', []) == fallback(metric_kernel.run_rows, 'o/r', []) == ([], [])
@@ -0,0 +1,86 @@
+"""
+Test module for sketches.py
+Covers quantile accuracy and merging of the per-day quantile sketches.
+"""
+
+import random
+
+import pytest
+
+import sketches
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+@pytest.fixture
+def durations():
+    rng = random.Random(42)
+    return [rng.lognormvariate(8, 1.5) for _ in range(5000)]
+
+
+class TestQuantile:
+    """Test cases for quantile."""
+
+    @pytest.mark.parametrize('q', [0.0, 0.1, 0.5, 0.9, 0.99, 1.0])
+    def test_within_relative_accuracy(self, durations, q):
+        sketch = sketches.build(durations, relative_accuracy=0.01)
+        expected = exact_quantile(durations, q)
+        assert sketch['count'] == len(durations)
+        assert sketches.quantile(sketch, q) == pytest.approx(expected, rel=0.01)
+
+    def test_extremes_stay_within_the_observed_range(self, durations):
+        sketch = sketches.build(durations)
+        assert min(durations) <= sketches.quantile(sketch, 0) <= min(durations) * 1.01
+        assert max(durations) / 1.01 <= sketches.quantile(sketch, 1) <= max(durations)
+
+    def test_single_value(self):
+        assert sketches.quantile(sketches.build([120]), 0.5) == 120
+
+    def test_zero_and_negative_values(self):
+        sketch = sketches.build([0, -5, 0, 10, 20])
+        assert sketch['zero'] == 3
+        assert sketches.quantile(sketch, 0.5) == 0
+        assert sketches.quantile(sketch, 1) == pytest.approx(20, rel=0.01)
+
+    def test_none_values_are_skipped(self):
+        assert sketches.build([None, 5, None])['count'] == 1
+
+    def test_empty_sketch(self):
+        assert sketches.quantile(sketches.empty_sketch(), 0.5) is None
+
+
+class TestMerge:
+    """Test cases for merge."""
+
+    def test_matches_a_sketch_of_all_values(self, durations):
+        days = [durations[start:start + 500] for start in range(0, len(durations), 500)]
+        merged = sketches.merge(sketches.build(day) for day in days)
+        whole = sketches.build(durations)
+        assert merged['bins'] == whole['bins']
+        assert merged['count'] == whole['count']
+        assert merged['min'] == whole['min'] and merged['max'] == whole['max']
+        assert merged['sum'] == pytest.approx(whole['sum'])
+        for q in (0.5, 0.9, 0.99):
+            assert sketches.quantile(merged, q) == sketches.quantile(whole, q)
+
+    def test_does_not_modify_its_inputs(self):
+        first, second = sketches.build([1, 2, 3]), sketches.build([4, 5])
+        first_bins = dict(first['bins'])
+        sketches.merge([first, second])
+        assert first['bins'] == first_bins
+        assert first['count'] == 3
+
+    def test_empty_sketches(self):
+        merged = sketches.merge([sketches.empty_sketch(), sketches.build([7]), sketches.empty_sketch()])
+        assert merged['count'] == 1
+        assert merged['min'] == merged['max'] == 7
+
+    def test_nothing_to_merge(self):
+        assert sketches.merge([]) == sketches.empty_sketch()
+
+    def test_different_accuracies_are_rejected(self):
+        with pytest.raises(ValueError):
+            sketches.merge([sketches.build([1], relative_accuracy=0.01), sketches.build([1], relative_accuracy=0.05)])
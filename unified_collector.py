@@ -1,18 +1,14 @@
 import os
 import time
 import requests
-import psycopg2
+import http_client
+import db
 from datetime import datetime
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # --- Configuration ---
-DB_HOST = os.environ.get("DB_HOST", "localhost")
-DB_NAME = os.environ.get("DB_NAME", "postgres")
-DB_USER = os.environ.get("DB_USER", "postgres")
-DB_PASS = os.environ.get("DB_PASS", "postgres")
-DB_PORT = os.environ.get("DB_PORT", "5432")
 SONAR_TOKEN = os.environ.get('SONAR_TOKEN')
 SONAR_HOST = os.environ.get('SONAR_HOST', 'http://localhost:9000')
 SONAR_ORGANIZATION = os.environ.get('SONAR_ORGANIZATION', '')
@@ -22,16 +18,6 @@ GITHUB_REPO = os.environ.get('GITHUB_REPO', 'youruser/yourrepo')
 HEADERS_SONAR = {'Authorization': f'Bearer {SONAR_TOKEN}', 'Accept': 'application/json'}
 HEADERS_GITHUB = {'Authorization': f'token {GITHUB_TOKEN}', 'Accept': 'application/vnd.github.v3+json'}
 
-def get_db_connection():
-    try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME, user=DB_USER, password=DB_PASS, host=DB_HOST, port=DB_PORT
-        )
-        return conn
-    except Exception as error:
-        print(f"Error while connecting to PostgreSQL: {error}")
-        return None
-
 # --- SonarQube Collector ---
 def collect_sonar_metrics(conn, project_key, repo_name):
     metrics = [
@@ -43,7 +29,7 @@ def collect_sonar_metrics(conn, project_key, repo_name):
     params = {'component': project_key, 'metricKeys': ','.join(metrics)}
     for attempt in range(1, 6):
         try:
-            response = requests.get(url, headers=HEADERS_SONAR, params=params)
+            response = http_client.get(url, headers=HEADERS_SONAR, params=params)
             if response.status_code == 404:
                 print(f"Attempt {attempt}: 404 Not Found for project '{project_key}'. Retrying in 10 seconds...")
                 time.sleep(10)
@@ -97,7 +83,7 @@ def collect_github_metrics(conn, repo):
     pass
 
 def main():
-    conn = get_db_connection()
+    conn = db.get_db_connection()
     if not conn:
         print("Failed to connect to database. Exiting.")
         return
@@ -111,7 +97,7 @@ def main():
     collect_build_metrics(conn, GITHUB_REPO)
     collect_github_metrics(conn, GITHUB_REPO)
 
-    conn.close()
+    db.release_connection(conn)
     print("Unified data collection completed.")
 
 if __name__ == "__main__":
@@ -0,0 +1,114 @@
+"""Resolves the GitHub Actions workflow run of merged PR head commits.
+
+Shared by MTTRCFR.py and the build-failure collector. Run ids are workflow run ids
+(the opt-in migrate.py 005_workflow_run_ids removes the check-run ids stored before).
+"""
+import os
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+import http_client
+import pagination
+
+# --- Configuration ---
+load_dotenv()
+
+# A PR head's run starts at its last push, which can come well before the merge
+RUN_LOOKBEHIND_DAYS = int(os.environ.get('RUN_LOOKBEHIND_DAYS', 3))
+# /actions/runs returns at most this many runs for one `created` filter
+RUN_SEARCH_LIMIT = 1000
+# Hard cap on the /actions/runs pages read per call, however far back the merged PRs go
+RUN_LIST_MAX_PAGES = int(os.environ.get('RUN_LIST_MAX_PAGES', 50))
+# SHAs the listing did not resolve that are looked up one by one, newest merge first
+RUN_SHA_LOOKUP_LIMIT = int(os.environ.get('RUN_SHA_LOOKUP_LIMIT', 10))
+
+
+def _parse(timestamp):
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+
+
+def as_run(workflow_run):
+    """Maps a workflow run onto the fields the collectors read."""
+    return {
+        'id': workflow_run['id'],
+        'head_sha': workflow_run['head_sha'],
+        'conclusion': workflow_run.get('conclusion'),
+        'started_at': workflow_run.get('run_started_at') or workflow_run['created_at'],
+        'completed_at': workflow_run['updated_at']
+    }
+
+
+def _format(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def runs_for_prs(repo, merged_prs, headers):
+    """Returns {head_sha: run} with the latest completed workflow run of each merged PR.
+
+    The completed runs created since the earliest merge (less RUN_LOOKBEHIND_DAYS) are
+    listed newest first until the oldest PR still unresolved is covered, narrowing the
+    `created` filter whenever a listing reaches RUN_SEARCH_LIMIT; at most
+    RUN_LIST_MAX_PAGES pages are read. Of the SHAs still missing, the
+    RUN_SHA_LOOKUP_LIMIT most recently merged cost a head_sha-filtered request each.
+    SHAs without a completed run are left out. Raises requests.RequestException when a
+    listing fails.
+    """
+    # head_sha -> the oldest creation time its run can have
+    pending = {}
+    for pr in merged_prs:
+        oldest = _parse(pr['merged_at']) - timedelta(days=RUN_LOOKBEHIND_DAYS)
+        pending[pr['head']['sha']] = min(oldest, pending.get(pr['head']['sha'], oldest))
+    if not pending:
+        return {}
+    commit_to_run_map = {}
+    print(f"  - Searching for workflow runs for {len(pending)} merged commits...")
+    runs_url = f"https://api.github.com/repos/{repo}/actions/runs"
+    not_before = _format(min(pending.values()))
+    # No branch filter: runs for a PR head SHA are reported on the PR's branch
+    params = {'status': 'completed', 'created': f">={not_before}"}
+    budget = RUN_LIST_MAX_PAGES * pagination.GITHUB_PAGE_SIZE
+    covered = False
+    while not covered and budget > 0:
+        listed = 0
+        oldest_created = None
+        for workflow_run in pagination.paginate(
+            runs_url, headers=headers, params=params, item_key='workflow_runs',
+            max_items=min(budget, RUN_SEARCH_LIMIT)
+        ):
+            listed += 1
+            oldest_created = workflow_run['created_at']
+            head_sha = workflow_run['head_sha']
+            if head_sha in pending:
+                commit_to_run_map[head_sha] = as_run(workflow_run)
+                del pending[head_sha]
+            if not pending or _parse(oldest_created) < min(pending.values()):
+                covered = True
+                break
+        budget -= listed
+        if listed < RUN_SEARCH_LIMIT:
+            # The listing ran out (or was cut short by the page cap)
+            break
+        # Read on below the oldest run seen; the run at the boundary comes back once more
+        params = {'status': 'completed', 'created': f"{not_before}..{oldest_created}"}
+
+    lookups = sorted(pending, key=pending.get, reverse=True)[:RUN_SHA_LOOKUP_LIMIT]
+    if pending:
+        print(f"    - {len(pending)} commits have no run in the listing; looking up {len(lookups)} individually...")
+    for head_sha in lookups:
+        for workflow_run in pagination.paginate(
+            runs_url, headers=headers, params={'status': 'completed', 'head_sha': head_sha},
+            item_key='workflow_runs', max_items=1
+        ):
+            commit_to_run_map[head_sha] = as_run(workflow_run)
+    return commit_to_run_map
+
+
+def is_workflow_run(repo, run_id, headers):
+    """True when `run_id` is a workflow run of `repo`, False when GitHub does not know it
+    as one (e.g. a check-run id). Raises requests.RequestException on any other failure.
+    """
+    response = http_client.get(f"https://api.github.com/repos/{repo}/actions/runs/{run_id}", headers=headers)
+    if response.status_code == 404:
+        return False
+    response.raise_for_status()
+    return True